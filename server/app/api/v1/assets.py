@@ -0,0 +1,92 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from app.schemas.content import AssetBatchRequest
+from app.services.asset_store import AssetStore
+from app.services.content_packager import ContentPackager
+from app.services.pack_catalog import get_catalog
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+import json
+import re
+import zipfile
+
+router = APIRouter()
+
+# Anchored paths (the packager's default layout: packs/ and audio_cache/ side by side)
+_SERVER_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+PACKS_DIR = _SERVER_ROOT / "data" / "processed" / "packs"
+ASSETS_DIR = _SERVER_ROOT / "data" / "processed" / "audio_cache" / "assets"
+
+_SAFE_VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+# Assets never change under a digest, so clients and proxies may keep them forever
+_IMMUTABLE = "public, max-age=31536000, immutable"
+
+MAX_BATCH_SIZE = 500
+
+
+@router.get("/manifest")
+def get_asset_manifest(version: Optional[str] = Query(None, description="Pack version (default: latest)")):
+    """
+    Path, hash and size of every clip in a pack. Clients compare hashes with
+    what they already hold and fetch only the missing assets.
+    """
+    version = version or get_catalog(PACKS_DIR).latest_version()
+    if not version or not _SAFE_VERSION_RE.match(version):
+        raise HTTPException(status_code=404, detail="No asset manifest found")
+
+    path = ContentPackager.asset_manifest_path(PACKS_DIR, version)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="No asset manifest found")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@router.post("/batch")
+def get_assets_batch(request: AssetBatchRequest):
+    """
+    Several assets in one response: a ZIP (stored, not deflated) with one
+    entry per digest, plus missing.json listing digests that are unknown.
+    """
+    hashes = list(dict.fromkeys(request.hashes))
+    if len(hashes) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} assets per batch")
+    if not all(AssetStore.is_digest(h) for h in hashes):
+        raise HTTPException(status_code=400, detail="Invalid asset hash")
+
+    store = AssetStore(ASSETS_DIR)
+    missing = []
+    buffer = SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as zf:
+        for digest in hashes:
+            if store.has(digest):
+                zf.write(store.path_for(digest), digest)
+            else:
+                missing.append(digest)
+        zf.writestr("missing.json", json.dumps(missing))
+    buffer.seek(0)
+
+    def stream():
+        with buffer:
+            yield from iter(lambda: buffer.read(64 * 1024), b"")
+
+    return StreamingResponse(stream(), media_type="application/zip")
+
+
+@router.get("/{digest}")
+def get_asset(digest: str):
+    """A single clip by the SHA-256 of its bytes."""
+    if not AssetStore.is_digest(digest):
+        raise HTTPException(status_code=400, detail="Invalid asset hash")
+
+    store = AssetStore(ASSETS_DIR)
+    path = store.path_for(digest)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Asset not found")
+
+    return FileResponse(
+        path=path,
+        media_type=store.media_type(path),
+        headers={"Cache-Control": _IMMUTABLE, "ETag": f'"{digest}"'},
+    )
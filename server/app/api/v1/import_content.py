@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.schemas.content import VocabularyImportRequest, GrammarImportRequest
-from app.models.vocabulary import VocabularyItem
-from app.models.grammar import GrammarTopic
+from app.schemas.content import VocabularyItemInput, VocabularyImportRequest, GrammarImportRequest
 from app.tasks.pipeline import generate_qa_report_task
+from app.services.bulk_import import VocabularyBulkImporter, upsert_grammar_topics
+from app.services.json_stream import JsonObjectStream
 import json
 from pathlib import Path
 import os
 import re
 from datetime import datetime
+from tempfile import NamedTemporaryFile
 
 router = APIRouter()
 
@@ -22,6 +25,22 @@ RAW_GRAMMAR_DIR = RAW_DATA_DIR / "grammar"
 # Strict source-name pattern: only alphanumeric, underscores, hyphens
 _SAFE_SOURCE_RE = re.compile(r"^[A-Za-z0-9_-]+$")
 
+# The vocabulary import reads its body as a stream, so FastAPI can't derive the
+# request body for the docs; describe it (VocabularyImportRequest) explicitly,
+# with the item schema inlined since openapi_extra can't register components
+_VOCABULARY_IMPORT_BODY = {
+    "required": True,
+    "content": {"application/json": {"schema": {
+        "title": "VocabularyImportRequest",
+        "type": "object",
+        "required": ["source_name", "items"],
+        "properties": {
+            "source_name": VocabularyImportRequest.model_json_schema()["properties"]["source_name"],
+            "items": {"type": "array", "items": VocabularyItemInput.model_json_schema()},
+        },
+    }}},
+}
+
 
 def _ensure_dirs():
     """Create raw data directories if they don't exist (lazy init, not at import time)."""
@@ -29,6 +48,14 @@ def _ensure_dirs():
     RAW_GRAMMAR_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _json_error(error: ValueError) -> RequestValidationError:
+    """A malformed streamed body, reported the way FastAPI reports one it parsed itself."""
+    return RequestValidationError([{
+        "type": "json_invalid", "loc": ("body", 0), "msg": "JSON decode error",
+        "input": {}, "ctx": {"error": str(error)},
+    }])
+
+
 def _safe_source_name(raw: str | None) -> str:
     """Return a validated source name, or a safe default."""
     if raw and _SAFE_SOURCE_RE.match(raw):
@@ -36,77 +63,99 @@ def _safe_source_name(raw: str | None) -> str:
     return "unknown_source"
 
 
-@router.post("/vocabulary", status_code=status.HTTP_201_CREATED)
-async def import_vocabulary(request: VocabularyImportRequest, db: Session = Depends(get_db)):
+@router.post("/vocabulary", status_code=status.HTTP_201_CREATED,
+             openapi_extra={"requestBody": _VOCABULARY_IMPORT_BODY})
+async def import_vocabulary(request: Request, db: Session = Depends(get_db)):
     """
     Import vocabulary JSON from ChatGPT/Manual sources.
     Saves raw JSON to disk for audit, then upserts into DB.
+
+    The body ({"source_name": ..., "items": [...]}, see VocabularyImportRequest)
+    is parsed while it streams in and upserted in chunks, so a large import
+    never sits in memory all at once.
     """
     _ensure_dirs()
-
-    # 1. Save Raw JSON
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    safe_source = _safe_source_name(request.source_name)
-    filename = f"{timestamp}_{safe_source}.json"
-
-    # Build and validate the output path (inlined for CodeQL taint tracking)
     abs_root = os.path.realpath(str(RAW_VOCAB_DIR))
-    abs_file = os.path.realpath(os.path.join(abs_root, filename))
 
-    if not abs_file.startswith(abs_root + os.sep):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid source name for vocabulary import.",
-        )
-
-    with open(abs_file, "w", encoding="utf-8") as f:
-        json.dump(request.model_dump(by_alias=True), f, indent=2, ensure_ascii=False)
-
-    # 2. Upsert into Database
+    parser = JsonObjectStream("items")
+    importer = VocabularyBulkImporter(db)
     count = 0
-    for item in request.items:
-        vocab_id = item.word.lower().strip()
-
-        db_item = db.query(VocabularyItem).filter(VocabularyItem.id == vocab_id).first()
-        if not db_item:
-            db_item = VocabularyItem(id=vocab_id, word=item.word)
-            db.add(db_item)
-
-        # Update fields
-        db_item.translation_en = item.translation_en
-        db_item.part_of_speech = item.part_of_speech
-        db_item.category = item.category
-        if item.gender:
-            db_item.gender = item.gender
-        if item.plural_form:
-            db_item.plural_form = item.plural_form
-        if item.gender_mnemonic:
-            db_item.gender_mnemonic = item.gender_mnemonic
-        if item.example_sentences:
-            db_item.example_sentences = item.example_sentences
-        
-        # Ordering Fields
-        if item.priority:
-            db_item.priority = item.priority
-        if item.theme:
-            db_item.theme = item.theme
-        if item.order_index is not None:
-            db_item.order_index = item.order_index
-        
-        # Kaikki Data
-        if item.kaikki_data:
-            db_item.kaikki_data = item.kaikki_data
-        if item.kaikki_audio_path:
-            db_item.kaikki_audio_path = item.kaikki_audio_path
-
-        # Metadata
-        db_item.generation_source = request.source_name
-        db_item.last_updated = int(datetime.now().timestamp())
-
-        count += 1
 
-    db.commit()
-    return {"message": f"Successfully imported {count} items", "file_saved": abs_file}
+    def consume(elements):
+        nonlocal count
+        for element in elements:
+            try:
+                item = VocabularyItemInput.model_validate(element)
+            except ValidationError as e:
+                raise RequestValidationError([
+                    {**err, "loc": ("body", "items", count, *err["loc"])}
+                    for err in e.errors(include_url=False)
+                ])
+            importer.add(item)
+            count += 1
+
+    def source_name_field():
+        source_name = parser.fields.get("source_name")
+        if source_name is not None and not isinstance(source_name, str):
+            raise RequestValidationError([{
+                "type": "string_type", "loc": ("body", "source_name"),
+                "msg": "Input should be a valid string", "input": source_name,
+            }])
+        return source_name
+
+    # 1. Stream the raw JSON to disk for audit while upserting
+    with NamedTemporaryFile(dir=abs_root, suffix=".part", delete=False) as raw_file:
+        pass
+    try:
+        with open(raw_file.name, "wb") as raw:
+            async for chunk in request.stream():
+                raw.write(chunk)
+                try:
+                    elements = parser.feed(chunk)
+                except ValueError as e:
+                    raise _json_error(e)
+                importer.source_name = source_name_field()
+                consume(elements)
+            try:
+                consume(parser.close())
+            except ValueError as e:
+                raise _json_error(e)
+
+        importer.source_name = source_name_field()
+        if importer.source_name is None:
+            raise RequestValidationError([{
+                "type": "missing", "loc": ("body", "source_name"), "msg": "Field required", "input": None,
+            }])
+
+        # 2. Finish the upsert
+        counts = importer.finish()
+
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        safe_source = _safe_source_name(importer.source_name)
+        filename = f"{timestamp}_{safe_source}.json"
+
+        # Build and validate the output path (inlined for CodeQL taint tracking)
+        abs_file = os.path.realpath(os.path.join(abs_root, filename))
+
+        if not abs_file.startswith(abs_root + os.sep):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid source name for vocabulary import.",
+            )
+
+        db.commit()
+        os.replace(raw_file.name, abs_file)
+    except BaseException:
+        db.rollback()
+        os.unlink(raw_file.name)
+        raise
+
+    return {
+        "message": f"Successfully imported {count} items",
+        "file_saved": abs_file,
+        "inserted": counts["inserted"],
+        "updated": counts["updated"],
+    }
 
 
 @router.post("/grammar", status_code=status.HTTP_201_CREATED)
@@ -134,25 +183,14 @@ async def import_grammar(request: GrammarImportRequest, db: Session = Depends(ge
     with open(abs_file, "w", encoding="utf-8") as f:
         json.dump(request.model_dump(), f, indent=2, ensure_ascii=False)
 
-    # 2. Upsert
-    count = 0
-    for topic in request.topics:
-        db_topic = db.query(GrammarTopic).filter(GrammarTopic.id == topic.id).first()
-        if not db_topic:
-            db_topic = GrammarTopic(id=topic.id, title=topic.title)
-            db.add(db_topic)
-
-        db_topic.title = topic.title
-        db_topic.description = topic.description
-        db_topic.sequence_order = topic.sequence_order
-        db_topic.content_json = [s.model_dump() for s in topic.sections]
-        db_topic.exercises_json = topic.exercises
-
-        db_topic.last_updated = int(datetime.now().timestamp())
-        count += 1
-
+    # 2. Upsert (unchanged topics are skipped by content hash)
+    counts = upsert_grammar_topics(db, request.topics)
     db.commit()
-    return {"message": f"Successfully imported {count} grammar topics", "file_saved": abs_file}
+    return {
+        "message": f"Successfully imported {len(request.topics)} grammar topics",
+        "file_saved": abs_file,
+        **counts,
+    }
 
 
 @router.post("/generate-qa-report", status_code=status.HTTP_202_ACCEPTED)
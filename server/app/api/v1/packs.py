@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.services.content_packager import ContentPackager
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.services.content_packager import PACK_FORMATS, find_delta_chain, load_pack_snapshots
+from app.services.pack_catalog import full_pack_filename, get_catalog
+from app.tasks.packs import BuildConflict, enqueue_pack_build, get_pack_build_status
 from pathlib import Path
+from typing import List, Optional
 import os
 import re
 
@@ -16,47 +18,138 @@ PACKS_DIR = _SERVER_ROOT / "data" / "processed" / "packs"
 # Strict filename pattern: alphanumeric, hyphens, underscores, dots, ending in .zip
 _SAFE_FILENAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*\.zip$")
 
+# Single byte range: "bytes=500-999", "bytes=500-" or "bytes=-500"
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
 
-@router.post("/latest", status_code=status.HTTP_201_CREATED)
-def generate_pack(version_tag: str = "v1", db: Session = Depends(get_db)):
+_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+@router.post("/latest", status_code=status.HTTP_202_ACCEPTED)
+def generate_pack(
+    version_tag: str = "v1",
+    delta_from: Optional[List[str]] = Query(None),
+    pack_format: Optional[str] = Query(None, alias="format"),
+):
     """
-    Trigger generation of a new content pack.
-    Ideally this should be a background task, but for MVP we run sync to debug.
-    WARNING: This will take time if TTS cache is cold!
+    Queue generation of a new content pack on the content_pipeline queue.
+    Also emits delta packs against each `delta_from` version (default: the previous build).
+    `format` picks the document layout (default: the PACK_FORMAT setting).
+    Concurrent requests for the same version tag and parameters share one job;
+    a request for a tag already building with other parameters gets 409.
+    Poll /jobs/{job_id} for progress and the final artifact.
     """
+    if pack_format is not None and pack_format not in PACK_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown pack format, expected one of {list(PACK_FORMATS)}")
     try:
-        packager = ContentPackager(db, PACKS_DIR)
-        zip_path = packager.generate_pack(version_tag)
-        return {"message": "Pack generated successfully", "path": str(zip_path), "url": f"/api/v1/packs/{zip_path.name}"}
+        job_id, coalesced = enqueue_pack_build(version_tag, delta_from, pack_format)
+    except BuildConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "message": "Pack build already in progress" if coalesced else "Pack build queued",
+        "job_id": job_id,
+        "coalesced": coalesced,
+        "status_url": f"/api/v1/packs/jobs/{job_id}",
+    }
+
+@router.get("/jobs/{job_id}")
+def get_pack_job(job_id: str):
+    """
+    Status of a pack build: state, phase (scan / synthesize / assemble / zip),
+    items done and remaining, and the artifact once finished.
+    """
+    return get_pack_build_status(job_id)
+
+def _with_url(entry: dict) -> dict:
+    return {**entry, "url": f"/api/v1/packs/{entry['filename']}"}
+
+@router.get("")
+def list_packs():
+    """
+    The pack catalog: every published full and delta pack (newest first)
+    with its version, format, item counts, size, SHA-256 and parent version.
+    """
+    catalog = get_catalog(PACKS_DIR)
+    return {
+        "latest": catalog.latest_version(),
+        "packs": [_with_url(entry) for entry in catalog.packs()],
+    }
 
 @router.get("/latest")
 def get_latest_pack():
     """
-    Get metadata for the latest available content pack.
-    Searches provided PACKS_DIR for zip files and reads their embedded manifest or sorts by time.
-    For MVP: Just find the newest ZIP file.
+    Get metadata for the latest published content pack.
+    Served from the in-memory pack catalog, which is refreshed only when a
+    build publishes a new one (and rebuilt from the archives if missing).
     """
-    if not PACKS_DIR.exists():
+    catalog = get_catalog(PACKS_DIR)
+    entry = catalog.latest()
+    if entry is None:
         raise HTTPException(status_code=404, detail="No packs found")
-        
-    zips = list(PACKS_DIR.glob("*.zip"))
-    if not zips:
+
+    dictionary = catalog.dictionary(entry["version"])
+    return {
+        **_with_url(entry),
+        "created_at": entry["built_at"],
+        # Separately downloadable Kaikki data, when the build split it out
+        "dictionary": _with_url(dictionary) if dictionary else None,
+        # The same pack with other audio encodings (e.g. "lite": mono Opus)
+        "variants": {profile: _with_url(v) for profile, v in catalog.variants(entry["version"]).items()},
+    }
+
+@router.get("/latest/dictionary")
+def get_latest_dictionary():
+    """
+    Metadata for the dictionary pack (Kaikki senses and pronunciations) of
+    the latest content pack. Clients re-download it only when its sha256
+    changes, independently of core pack updates.
+    """
+    catalog = get_catalog(PACKS_DIR)
+    version = catalog.latest_version()
+    dictionary = catalog.dictionary(version) if version else None
+    if dictionary is None:
+        raise HTTPException(status_code=404, detail="No dictionary pack found")
+    return {
+        **_with_url(dictionary),
+        "created_at": dictionary["built_at"],
+    }
+
+@router.get("/deltas")
+def get_delta_chain(from_version: str):
+    """
+    Smallest chain of delta packs (by download size) from the client's
+    version to the latest one. `deltas` is null when no chain exists and
+    the client has to fall back to the full pack.
+    """
+    snapshots = load_pack_snapshots(PACKS_DIR) if PACKS_DIR.exists() else []
+    if not snapshots:
         raise HTTPException(status_code=404, detail="No packs found")
-    
-    # Sort by modification time (newest first)
-    latest_zip = max(zips, key=os.path.getmtime)
-    
+
+    latest = get_catalog(PACKS_DIR).latest_version() or max(snapshots, key=lambda s: s["generated_at"])["version"]
+    chain = find_delta_chain(snapshots, from_version, latest)
+    full_name = full_pack_filename(latest)
+
     return {
-        "filename": latest_zip.name,
-        "url": f"/api/v1/packs/{latest_zip.name}",
-        "size": latest_zip.stat().st_size,
-        "created_at": latest_zip.stat().st_mtime
+        "from_version": from_version,
+        "latest_version": latest,
+        "up_to_date": from_version == latest,
+        "deltas": None if chain is None else [
+            {
+                "base_version": d["base_version"],
+                "version": d["version"],
+                "filename": d["filename"],
+                "url": f"/api/v1/packs/{d['filename']}",
+                "size": d["size"],
+            }
+            for d in chain
+        ],
+        "total_size": None if chain is None else sum(d["size"] for d in chain),
+        "full_pack": {"filename": full_name, "url": f"/api/v1/packs/{full_name}"},
     }
 
 @router.get("/{filename}")
-async def download_pack(filename: str):
+async def download_pack(filename: str, request: Request):
     # 1. Strict allowlist: reject anything that isn't a simple .zip filename
     if not _SAFE_FILENAME_RE.match(filename):
         raise HTTPException(status_code=400, detail="Invalid filename format")
@@ -79,8 +172,91 @@ async def download_pack(filename: str):
     if not os.path.isfile(abs_file):
         raise HTTPException(status_code=404, detail="Pack not found")
 
-    return FileResponse(
-        path=abs_file,
-        filename=safe_name,
-        media_type="application/zip"
+    return await _pack_file_response(request, Path(abs_file), safe_name)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match comparison (weak, so W/ prefixes are ignored)."""
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _parse_range(header: str, size: int):
+    """
+    (start, end) for a single satisfiable byte range, "unsatisfiable", or
+    None when the header should be ignored (malformed or multiple ranges).
+    """
+    match = _RANGE_RE.match(header.replace(" ", ""))
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    return start, end
+
+
+def _iter_file(path: Path, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(_DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def _pack_file_response(request: Request, path: Path, filename: str) -> Response:
+    """
+    Serve a pack with a strong ETag (its SHA-256), answering If-None-Match
+    with 304 and Range / If-Range with 206, so unchanged packs are never
+    re-sent and interrupted downloads resume where they stopped.
+    """
+    size = path.stat().st_size
+    etag = f'"{await run_in_threadpool(get_catalog(PACKS_DIR).sha256_of, path)}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # Version tags can be rebuilt in place, so always revalidate
+        "Cache-Control": "no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range needs a strong match; anything else means "send the whole new file"
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, size)
+
+    if byte_range == "unsatisfiable":
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, "Content-Range": f"bytes */{size}"},
+        )
+    if byte_range is None:
+        return StreamingResponse(
+            _iter_file(path, 0, size - 1), media_type="application/zip",
+            headers={**headers, "Content-Length": str(size)},
+        )
+
+    start, end = byte_range
+    return StreamingResponse(
+        _iter_file(path, start, end), status_code=status.HTTP_206_PARTIAL_CONTENT, media_type="application/zip",
+        headers={**headers, "Content-Length": str(end - start + 1), "Content-Range": f"bytes {start}-{end}/{size}"},
     )
@@ -4,7 +4,8 @@ from app.config import settings
 celery_app = Celery(
     "deutschstart_worker",
     broker=settings.REDIS_URL,
-    backend=settings.REDIS_URL
+    backend=settings.REDIS_URL,
+    include=["app.tasks.pipeline", "app.tasks.packs"]
 )
 
 celery_app.conf.task_routes = {
@@ -17,4 +18,6 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    task_eager_propagates=settings.CELERY_TASK_ALWAYS_EAGER,
 )
@@ -18,6 +18,31 @@ class Settings(BaseSettings):
     MINIO_ENDPOINT: str = "localhost:9000"
     MINIO_ACCESS_KEY: str = "minioadmin"
     MINIO_SECRET_KEY: str = "minioadmin"
+    MINIO_BUCKET: str = "deutschstart-audio"
+    MINIO_SECURE: bool = False
+
+    # Where synthesized clips live: "local" (a directory, shared via the
+    # data volume) or "s3" (the MinIO bucket above, shared across hosts)
+    AUDIO_STORE_BACKEND: str = "local"
+    # Fan missing clips out to Celery workers in chunks of this many
+    TTS_FANOUT: bool = False
+    TTS_FANOUT_CHUNK_SIZE: int = 50
+    # Default document layout of built packs ("1.0" JSON arrays, "2.0" compact NDJSON)
+    PACK_FORMAT: str = "1.0"
+    # Move Kaikki senses and pronunciations into a separate dictionary pack
+    # (off by default: shipped clients read kaikki_data from the core pack)
+    PACK_SPLIT_DICTIONARY: bool = False
+    # Reproducible packs: generated_at from the newest content change instead
+    # of the clock, so rebuilding unchanged content is byte-identical and skipped
+    PACK_DETERMINISTIC: bool = False
+    # Extra audio encoding profiles (comma-separated, e.g. "lite"): each is
+    # rendered from the same synthesis and shipped as a pack variant
+    PACK_AUDIO_VARIANTS: str = ""
+    # Audio compatibility pre-flight before packing (see AudioAudit):
+    # "off", "check" (log incompatible clips) or "fix" (resample them in place)
+    PACK_AUDIO_PREFLIGHT: str = "check"
+    # Run Celery tasks in-process (tests, local debugging without a worker)
+    CELERY_TASK_ALWAYS_EAGER: bool = False
     
     OPENAI_API_KEY: str = "sk-placeholder"
 
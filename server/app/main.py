@@ -2,7 +2,7 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.config import settings
 from app.database import engine, Base
-from app.api.v1 import import_content, packs
+from app.api.v1 import assets, import_content, packs
 
 # Create tables if they don't exist (simpler than Alembic for MVP start)
 # For production, use Alembic migrations.
@@ -26,6 +26,7 @@ app = FastAPI(
 # Include Routers
 app.include_router(import_content.router, prefix="/api/v1/import", tags=["Import"])
 app.include_router(packs.router, prefix="/api/v1/packs", tags=["Packs"])
+app.include_router(assets.router, prefix="/api/v1/assets", tags=["Assets"])
 
 @app.get("/health")
 async def health_check():
@@ -49,3 +49,7 @@ class GrammarTopicInput(BaseModel):
 class GrammarImportRequest(BaseModel):
     source_name: str
     topics: List[GrammarTopicInput]
+
+
+class AssetBatchRequest(BaseModel):
+    hashes: List[str] = Field(..., description="SHA-256 digests of the assets to fetch")
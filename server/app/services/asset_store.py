@@ -0,0 +1,77 @@
+import hashlib
+import os
+import re
+import shutil
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Tuple
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class AssetStore:
+    """
+    Pack audio addressed by the SHA-256 of its bytes, for clients that fetch
+    clips individually instead of as part of a pack.
+
+    Entries are hard links to the files the packager already keeps (audio
+    store blobs, pre-recorded and Kaikki clips), so publishing an asset costs
+    a hash and a link, not a copy. Content never changes under a digest,
+    which is what lets the API serve them as immutable.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def is_digest(value: str) -> bool:
+        return bool(_DIGEST_RE.match(value))
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def has(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+
+    @staticmethod
+    def digest_file(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def add_file(self, source: Path) -> Tuple[str, int]:
+        """Publish `source` under its digest; returns (digest, size)."""
+        digest = self.digest_file(source)
+        dest = self.path_for(digest)
+        if not dest.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = NamedTemporaryFile(dir=dest.parent, suffix=".part", delete=False)
+            tmp.close()
+            try:
+                os.unlink(tmp.name)
+                try:
+                    os.link(source, tmp.name)
+                except OSError:
+                    # Different filesystem (or no hard links): fall back to a copy
+                    shutil.copyfile(source, tmp.name)
+                os.replace(tmp.name, dest)
+            except BaseException:
+                Path(tmp.name).unlink(missing_ok=True)
+                raise
+        return digest, dest.stat().st_size
+
+    @staticmethod
+    def media_type(path: Path) -> str:
+        """Sniff the container from the first bytes (assets are stored without extensions)."""
+        with open(path, "rb") as f:
+            head = f.read(4)
+        if head.startswith(b"OggS"):
+            return "audio/ogg"
+        if head.startswith(b"ID3") or head[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+            return "audio/mpeg"
+        if head.startswith(b"RIFF"):
+            return "audio/wav"
+        return "application/octet-stream"
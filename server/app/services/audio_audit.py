@@ -0,0 +1,296 @@
+import json
+import logging
+import os
+import shutil
+import struct
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services import loudness
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".ogg", ".m4a", ".flac"}
+
+# Sample rate incompatible clips are converted to (Piper's native 192kHz output is not decodable)
+TARGET_SAMPLE_RATE = 22050
+
+# Rates Android decodes for every codec we ship (MP3 downloads are typically 44.1kHz)
+STANDARD_SAMPLE_RATES = {8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000}
+
+# Opus always decodes at 48kHz whatever rate the encoder was fed
+_OPUS_DECODE_RATE = 48000
+
+_MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+
+@dataclass
+class AudioInfo:
+    codec: str
+    sample_rate: int
+    channels: int
+
+
+def _ogg_info(head: bytes) -> Optional[AudioInfo]:
+    # Page header (27 bytes) + segment table; the first packet is the codec's identification header
+    if len(head) < 27:
+        return None
+    packet = head[27 + head[26]:]
+    if packet[:7] == b"\x01vorbis" and len(packet) >= 16:
+        channels, sample_rate = struct.unpack("<BI", packet[11:16])
+        return AudioInfo("vorbis", sample_rate, channels)
+    if packet[:8] == b"OpusHead" and len(packet) >= 10:
+        return AudioInfo("opus", _OPUS_DECODE_RATE, packet[9])
+    return None
+
+
+def _wav_info(f) -> Optional[AudioInfo]:
+    f.seek(12)
+    for _ in range(64):  # fmt comes first in practice; don't walk huge files
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, size = struct.unpack("<4sI", chunk)
+        if chunk_id == b"fmt ":
+            fmt = f.read(8)
+            if len(fmt) < 8:
+                return None
+            _, channels, sample_rate = struct.unpack("<HHI", fmt)
+            return AudioInfo("pcm", sample_rate, channels)
+        f.seek(size + (size & 1), os.SEEK_CUR)
+    return None
+
+
+def _flac_info(head: bytes) -> Optional[AudioInfo]:
+    # STREAMINFO is always the first metadata block: 20 bits of sample rate, 3 bits of channels - 1
+    if len(head) < 21:
+        return None
+    sample_rate = (head[18] << 12) | (head[19] << 4) | (head[20] >> 4)
+    channels = ((head[20] >> 1) & 0x07) + 1
+    return AudioInfo("flac", sample_rate, channels)
+
+
+def _mp3_info(f, head: bytes) -> Optional[AudioInfo]:
+    offset = 0
+    if head[:3] == b"ID3" and len(head) >= 10:
+        # ID3v2 tag size is a 28-bit syncsafe integer
+        offset = 10 + ((head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9])
+    f.seek(offset)
+    data = f.read(64 * 1024)
+    for i in range(len(data) - 3):
+        if data[i] != 0xFF or data[i + 1] & 0xE0 != 0xE0:
+            continue
+        version, layer = (data[i + 1] >> 3) & 0x03, (data[i + 1] >> 1) & 0x03
+        bitrate_index, rate_index = data[i + 2] >> 4, (data[i + 2] >> 2) & 0x03
+        if version == 1 or layer == 0 or bitrate_index == 0x0F or rate_index == 3:
+            continue
+        channels = 1 if data[i + 3] >> 6 == 3 else 2
+        return AudioInfo("mp3", _MP3_SAMPLE_RATES[version][rate_index], channels)
+    return None
+
+
+def _ffprobe_info(path: Path) -> Optional[AudioInfo]:
+    """Slow path for containers without a native parser (e.g. .m4a)."""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name,sample_rate,channels",
+        "-of", "json", str(path),
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        stream = json.loads(result.stdout)["streams"][0]
+        return AudioInfo(stream["codec_name"], int(stream["sample_rate"]), int(stream["channels"]))
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError, KeyError, IndexError):
+        return None
+
+
+def read_audio_info(path: Path) -> Optional[AudioInfo]:
+    """
+    Codec, sample rate and channel count from the file's header, parsed in
+    process for OGG (Vorbis/Opus), WAV, FLAC and MP3. None if unreadable.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(512)
+            if head[:4] == b"OggS":
+                return _ogg_info(head)
+            if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+                return _wav_info(f)
+            if head[:4] == b"fLaC":
+                return _flac_info(head)
+            if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+                return _mp3_info(f, head)
+    except OSError:
+        return None
+    if path.suffix.lower() in AUDIO_EXTENSIONS - {".ogg", ".wav", ".flac", ".mp3"}:
+        return _ffprobe_info(path)
+    return None
+
+
+def is_compatible(info: AudioInfo, target_rate: int = TARGET_SAMPLE_RATE) -> bool:
+    # Opus has a fixed decode rate and needs no resampling; every MP3 rate
+    # the header can express is a standard one
+    if info.codec in ("opus", "mp3"):
+        return True
+    return info.sample_rate == target_rate or info.sample_rate in STANDARD_SAMPLE_RATES
+
+
+def convert_clip(path: str, target_rate: int = TARGET_SAMPLE_RATE, normalize: bool = False) -> Tuple[str, Optional[str]]:
+    """
+    Resample a clip in place to `target_rate` mono. With `normalize`, loudness
+    is normalized too, with a linear second loudnorm pass from the clip's
+    stored measurement (only clips never measured are analyzed). Returns
+    (path, error or None). Module-level so it can run in a process pool.
+    """
+    file_path = Path(path)
+    # Same extension so ffmpeg picks the same container
+    temp_path = file_path.parent / f"{file_path.stem}_temp{file_path.suffix}"
+    try:
+        filters = []
+        if normalize:
+            filters = ["-af", loudness.two_pass_filter(loudness.measurement_for(file_path))]
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", str(file_path),
+            *filters,
+            "-ar", str(target_rate),
+            "-ac", "1",
+            str(temp_path),
+        ]
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+        shutil.move(temp_path, file_path)
+        if normalize:
+            # Record the new file's loudness so the next re-encode skips analysis too
+            converted = loudness.output_measurement(result.stderr)
+            if converted is not None:
+                loudness.save(file_path, converted)
+        return path, None
+    except subprocess.CalledProcessError as e:
+        temp_path.unlink(missing_ok=True)
+        return path, (e.stderr or b"").decode("utf-8", errors="replace").strip() or str(e)
+    except (OSError, ValueError) as e:
+        temp_path.unlink(missing_ok=True)
+        return path, str(e)
+
+
+@dataclass
+class AuditReport:
+    checked: int = 0
+    # Answered from the index without opening the file
+    cached: int = 0
+    unreadable: List[Path] = field(default_factory=list)
+    incompatible: List[Tuple[Path, AudioInfo]] = field(default_factory=list)
+    fixed: List[Path] = field(default_factory=list)
+    errors: Dict[Path, str] = field(default_factory=dict)
+
+
+class AudioAudit:
+    """
+    Checks audio files against what the Android client can decode (standard
+    sample rates; Opus and MP3 always) and resamples the ones that don't fit
+    (loudness-normalizing them as well with `normalize`).
+
+    Headers are read in process, and every result is kept in a JSON index
+    keyed by path and validated by (size, mtime), so a re-run only opens
+    files that were added or changed since. Conversions run in a process
+    pool. Used by scripts/fix_audio_compatibility.py and as the packager's
+    pre-flight check.
+    """
+
+    def __init__(self, index_path: Path, target_rate: int = TARGET_SAMPLE_RATE, workers: Optional[int] = None,
+                 normalize: bool = False):
+        self.index_path = index_path
+        self.target_rate = target_rate
+        self.normalize = normalize
+        self.workers = workers or os.cpu_count() or 4
+        self._index: Dict[str, dict] = self._load_index()
+
+    def _load_index(self) -> Dict[str, dict]:
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    def save_index(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile("w", dir=self.index_path.parent, suffix=".part", delete=False, encoding="utf-8") as tmp:
+            json.dump(self._index, tmp, sort_keys=True)
+        os.replace(tmp.name, self.index_path)
+
+    def info(self, path: Path) -> Tuple[Optional[AudioInfo], bool]:
+        """(header info, whether it came from the index) for one file."""
+        st = path.stat()
+        key = str(path.resolve())
+        record = self._index.get(key)
+        if record and record["size"] == st.st_size and record["mtime_ns"] == st.st_mtime_ns:
+            info = record.get("info")
+            return (AudioInfo(**info) if info else None), True
+
+        info = read_audio_info(path)
+        self._index[key] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "info": asdict(info) if info else None,
+        }
+        return info, False
+
+    def check(self, paths: Iterable[Path]) -> AuditReport:
+        report = AuditReport()
+        for path in paths:
+            report.checked += 1
+            try:
+                info, cached = self.info(path)
+            except OSError:
+                info, cached = None, False
+            report.cached += cached
+            if info is None:
+                report.unreadable.append(path)
+            elif not is_compatible(info, self.target_rate):
+                report.incompatible.append((path, info))
+        return report
+
+    def fix(self, report: AuditReport) -> AuditReport:
+        """Convert the report's incompatible files in the process pool and re-index them."""
+        paths = [str(path) for path, _ in report.incompatible]
+        if not paths:
+            return report
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(paths))) as pool:
+            results = list(pool.map(
+                convert_clip, paths, [self.target_rate] * len(paths), [self.normalize] * len(paths), chunksize=8
+            ))
+        for path, error in results:
+            if error is None:
+                report.fixed.append(Path(path))
+                self.info(Path(path))
+            else:
+                report.errors[Path(path)] = error
+        return report
+
+    def audit(self, paths: Iterable[Path], fix: bool = False) -> AuditReport:
+        """Check `paths`, optionally fix what's incompatible, and persist the index."""
+        report = self.check(paths)
+        if fix:
+            self.fix(report)
+        self.save_index()
+        return report
+
+
+def iter_audio_files(directories: Iterable[Path]) -> Iterable[Path]:
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = Path(root) / name
+                # Skip conversion leftovers from an interrupted run
+                if path.suffix.lower() in AUDIO_EXTENSIONS and not path.stem.endswith("_temp"):
+                    yield path
@@ -0,0 +1,271 @@
+import email.utils
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "DeutschStart/1.0 (contact: admin@deutschstart.app)"
+
+# Ledger states; each is final for a rerun (see retry_failed)
+DONE = "done"
+FAILED = "failed"
+MISSING = "missing"
+
+# Statuses worth retrying: throttling and transient server errors
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_MISSING_STATUSES = {404, 410}
+
+
+def filename_for(url: str) -> str:
+    return url.split("/")[-1]
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """A Retry-After header (delta-seconds or HTTP-date) as seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests per second on average, bursts
+    of up to `burst`. `pause` holds every caller back, e.g. for a server's
+    Retry-After.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class DownloadLedger:
+    """
+    Persistent record of every URL's outcome ({url: {"state", "file" or
+    "error" and "failed_at"}}), so reruns skip what was fetched, is gone
+    (404) or failed recently.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                logger.warning(f"Unreadable download ledger at {path}; starting a new one")
+
+    def entry(self, url: str) -> Optional[dict]:
+        with self._lock:
+            return self._entries.get(url)
+
+    def state(self, url: str) -> Optional[str]:
+        entry = self.entry(url)
+        return entry["state"] if entry else None
+
+    def record(self, url: str, state: str, **details):
+        with self._lock:
+            self._entries[url] = {"state": state, **details}
+
+    def save(self):
+        with self._lock:
+            snapshot = json.dumps(self._entries, sort_keys=True, ensure_ascii=False)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile("w", dir=self.path.parent, suffix=".part", delete=False, encoding="utf-8") as tmp:
+            tmp.write(snapshot)
+        os.replace(tmp.name, self.path)
+
+
+@dataclass
+class DownloadReport:
+    downloaded: List[str] = field(default_factory=list)
+    # Already on disk or settled by an earlier run
+    skipped: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+
+
+class AudioDownloader:
+    """
+    Fetches pronunciation clips into `dest_dir` with a few concurrent
+    workers sharing one keep-alive connection pool. Requests are paced by a
+    token bucket; throttled and failed requests back off exponentially,
+    waiting at least as long as the server's Retry-After (which also pauses
+    the other workers). Files are written to a temp file and renamed, so a
+    clip on disk is always complete.
+    """
+
+    # Persist the ledger this often during a run, not just at the end
+    SAVE_EVERY = 50
+
+    def __init__(
+        self,
+        dest_dir: Path,
+        ledger_path: Path,
+        concurrency: int = 4,
+        rate: float = 4.0,
+        burst: int = 4,
+        max_attempts: int = 5,
+        backoff_base: float = 1.0,
+        max_backoff: float = 60.0,
+        timeout: float = 30.0,
+        client: Optional[httpx.Client] = None,
+        failed_cooldown: float = 24 * 60 * 60,
+    ):
+        self.dest_dir = dest_dir
+        self.ledger = DownloadLedger(ledger_path)
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self._client = client
+        self._timeout = timeout
+        # Seconds before a failed URL is tried again (without retry_failed)
+        self.failed_cooldown = failed_cooldown
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = min(self.max_backoff, self.backoff_base * (2 ** attempt))
+        # Full jitter keeps workers that failed together from retrying together
+        delay = random.uniform(delay / 2, delay)
+        return max(delay, retry_after or 0.0)
+
+    def _write(self, response: httpx.Response, dest: Path):
+        with NamedTemporaryFile("wb", dir=dest.parent, suffix=".part", delete=False) as tmp:
+            try:
+                for chunk in response.iter_bytes():
+                    tmp.write(chunk)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        os.replace(tmp.name, dest)
+
+    def fetch(self, client: httpx.Client, url: str) -> str:
+        """Download one URL; returns its ledger state (and records it)."""
+        dest = self.dest_dir / filename_for(url)
+        error = ""
+        for attempt in range(self.max_attempts):
+            self.bucket.acquire()
+            retry_after = None
+            try:
+                with client.stream("GET", url) as response:
+                    if response.status_code == 200:
+                        self._write(response, dest)
+                        self.ledger.record(url, DONE, file=dest.name)
+                        return DONE
+                    if response.status_code in _MISSING_STATUSES:
+                        self.ledger.record(url, MISSING, status=response.status_code)
+                        return MISSING
+                    error = f"HTTP {response.status_code}"
+                    if response.status_code not in _RETRY_STATUSES:
+                        break
+                    retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        self.bucket.pause(retry_after)
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+
+            if attempt + 1 < self.max_attempts:
+                delay = self._backoff(attempt, retry_after)
+                logger.info(f"{filename_for(url)}: {error}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        self.ledger.record(url, FAILED, error=error, failed_at=time.time())
+        return FAILED
+
+    def _cooling_down(self, url: str) -> bool:
+        """Whether a failed URL failed too recently to be tried again."""
+        failed_at = (self.ledger.entry(url) or {}).get("failed_at", 0)
+        return time.time() - failed_at < self.failed_cooldown
+
+    def download_all(self, urls: Iterable[str], retry_failed: bool = False) -> DownloadReport:
+        """
+        Fetch every URL not yet settled. Failed URLs are tried again once
+        `failed_cooldown` has passed, or right away with `retry_failed`.
+        Returns what happened to each; the ledger is saved even if the run
+        is interrupted.
+        """
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        report = DownloadReport()
+        pending = []
+        for url in dict.fromkeys(urls):
+            state = self.ledger.state(url)
+            if state == DONE and (self.dest_dir / filename_for(url)).exists():
+                report.skipped.append(url)
+            elif state == MISSING or (state == FAILED and not retry_failed and self._cooling_down(url)):
+                report.skipped.append(url)
+            elif (self.dest_dir / filename_for(url)).exists():
+                # Fetched before the ledger existed
+                self.ledger.record(url, DONE, file=filename_for(url))
+                report.skipped.append(url)
+            else:
+                pending.append(url)
+
+        client = self._client or httpx.Client(
+            headers={"User-Agent": USER_AGENT},
+            timeout=self._timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                results = pool.map(lambda u: self.fetch(client, u), pending)
+                for n, (url, state) in enumerate(zip(pending, results), 1):
+                    if n % self.SAVE_EVERY == 0:
+                        self.ledger.save()
+                    if state == DONE:
+                        report.downloaded.append(url)
+                        logger.info(f"Downloaded: {filename_for(url)}")
+                    elif state == MISSING:
+                        report.missing.append(url)
+                    else:
+                        report.failed[url] = self.ledger.entry(url).get("error", "")
+        finally:
+            if self._client is None:
+                client.close()
+            self.ledger.save()
+        return report
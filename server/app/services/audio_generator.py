@@ -1,27 +1,143 @@
 import subprocess
 import json
 import logging
+import os
+import queue
+import shutil
+import threading
+from collections import deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, mkdtemp
+from typing import Dict, List, Optional
+
+from app.services import loudness
 
 logger = logging.getLogger(__name__)
 
+
+class PiperProcess:
+    """
+    A resident Piper process for one voice.
+    The ONNX model is loaded once; utterances are fed over stdin in
+    Piper's JSON-lines mode, each with its own output file in a scratch
+    directory of the process. Piper prints a file's path (one line, flushed)
+    once it is written, which frames the utterances: its stdout isn't
+    flushed per utterance, so a WAV stream on stdout can't be read reliably.
+    """
+
+    def __init__(self, piper_binary: Path, model_path: Path, params: dict):
+        self.model_path = model_path
+        self.work_dir = Path(mkdtemp(prefix="piper-"))
+        cmd = [
+            str(piper_binary),
+            "--model", str(model_path),
+            "--json-input",
+            "--output_dir", str(self.work_dir),
+            "--length_scale", params["length_scale"],
+            "--noise_scale", params["noise_scale"],
+            "--noise_w", params["noise_w"],
+        ]
+        self._count = 0
+        try:
+            self.process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except Exception:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            raise
+        # Piper logs every utterance to stderr; drain it so the pipe never fills up
+        self._stderr_tail = deque(maxlen=20)
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+
+    def _drain_stderr(self):
+        for line in self.process.stderr:
+            self._stderr_tail.append(line.decode("utf-8", errors="replace").rstrip())
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def synthesize(self, text: str) -> bytes:
+        """Synthesize one utterance and return the WAV bytes."""
+        self._count += 1
+        wav_path = self.work_dir / f"{self._count}.wav"
+        request = json.dumps({"text": text, "output_file": str(wav_path)}, ensure_ascii=False)
+        try:
+            self.process.stdin.write(request.encode("utf-8") + b"\n")
+            self.process.stdin.flush()
+            printed = self.process.stdout.readline()
+        except (BrokenPipeError, OSError) as e:
+            raise RuntimeError(f"Piper worker for {self.model_path.name} died: {self.stderr_tail()}") from e
+
+        if not printed:
+            raise RuntimeError(f"Piper worker for {self.model_path.name} exited: {self.stderr_tail()}")
+        if Path(printed.decode("utf-8", errors="replace").strip()) != wav_path:
+            raise RuntimeError(f"Unexpected output from Piper worker for {self.model_path.name}")
+        try:
+            return wav_path.read_bytes()
+        finally:
+            wav_path.unlink(missing_ok=True)
+
+    def stderr_tail(self) -> str:
+        return "\n".join(self._stderr_tail)
+
+    def close(self):
+        if self.process.stdin and not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+@dataclass
+class SynthesisJob:
+    """One utterance of a batch (see AudioGenerator.generate_batch)."""
+    text: str
+    output_path: Path
+    profile: str = "standard"
+    # Further profile -> path outputs, encoded from the same synthesis
+    variants: Dict[str, Path] = field(default_factory=dict)
+
+
 class AudioGenerator:
     """
     Wrapper around Piper TTS for generating audio in multiple languages.
     Supports German (thorsten-high) and English (libritts-high).
+
+    Piper processes are kept resident in a per-voice pool (at most
+    `workers_per_voice` each), so the voice model is loaded once per worker
+    instead of once per utterance. The generator is thread-safe; call
+    `close()` when done to terminate the pool.
     """
-    
+
     def __init__(
-        self, 
+        self,
         german_model_path: str = "/app/piper-voices/de_DE-thorsten-high.onnx",
         english_model_path: str = "/app/piper-voices/en_US-libritts-high.onnx",
-        piper_binary: str = "/app/piper/piper"
+        piper_binary: str = "/app/piper/piper",
+        workers_per_voice: int | None = None
     ):
         self.german_model_path = Path(german_model_path)
         self.english_model_path = Path(english_model_path)
         self.piper_binary = Path(piper_binary)
-        
+        self.workers_per_voice = workers_per_voice or os.cpu_count() or 4
+
+        self._lock = threading.Lock()
+        self._idle = {}     # language -> Queue of idle PiperProcess
+        self._spawned = {}  # language -> number of live workers
+        self._workers = []
+
         if not self.german_model_path.exists():
             logger.warning(f"German Piper model not found at {self.german_model_path}. German TTS will fail.")
         if not self.english_model_path.exists():
@@ -29,87 +145,180 @@ class AudioGenerator:
         if not self.piper_binary.exists():
             logger.warning(f"Piper binary not found at {self.piper_binary}. TTS will fail.")
 
-    def generate_audio(self, text: str, output_path: Path, language: str = "de"):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # ffmpeg output settings for every cached clip:
+    # resample to 22050Hz for Android compatibility (Piper outputs 192kHz which Android can't decode),
+    # loudness normalization to -14 LUFS, OGG Vorbis quality 4 (~128kbps)
+    ENCODER_ARGS = [
+        "-ar", "22050",
+        "-af", loudness.LOUDNORM_FILTER,
+        "-c:a", "libvorbis",
+        "-q:a", "4",
+    ]
+
+    # Encoding profiles a synthesized utterance can be rendered to. Every
+    # profile is an Ogg stream, so clips keep their .ogg names in any pack.
+    # "lite": mono Opus at 20kbps in speech mode, a fraction of the Vorbis
+    # size with no audible loss for single words and short sentences.
+    DEFAULT_PROFILE = "standard"
+    ENCODING_PROFILES = {
+        "standard": ENCODER_ARGS,
+        "lite": [
+            "-ac", "1",
+            "-ar", "24000",
+            "-af", loudness.LOUDNORM_FILTER,
+            "-c:a", "libopus",
+            "-b:a", "20k",
+            "-application", "voip",
+        ],
+    }
+
+    def model_path_for(self, language: str) -> Path:
+        return self.german_model_path if language == "de" else self.english_model_path
+
+    def synthesis_params(self, language: str) -> dict:
+        """Piper tuning parameters for a language."""
+        params = {
+            "length_scale": "1.0",
+            "noise_scale": "0.667",
+            "noise_w": "0.8",
+        }
+        if language == "en":
+            params["length_scale"] = "1.15"  # 15% slower for clarity
+            params["noise_scale"] = "0.5"    # Less variation (more consistent)
+        return params
+
+    def voice_settings(self, language: str, profile: str = DEFAULT_PROFILE) -> dict:
+        """Everything besides the text that determines a clip's bytes (part of the audio cache key)."""
+        return {
+            "language": language,
+            "model": self.model_path_for(language).name,
+            **self.synthesis_params(language),
+            "encoder": self.ENCODING_PROFILES[profile],
+            "normalization": loudness.LOUDNORM_MODE,
+        }
+
+    def _acquire_worker(self, language: str) -> PiperProcess:
+        with self._lock:
+            idle = self._idle.setdefault(language, queue.Queue())
+            try:
+                return idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self._spawned.get(language, 0) < self.workers_per_voice:
+                self._spawned[language] = self._spawned.get(language, 0) + 1
+                spawn = True
+            else:
+                spawn = False
+
+        if not spawn:
+            return idle.get()
+
+        try:
+            worker = PiperProcess(self.piper_binary, self.model_path_for(language), self.synthesis_params(language))
+        except Exception:
+            with self._lock:
+                self._spawned[language] -= 1
+            raise
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _release_worker(self, language: str, worker: PiperProcess):
+        with self._lock:
+            tracked = worker in self._workers
+            if tracked and worker.alive:
+                self._idle.setdefault(language, queue.Queue()).put(worker)
+                return
+            if tracked:
+                self._spawned[language] -= 1
+                self._workers.remove(worker)
+
+        # Dead workers are dropped (the next acquire spawns a replacement);
+        # workers returned after close() are shut down.
+        if tracked:
+            logger.warning(f"Piper worker for '{language}' exited, discarding it.")
+        worker.close()
+
+    def close(self):
+        """Terminate all resident Piper processes."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+            self._idle = {}
+            self._spawned = {}
+        for worker in workers:
+            worker.close()
+
+    def generate_audio(
+        self,
+        text: str,
+        output_path: Path,
+        language: str = "de",
+        profile: str = DEFAULT_PROFILE,
+        variants: Optional[Dict[str, Path]] = None,
+        worker: Optional[PiperProcess] = None
+    ):
         """
         Generate audio from text using Piper TTS.
-        Output format is WAV (Piper default), then converted to OGG Vorbis via ffmpeg.
-        
+        Piper's WAV output (read back from the worker's scratch file) is
+        piped straight into ffmpeg and encoded to OGG.
+
         Args:
             text: Text to convert to speech
             output_path: Where to save the audio file
             language: "de" for German, "en" for English
+            profile: Encoding profile of output_path (see ENCODING_PROFILES)
+            variants: Further profile -> path outputs, encoded from the same synthesis
+            worker: Piper worker already held by the caller (see generate_batch);
+                by default one is borrowed from the pool for this utterance
         """
         if not text:
             raise ValueError("Text cannot be empty")
-        
-        # Select model based on language
-        model_path = self.german_model_path if language == "de" else self.english_model_path
-        
-        if not model_path.exists():
-            raise FileNotFoundError(f"Model not found for language '{language}': {model_path}")
-            
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Piper expects JSON input for batch or simple text via stdin
-        # cmd: echo 'Text' | piper --model ... --output_file ...
-        
+        outputs = {profile: output_path, **(variants or {})}
+        unknown = set(outputs) - set(self.ENCODING_PROFILES)
+        if unknown:
+            raise ValueError(f"Unknown encoding profile(s): {sorted(unknown)}")
+
+        for path in outputs.values():
+            path.parent.mkdir(parents=True, exist_ok=True)
+
         # Test mode: If binary missing, just touch the file
         if not self.piper_binary.exists():
-            logger.warning(f"Piper binary missing. Creating dummy audio file at {output_path}")
-            with open(output_path, "wb") as f:
-                f.write(b"DUMMY_AUDIO_CONTENT")
+            for path in outputs.values():
+                logger.warning(f"Piper binary missing. Creating dummy audio file at {path}")
+                with open(path, "wb") as f:
+                    f.write(b"DUMMY_AUDIO_CONTENT")
             return output_path
 
+        # Select model based on language
+        model_path = self.model_path_for(language)
+
+        if not model_path.exists():
+            raise FileNotFoundError(f"Model not found for language '{language}': {model_path}")
+
         try:
-            # 1. Generate WAV to temp file
-            with NamedTemporaryFile(suffix=".wav", delete=False) as tmp_wav:
-                tmp_wav_path = Path(tmp_wav.name)
-            
-            # Tuning parameters
-            length_scale = "1.0"
-            noise_scale = "0.667"
-            noise_w = "0.8"
-            
-            if language == "en":
-                length_scale = "1.15" # 15% slower for clarity
-                noise_scale = "0.5"   # Less variation (more consistent)
-            
-            # Simple text-to-speech with tuning
-            cmd = [
-                str(self.piper_binary),
-                "--model", str(model_path),
-                "--output_file", str(tmp_wav_path),
-                "--length_scale", length_scale,
-                "--noise_scale", noise_scale,
-                "--noise_w", noise_w
-            ]
-            
-            # Pipe text to stdin
-            process = subprocess.run(
-                cmd,
-                input=text.encode("utf-8"),
-                check=True,
-                capture_output=True
-            )
-            
-            # 2. Convert to OGG Vorbis with ffmpeg (Quality 4 ~ 128kbps, -14 LUFS normalization)
-            # Resample to 22050Hz for Android compatibility (Piper outputs 192kHz which Android can't decode)
-            # Loudness normalization: loudnorm=I=-14:TP=-1.5:LRA=11
-            ffmpeg_cmd = [
-                "ffmpeg", "-y",
-                "-i", str(tmp_wav_path),
-                "-ar", "22050",  # Resample to 22050Hz
-                "-af", "loudnorm=I=-14:TP=-1.5:LRA=11",
-                "-c:a", "libvorbis",
-                "-q:a", "4",
-                str(output_path)
-            ]
-            
-            subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
-            
-            # Cleanup temp WAV
-            tmp_wav_path.unlink(missing_ok=True)
-            
+            # 1. Synthesize via a resident Piper worker
+            if worker is not None:
+                wav = worker.synthesize(text)
+            else:
+                worker = self._acquire_worker(language)
+                try:
+                    wav = worker.synthesize(text)
+                finally:
+                    self._release_worker(language, worker)
+
+            # 2. Measure loudness once for every profile
+            measured = loudness.measure(["-f", "wav", "-i", "pipe:0"], wav)
+
+            # 3. Encode each profile, piping the WAV in and the OGG out
+            for out_profile, path in outputs.items():
+                self._encode_ogg(wav, path, out_profile, measured)
+
             return output_path
 
         except subprocess.CalledProcessError as e:
@@ -118,3 +327,72 @@ class AudioGenerator:
         except FileNotFoundError as e:
             logger.error(f"Dependency not found: {e}")
             raise RuntimeError(f"Missing system dependency (ffmpeg/piper): {e}") from e
+
+    def encoder_args(self, profile: str = DEFAULT_PROFILE, measured: Optional[dict] = None) -> list:
+        """
+        ffmpeg output arguments for `profile`. With a loudness measurement the
+        single-pass loudnorm is swapped for a linear second pass.
+        """
+        args = list(self.ENCODING_PROFILES[profile])
+        if measured is not None:
+            args[args.index(loudness.LOUDNORM_FILTER)] = loudness.two_pass_filter(measured)
+        return args
+
+    def generate_batch(self, jobs: List[SynthesisJob], language: str = "de") -> List[Optional[str]]:
+        """
+        Synthesize a batch of utterances in one language through a single
+        Piper session: one worker is held for the whole batch instead of
+        being borrowed from the pool per utterance. A failed job doesn't stop
+        the batch (a worker that died is replaced for the remaining jobs).
+
+        Returns one entry per job: None on success, else the error message.
+        """
+        errors: List[Optional[str]] = []
+        # Without a usable voice generate_audio writes dummy clips or raises per job
+        needs_worker = self.piper_binary.exists() and self.model_path_for(language).exists()
+        worker = None
+        try:
+            for job in jobs:
+                try:
+                    if needs_worker and worker is None:
+                        worker = self._acquire_worker(language)
+                    self.generate_audio(
+                        job.text, job.output_path, language=language,
+                        profile=job.profile, variants=job.variants, worker=worker
+                    )
+                    errors.append(None)
+                except Exception as e:
+                    logger.error(f"Batch job failed for '{job.text}': {e}")
+                    errors.append(str(e))
+                    if worker is not None and not worker.alive:
+                        self._release_worker(language, worker)
+                        worker = None
+        finally:
+            if worker is not None:
+                self._release_worker(language, worker)
+        return errors
+
+    def _encode_ogg(self, wav: bytes, output_path: Path, profile: str = DEFAULT_PROFILE, measured: Optional[dict] = None):
+        """
+        Encode WAV bytes to OGG through ffmpeg's stdin/stdout.
+        loudnorm works on the whole input stream, so each clip gets its own
+        ffmpeg invocation; the encoded clip is written once, atomically, so a
+        failed encode never leaves a truncated file that looks cached.
+        The clip's own loudness (printed by the second pass) is stored next
+        to it, so re-encoding it later needs no new analysis.
+        """
+        ffmpeg_cmd = [
+            "ffmpeg", "-y",
+            "-f", "wav", "-i", "pipe:0",
+            *self.encoder_args(profile, measured),
+            "-f", "ogg", "pipe:1",
+        ]
+        result = subprocess.run(ffmpeg_cmd, input=wav, check=True, capture_output=True)
+
+        with NamedTemporaryFile(dir=output_path.parent, suffix=".part", delete=False) as tmp:
+            tmp.write(result.stdout)
+        os.replace(tmp.name, output_path)
+
+        clip_loudness = loudness.output_measurement(result.stderr) if measured is not None else None
+        if clip_loudness is not None:
+            loudness.save(output_path, clip_loudness)
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class S3BlobBackend:
+    """
+    Blob storage in an S3-compatible bucket (MinIO), shared by every worker
+    that synthesizes or packages audio. Objects are named like local blobs.
+    """
+
+    def __init__(self, client, bucket: str, prefix: str = "blobs/"):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    @classmethod
+    def from_settings(cls) -> "S3BlobBackend":
+        from minio import Minio
+        from app.config import settings
+
+        client = Minio(
+            settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            secure=settings.MINIO_SECURE,
+        )
+        if not client.bucket_exists(settings.MINIO_BUCKET):
+            client.make_bucket(settings.MINIO_BUCKET)
+        return cls(client, settings.MINIO_BUCKET)
+
+    def _object_name(self, key: str, suffix: str) -> str:
+        return f"{self.prefix}{key[:2]}/{key}{suffix}"
+
+    def has(self, key: str, suffix: str) -> bool:
+        from minio.error import S3Error
+        try:
+            self.client.stat_object(self.bucket, self._object_name(key, suffix))
+            return True
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return False
+            raise
+
+    def download(self, key: str, suffix: str, dest: Path):
+        self.client.fget_object(self.bucket, self._object_name(key, suffix), str(dest))
+
+    def upload(self, key: str, suffix: str, src: Path):
+        self.client.fput_object(self.bucket, self._object_name(key, suffix), str(src))
+
+
+class AudioStore:
+    """
+    Content-addressed store for synthesized audio clips.
+
+    A clip's key is the SHA-256 of everything that determines its bytes
+    (normalized text, language, voice model, Piper tuning and encoder
+    settings), so an edited sentence gets a new clip, identical sentences
+    share one, and a changed voice or encoder invalidates exactly the clips
+    it affects. Blobs are immutable and written atomically, which makes the
+    store safe to share between workers.
+
+    With a `remote` backend the local directory acts as a read-through
+    cache: `fetch` pulls blobs other workers produced, `publish` pushes
+    freshly synthesized ones.
+    """
+
+    BLOB_SUFFIX = ".ogg"
+
+    def __init__(self, root: Path, remote: Optional[S3BlobBackend] = None):
+        self.root = root
+        self.remote = remote
+        self.blob_dir = self.root / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """NFC-normalize and collapse whitespace so cosmetic edits don't re-synthesize."""
+        return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+    @staticmethod
+    def key_for(inputs: dict) -> str:
+        """Hash a dict of synthesis inputs into a blob key."""
+        canonical = json.dumps(inputs, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def clip_key(self, text: str, voice: dict) -> str:
+        """Key for a clip of `text` rendered with `voice` (see AudioGenerator.voice_settings)."""
+        return self.key_for({"text": self.normalize_text(text), **voice})
+
+    def path_for(self, key: str) -> Path:
+        return self.blob_dir / key[:2] / f"{key}{self.BLOB_SUFFIX}"
+
+    def has(self, key: str) -> bool:
+        return self.path_for(key).exists()
+
+    def fetch(self, key: str) -> bool:
+        """Make the blob available locally, pulling it from the remote if needed."""
+        path = self.path_for(key)
+        if path.exists():
+            return True
+        if self.remote is None or not self.remote.has(key, self.BLOB_SUFFIX):
+            return False
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(dir=path.parent, suffix=".part", delete=False) as tmp:
+            pass
+        try:
+            self.remote.download(key, self.BLOB_SUFFIX, Path(tmp.name))
+            os.replace(tmp.name, path)
+        except BaseException:
+            Path(tmp.name).unlink(missing_ok=True)
+            raise
+        return True
+
+    def publish(self, key: str):
+        """Share a locally written blob with other workers (no-op without a remote)."""
+        if self.remote is not None and not self.remote.has(key, self.BLOB_SUFFIX):
+            self.remote.upload(key, self.BLOB_SUFFIX, self.path_for(key))
+
+
+def open_audio_store(root: Path) -> AudioStore:
+    """AudioStore rooted at `root`, backed by the bucket when AUDIO_STORE_BACKEND is "s3"."""
+    from app.config import settings
+
+    backend = settings.AUDIO_STORE_BACKEND.lower()
+    if backend == "s3":
+        return AudioStore(root, remote=S3BlobBackend.from_settings())
+    if backend != "local":
+        logger.warning(f"Unknown AUDIO_STORE_BACKEND '{backend}', using the local store.")
+    return AudioStore(root)
@@ -0,0 +1,232 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from app.models.grammar import GrammarTopic
+from app.models.vocabulary import VocabularyItem
+from app.schemas.content import GrammarTopicInput, VocabularyItemInput
+from app.services.content_hashing import VOCABULARY_HASH_FIELDS, grammar_content_hash, vocabulary_row_hash
+
+# Rows per INSERT ... ON CONFLICT statement
+UPSERT_CHUNK_SIZE = 500
+
+# Columns an import writes; every upserted row carries all of them
+VOCABULARY_UPSERT_COLUMNS = [
+    "id", "word", "translation_en", "part_of_speech", "category",
+    "gender", "plural_form", "gender_mnemonic", "example_sentences",
+    "priority", "theme", "order_index", "kaikki_data", "kaikki_audio_path",
+    "generation_source", "content_hash", "last_updated",
+]
+
+# Optional fields that only overwrite the stored value when the import provides one
+_OVERWRITE_IF_PROVIDED = [
+    "gender", "plural_form", "gender_mnemonic", "example_sentences",
+    "priority", "theme", "kaikki_data", "kaikki_audio_path",
+]
+
+_PREFETCH_COLUMNS = list(dict.fromkeys(VOCABULARY_UPSERT_COLUMNS + VOCABULARY_HASH_FIELDS))
+
+
+def upsert_insert(db: Session, table):
+    """Dialect-specific INSERT that supports ON CONFLICT (PostgreSQL, or SQLite in tests)."""
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
+
+
+def new_vocabulary_row(vocab_id: str, word: str) -> dict:
+    """Column values of a fresh VocabularyItem, including scalar column defaults."""
+    row = {name: None for name in _PREFETCH_COLUMNS}
+    for column in VocabularyItem.__table__.columns:
+        if column.name in row and column.default is not None and column.default.is_scalar:
+            row[column.name] = column.default.arg
+    row.update(id=vocab_id, word=word)
+    return row
+
+
+def merge_vocabulary_item(row: dict, item: VocabularyItemInput, source_name: Optional[str], now: int) -> dict:
+    """Apply an imported item on top of the stored row (same rules as the per-item import)."""
+    row["translation_en"] = item.translation_en
+    row["part_of_speech"] = item.part_of_speech
+    row["category"] = item.category
+    for field in _OVERWRITE_IF_PROVIDED:
+        value = getattr(item, field)
+        if value:
+            row[field] = value
+    if item.order_index is not None:
+        row["order_index"] = item.order_index
+
+    row["generation_source"] = source_name
+    row["content_hash"] = vocabulary_row_hash(row)
+    row["last_updated"] = now
+    return row
+
+
+class VocabularyBulkImporter:
+    """
+    Set-based vocabulary import. Items are buffered into chunks; each chunk
+    costs one query to prefetch the rows it touches and one
+    INSERT ... ON CONFLICT DO UPDATE, instead of a SELECT per item. Nothing
+    is committed here: the caller owns the transaction.
+
+    `source_name` may be set late (a streamed body can carry it after the
+    items); rows flushed before then are back-filled in `finish`.
+    """
+
+    def __init__(self, db: Session, source_name: Optional[str] = None, chunk_size: int = UPSERT_CHUNK_SIZE):
+        self.db = db
+        self.source_name = source_name
+        self.chunk_size = chunk_size
+        self.table = VocabularyItem.__table__
+        self.inserted = 0
+        self.updated = 0
+        self._pending: List[VocabularyItemInput] = []
+        self._unsourced: List[str] = []
+
+    def add(self, item: VocabularyItemInput):
+        self._pending.append(item)
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        items, self._pending = self._pending, []
+        now = int(datetime.now().timestamp())
+
+        ids = list(dict.fromkeys(item.word.lower().strip() for item in items))
+        columns = [self.table.c[name] for name in _PREFETCH_COLUMNS]
+        existing = {
+            row["id"]: dict(row)
+            for row in self.db.execute(select(*columns).where(self.table.c.id.in_(ids))).mappings()
+        }
+
+        # Merge in order, so repeated words in one batch behave as sequential upserts
+        merged: Dict[str, dict] = {}
+        for item in items:
+            vocab_id = item.word.lower().strip()
+            row = merged.get(vocab_id) or existing.get(vocab_id) or new_vocabulary_row(vocab_id, item.word)
+            merged[vocab_id] = merge_vocabulary_item(row, item, self.source_name, now)
+
+        rows = [{name: row[name] for name in VOCABULARY_UPSERT_COLUMNS} for row in merged.values()]
+        stmt = upsert_insert(self.db, self.table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.table.c.id],
+            set_={name: stmt.excluded[name] for name in VOCABULARY_UPSERT_COLUMNS if name != "id"},
+        )
+        self.db.execute(stmt)
+
+        self.updated += sum(1 for vocab_id in merged if vocab_id in existing)
+        self.inserted += sum(1 for vocab_id in merged if vocab_id not in existing)
+        if self.source_name is None:
+            self._unsourced.extend(merged)
+
+    def finish(self) -> dict:
+        """Flush the last chunk and back-fill generation_source; returns the counts."""
+        self.flush()
+        if self._unsourced and self.source_name is not None:
+            for start in range(0, len(self._unsourced), self.chunk_size):
+                ids = self._unsourced[start:start + self.chunk_size]
+                self.db.execute(
+                    update(self.table)
+                    .where(self.table.c.id.in_(ids))
+                    .values(generation_source=self.source_name)
+                )
+        self._unsourced = []
+        return {"inserted": self.inserted, "updated": self.updated}
+
+
+def grammar_row(topic: GrammarTopicInput, now: int) -> dict:
+    """Column values for an imported grammar topic, including its content hash."""
+    content = [section.model_dump() for section in topic.sections]
+    return {
+        "id": topic.id,
+        "title": topic.title,
+        "description": topic.description,
+        "sequence_order": topic.sequence_order,
+        "content_json": content,
+        "exercises_json": topic.exercises,
+        "content_hash": grammar_content_hash(
+            topic.title, topic.description, topic.sequence_order, content, topic.exercises
+        ),
+        "last_updated": now,
+    }
+
+
+def upsert_grammar_topics(db: Session, topics: List[GrammarTopicInput]) -> dict:
+    """
+    Upsert grammar topics by content hash. Topics whose stored hash matches
+    are left alone (last_updated included); new and changed ones are written
+    with a single INSERT ... ON CONFLICT DO UPDATE. Nothing is committed here.
+    Returns the inserted / updated / unchanged counts.
+    """
+    now = int(datetime.now().timestamp())
+    table = GrammarTopic.__table__
+
+    # Last occurrence wins if a topic id is repeated
+    rows = {topic.id: grammar_row(topic, now) for topic in topics}
+    stored = dict(db.execute(
+        select(table.c.id, table.c.content_hash).where(table.c.id.in_(list(rows)))
+    ).all()) if rows else {}
+
+    changed = [row for topic_id, row in rows.items() if stored.get(topic_id) != row["content_hash"]]
+    counts = {
+        "inserted": sum(1 for row in changed if row["id"] not in stored),
+        "updated": sum(1 for row in changed if row["id"] in stored),
+        "unchanged": len(rows) - len(changed),
+    }
+
+    if changed:
+        stmt = upsert_insert(db, table).values(changed)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={name: stmt.excluded[name] for name in changed[0] if name != "id"},
+            # Guard against a concurrent import having written the same content
+            where=table.c.content_hash.is_distinct_from(stmt.excluded.content_hash),
+        )
+        db.execute(stmt)
+
+    return counts
+
+
+def backfill_content_hashes(db: Session, chunk_size: int = UPSERT_CHUNK_SIZE) -> int:
+    """
+    One-off backfill (scripts/backfill_content_hashes.py): recompute the
+    content hash of every vocabulary item and grammar topic and rewrite the
+    stored ones that are missing or stale, e.g. rows written before hashing
+    or edited outside the import API. Imports hash the rows they upsert, so
+    this is not part of any request. Nothing is committed here; returns the
+    number of rows fixed.
+    """
+    vocab = VocabularyItem.__table__
+    rows = db.execute(
+        select(vocab.c.id, vocab.c.content_hash, *[vocab.c[name] for name in VOCABULARY_HASH_FIELDS])
+    ).mappings()
+    stale_vocab = [
+        {"row_id": row["id"], "new_hash": new_hash}
+        for row in rows
+        if (new_hash := vocabulary_row_hash(row)) != row["content_hash"]
+    ]
+
+    grammar = GrammarTopic.__table__
+    rows = db.execute(select(
+        grammar.c.id, grammar.c.content_hash, grammar.c.title, grammar.c.description,
+        grammar.c.sequence_order, grammar.c.content_json, grammar.c.exercises_json,
+    )).mappings()
+    stale_grammar = [
+        {"row_id": row["id"], "new_hash": new_hash}
+        for row in rows
+        if (new_hash := grammar_content_hash(
+            row["title"], row["description"], row["sequence_order"], row["content_json"], row["exercises_json"]
+        )) != row["content_hash"]
+    ]
+
+    for table, stale in ((vocab, stale_vocab), (grammar, stale_grammar)):
+        stmt = update(table).where(table.c.id == bindparam("row_id")).values(content_hash=bindparam("new_hash"))
+        for start in range(0, len(stale), chunk_size):
+            db.execute(stmt, stale[start:start + chunk_size])
+    return len(stale_vocab) + len(stale_grammar)
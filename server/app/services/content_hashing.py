@@ -0,0 +1,46 @@
+import hashlib
+import json
+from typing import Any
+
+# Columns that end up in a content pack. Anything else (generation_source,
+# last_updated, ...) is bookkeeping and must not make an item look changed.
+# audio_learn_path is left out: the packager fills it in, and the clips a pack
+# carries are tracked by their own asset ids.
+VOCABULARY_HASH_FIELDS = [
+    "word", "article", "gender", "plural_form", "part_of_speech", "translation_en",
+    "example_sentences", "priority", "theme", "order_index",
+    "kaikki_data", "kaikki_audio_path",
+]
+
+
+def stable_hash(value: Any) -> str:
+    """SHA-256 of a JSON-serializable value, independent of key order."""
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def vocabulary_content_hash(item) -> str:
+    """Content hash of a VocabularyItem (or any object with the same attributes)."""
+    return stable_hash({f: getattr(item, f, None) for f in VOCABULARY_HASH_FIELDS})
+
+
+def vocabulary_row_hash(row: dict) -> str:
+    """Content hash of a vocabulary row given as a column -> value mapping."""
+    return stable_hash({f: row.get(f) for f in VOCABULARY_HASH_FIELDS})
+
+
+def grammar_content_hash(title, description, sequence_order, content, exercises) -> str:
+    """Content hash of a grammar topic, as stored in GrammarTopic or received on import."""
+    return stable_hash({
+        "title": title,
+        "description": description,
+        "sequence_order": sequence_order,
+        "content": content,
+        "exercises": exercises,
+    })
+
+
+def grammar_topic_hash(topic) -> str:
+    return grammar_content_hash(
+        topic.title, topic.description, topic.sequence_order, topic.content_json, topic.exercises_json
+    )
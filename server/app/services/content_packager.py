@@ -1,225 +1,369 @@
+import heapq
 import json
 import zipfile
-import shutil
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from datetime import datetime
+from app.config import settings
 from app.models.vocabulary import VocabularyItem
-from app.services.audio_generator import AudioGenerator
+from app.services.audio_generator import AudioGenerator, SynthesisJob
+from app.services.asset_store import AssetStore
+from app.services.audio_audit import AudioAudit
+from app.services.audio_store import AudioStore, open_audio_store
+from app.services.content_hashing import vocabulary_content_hash, grammar_topic_hash
+from app.services.pack_catalog import (
+    PackCatalog, catalog_entry, dictionary_pack_filename, file_sha256, full_pack_filename, variant_pack_filename
+)
 from sqlalchemy.orm import Session
+from tempfile import NamedTemporaryFile
 import logging
-import time
 
 logger = logging.getLogger(__name__)
 
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
+import shutil
+
+
+@dataclass
+class SynthesisTask:
+    """An utterance with at least one encoding missing from the audio store."""
+    text: str
+    language: str
+    # Encoding profile -> (store key, path) still to render, all from one synthesis
+    outputs: Dict[str, Tuple[str, Path]] = field(default_factory=dict)
+
+    @property
+    def keys(self) -> List[str]:
+        return [key for key, _ in self.outputs.values()]
+
+
+@dataclass
+class AudioSource:
+    """A cached clip and where it goes in the archive."""
+    path: Path
+    arcname: str
+    # Audio store key for synthesized clips; None for pre-recorded files
+    key: Optional[str] = None
+    # True while the clip still has to be synthesized (see BuildPlan.tasks)
+    pending: bool = False
+    # Same clip in other encoding profiles (synthesized clips only), for pack variants
+    variants: Dict[str, "AudioSource"] = field(default_factory=dict)
+
+    @property
+    def asset_id(self) -> str:
+        """Identity of the clip's bytes, used to tell whether a delta must ship it."""
+        return self.key or f"file:{self.path.name}"
+
+
+@dataclass
+class PlannedSentence:
+    sentence: dict
+    audio: Optional[AudioSource] = None
+
+
+@dataclass
+class PlannedItem:
+    """One vocabulary entry with all of its audio resolved by the scan."""
+    item: VocabularyItem
+    entry: dict
+    # Hash of the row as scanned; the row itself is never written by a build
+    content_hash: str = ""
+    audio: Optional[AudioSource] = None
+    sentences: List[PlannedSentence] = field(default_factory=list)
+    audio_en: Optional[AudioSource] = None
+    kaikki_audio: Optional[AudioSource] = None
+    # Clips that made it into the pack, filled in by assembly
+    assets: List[AudioSource] = field(default_factory=list)
+    # Kaikki data and clip moved to the dictionary pack (split builds only)
+    dictionary: Optional[dict] = None
+    dictionary_assets: List[AudioSource] = field(default_factory=list)
+
+
+@dataclass
+class BuildPlan:
+    """
+    Output of the scan pass. Assembly consumes it as-is: every cache path,
+    archive name and serialized entry is resolved here, once.
+    """
+    items: List[PlannedItem] = field(default_factory=list)
+    # Default-profile blob key -> task; identical clips are synthesized once
+    tasks: Dict[str, SynthesisTask] = field(default_factory=dict)
+    # Blob keys (of any profile) whose synthesis failed
+    failed: Set[str] = field(default_factory=set)
+
+    def available(self, source: Optional[AudioSource]) -> bool:
+        return source is not None and not (source.pending and source.key in self.failed)
+
+    def pending_keys(self) -> Set[str]:
+        return {key for task in self.tasks.values() for key in task.keys}
+
+    def variant(self, source: AudioSource, profile: str) -> AudioSource:
+        """`source` in encoding `profile`, or `source` itself if it has no usable rendering in it."""
+        variant = source.variants.get(profile)
+        return variant if self.available(variant) else source
+
+
+# Utterances per Piper session (see AudioGenerator.generate_batch)
+SYNTHESIS_BATCH_SIZE = 32
+
+
+def synthesize_batch(
+    audio_gen: AudioGenerator, store: AudioStore, language: str, clips: List[Tuple[str, Dict[str, str]]]
+) -> List[Optional[str]]:
+    """
+    Render the encodings (profile -> store key) of a batch of same-language
+    utterances that aren't in the store yet, through one Piper session, and
+    publish them. Returns one entry per clip: None on success, else the error.
+    """
+    errors: List[Optional[str]] = [None] * len(clips)
+    jobs, pending = [], []
+    for idx, (text, outputs) in enumerate(clips):
+        missing = {profile: key for profile, key in outputs.items() if not store.fetch(key)}
+        if not missing:
+            continue
+        (profile, key), *rest = missing.items()
+        jobs.append(SynthesisJob(text, store.path_for(key), profile, {p: store.path_for(k) for p, k in rest}))
+        pending.append((idx, missing))
+
+    for (idx, missing), error in zip(pending, audio_gen.generate_batch(jobs, language)):
+        if error is None:
+            try:
+                for key in missing.values():
+                    store.publish(key)
+            except Exception as e:
+                error = f"publishing failed: {e}"
+        errors[idx] = error
+    return errors
+
+
+def batch_by_language(items: list, language_of: Callable, workers: int) -> List[Tuple[str, list]]:
+    """
+    Group `items` by language and cut each group into batches of at most
+    SYNTHESIS_BATCH_SIZE, smaller when needed to give every worker a batch.
+    """
+    groups: Dict[str, list] = {}
+    for item in items:
+        groups.setdefault(language_of(item), []).append(item)
+    batches = []
+    for language, group in groups.items():
+        size = max(1, min(SYNTHESIS_BATCH_SIZE, -(-len(group) // max(1, workers))))
+        batches.extend((language, group[i:i + size]) for i in range(0, len(group), size))
+    return batches
+
+
+# Layout of the JSON documents inside a pack, advertised as manifest["format"].
+# 1.0: pretty-printed vocabulary.json / grammar.json arrays (what shipped clients read).
+# 2.0: compact newline-delimited JSON, one record per line, with Kaikki sense
+#      data in its own kaikki.ndjson, so clients can stream-parse and insert
+#      in batches.
+PACK_FORMATS = ("1.0", "2.0")
+
+_NDJSON_FLUSH_LINES = 1000
+
+# Fixed timestamp for every archive entry (the earliest a ZIP header can
+# hold), so identical content always produces identical pack bytes
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+def zip_entry(name: str, compress_type: int = zipfile.ZIP_DEFLATED) -> zipfile.ZipInfo:
+    """Archive member header that carries nothing from the build host (time, permissions)."""
+    info = zipfile.ZipInfo(name, date_time=ZIP_EPOCH)
+    info.compress_type = compress_type
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def _write_ndjson(zf: zipfile.ZipFile, name: str, records, sort_keys: bool = False) -> None:
+    with zf.open(zip_entry(name), "w") as f:
+        lines = []
+        for record in records:
+            lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys))
+            if len(lines) >= _NDJSON_FLUSH_LINES:
+                f.write(("\n".join(lines) + "\n").encode("utf-8"))
+                lines = []
+        if lines:
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def _same_bytes(a: Path, b: Path) -> bool:
+    return a.stat().st_size == b.stat().st_size and file_sha256(a) == file_sha256(b)
+
+
+def write_pack_documents(
+    zf: zipfile.ZipFile, pack_format: str, vocabulary: list, grammar: list, sort_keys: bool = False
+) -> Dict[str, str]:
+    """Write the vocabulary and grammar documents in `pack_format`; returns {document: archive name}."""
+    if pack_format == "1.0":
+        zf.writestr(zip_entry("vocabulary.json"), json.dumps(vocabulary, ensure_ascii=False, indent=2, sort_keys=sort_keys))
+        zf.writestr(zip_entry("grammar.json"), json.dumps(grammar, ensure_ascii=False, indent=2, sort_keys=sort_keys))
+        return {"vocabulary": "vocabulary.json", "grammar": "grammar.json"}
+
+    if pack_format == "2.0":
+        files = {"vocabulary": "vocabulary.ndjson", "grammar": "grammar.ndjson"}
+        _write_ndjson(zf, "vocabulary.ndjson", (
+            {k: v for k, v in entry.items() if k != "kaikki_data"} for entry in vocabulary
+        ), sort_keys)
+        # Split builds carry Kaikki data in the dictionary pack instead
+        if any(entry.get("kaikki_data") for entry in vocabulary):
+            _write_ndjson(zf, "kaikki.ndjson", (
+                {"id": entry["id"], "kaikki_data": entry["kaikki_data"]}
+                for entry in vocabulary if entry.get("kaikki_data")
+            ), sort_keys)
+            files["kaikki"] = "kaikki.ndjson"
+        _write_ndjson(zf, "grammar.ndjson", grammar, sort_keys)
+        return files
+
+    raise ValueError(f"Unknown pack format '{pack_format}' (expected one of {PACK_FORMATS})")
+
+
+def write_dictionary_documents(
+    zf: zipfile.ZipFile, pack_format: str, records: list, sort_keys: bool = False
+) -> Dict[str, str]:
+    """Write the dictionary pack's {id, kaikki_data, kaikki_audio} records in `pack_format`."""
+    if pack_format == "1.0":
+        zf.writestr(zip_entry("dictionary.json"), json.dumps(records, ensure_ascii=False, indent=2, sort_keys=sort_keys))
+        return {"dictionary": "dictionary.json"}
+    if pack_format == "2.0":
+        _write_ndjson(zf, "kaikki.ndjson", records, sort_keys)
+        return {"dictionary": "kaikki.ndjson"}
+    raise ValueError(f"Unknown pack format '{pack_format}' (expected one of {PACK_FORMATS})")
 
-# Helper for parallel execution needs to be top-level
-def _generate_audio_task(args):
-    text, output_path, language = args  # Added language
-    if output_path.exists():
-        return True, str(output_path)
-        
-    # Initialize generator inside the worker process
-    gen = AudioGenerator()
-    try:
-        gen.generate_audio(text, output_path, language=language)
-        return True, str(output_path)
-    except Exception as e:
-        return False, f"Error generating '{text}': {str(e)}"
 
 class ContentPackager:
     """
     Generates downloadable content packs for Android client.
     Uses a persistent cache for audio files to speed up generation.
     """
-    
-    def __init__(self, db: Session, output_dir: Path, cache_dir: Optional[Path] = None):
+
+    PHASES = ("scan", "synthesize", "assemble", "zip")
+
+    def __init__(
+        self,
+        db: Session,
+        output_dir: Path,
+        cache_dir: Optional[Path] = None,
+        audio_gen: Optional[AudioGenerator] = None,
+        progress: Optional[Callable[[str, int, int], None]] = None,
+        audio_store: Optional[AudioStore] = None,
+        pack_format: Optional[str] = None,
+        split_dictionary: Optional[bool] = None,
+        deterministic: Optional[bool] = None,
+        audio_variants: Optional[List[str]] = None,
+        preflight: Optional[str] = None
+    ):
         self.db = db
+        # Document layout inside the pack (see PACK_FORMATS)
+        self.pack_format = pack_format or settings.PACK_FORMAT
+        if self.pack_format not in PACK_FORMATS:
+            raise ValueError(f"Unknown pack format '{self.pack_format}' (expected one of {PACK_FORMATS})")
+        # Ship Kaikki senses and clips in a separate dictionary pack
+        self.split_dictionary = settings.PACK_SPLIT_DICTIONARY if split_dictionary is None else split_dictionary
+        # Reproducible builds: generated_at comes from the content and JSON
+        # keys are sorted, so unchanged content rebuilds to identical bytes
+        self.deterministic = settings.PACK_DETERMINISTIC if deterministic is None else deterministic
+        # Audio compatibility check of every packed clip: "off", "check" or "fix"
+        self.preflight = (preflight or settings.PACK_AUDIO_PREFLIGHT).lower()
+        if self.preflight not in ("off", "check", "fix"):
+            raise ValueError(f"Unknown audio pre-flight mode '{self.preflight}' (expected off, check or fix)")
+        # Called as progress(phase, done, total) with phase in PHASES
+        self.progress = progress
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        
+
         # Persistent cache directory (defaults to output_dir/../cache)
         self.cache_dir = cache_dir or self.output_dir.parent / "audio_cache"
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Pre-recorded clips (e.g. Anki exports) referenced by filename
         self.cache_vocab_dir = self.cache_dir / "vocab"
         self.cache_sent_dir = self.cache_dir / "sentences"
-        self.cache_en_dir = self.cache_dir / "english"  # NEW: English translations
         self.cache_vocab_dir.mkdir(exist_ok=True)
         self.cache_sent_dir.mkdir(exist_ok=True)
-        self.cache_en_dir.mkdir(exist_ok=True)
-        
-        self.audio_gen = AudioGenerator()
-        
-        # Staging for ZIP creation
-        self.staging_dir = self.output_dir / "staging"
-        self.audio_dir = self.staging_dir / "audio"
-        self.vocab_audio_dir = self.audio_dir / "vocab"
-        self.sentence_audio_dir = self.audio_dir / "sentences"
-        self.english_audio_dir = self.audio_dir / "english"
-        self.kaikki_audio_dir = self.audio_dir / "kaikki"
-        
-        self._init_staging()
-        
-    def _init_staging(self):
-        if self.staging_dir.exists():
-            shutil.rmtree(self.staging_dir, ignore_errors=True)
-            time.sleep(0.1) # Windows Safety
-        self.vocab_audio_dir.mkdir(parents=True, exist_ok=True)
-        self.sentence_audio_dir.mkdir(parents=True, exist_ok=True)
-        self.english_audio_dir.mkdir(parents=True, exist_ok=True)
-        self.kaikki_audio_dir.mkdir(parents=True, exist_ok=True)
-
-    def generate_pack(self, version_tag: str = "v1"):
-        items = self.db.query(VocabularyItem).order_by(VocabularyItem.order_index).all()
-        current_time = int(datetime.now().timestamp())
-        
-        pack_data = []
-        tasks = [] # List of (text, path) tuples
-        
-        # Pass 1: Identification & Task Collection
-        logger.info(f"Scanning {len(items)} items for audio generation...")
-        
-        for item in items:
-            # --- Vocab Audio ---
-            vocab_filename = f"{item.id}.ogg"
-            if item.audio_learn_path:
-                existing_name = Path(item.audio_learn_path).name
-                if (self.cache_vocab_dir / existing_name).exists():
-                     vocab_filename = existing_name
-
-            cached_path = self.cache_vocab_dir / vocab_filename
-            
-            if not cached_path.exists():
-                text = item.word
-                if item.article:
-                    text = f"{item.article} {item.word}"
-                tasks.append((text, cached_path, "de"))  # German vocabulary
+        # Synthesized clips, addressed by their synthesis inputs
+        self.audio_store = audio_store or open_audio_store(self.cache_dir / "store")
+        # Every packed clip, addressed by the hash of its bytes (served by /api/v1/assets)
+        self.asset_store = AssetStore(self.cache_dir / "assets")
 
-            # --- Sentence Audio ---
-            sentences = item.example_sentences
-            if isinstance(sentences, str):
-                try: sentences = json.loads(sentences)
-                except: sentences = []
-            
-            if sentences:
-                for idx, sent in enumerate(sentences):
-                    sent_text = sent.get("german", "")
-                    if not sent_text: continue
-                    
-                    sent_filename = f"{item.id}_sent_{idx+1}.ogg"
-                    if sent.get("original_audio") or sent.get("audio_path"):
-                         raw_path = sent.get("original_audio") or sent.get("audio_path")
-                         existing_sent_name = Path(raw_path).name
-                         if (self.cache_sent_dir / existing_sent_name).exists():
-                             sent_filename = existing_sent_name
-                         elif (self.cache_vocab_dir / existing_sent_name).exists():
-                             # Fallback if mixed
-                             pass
-
-                    cached_sent_path = self.cache_sent_dir / sent_filename
-                    
-                    if not cached_sent_path.exists():
-                        tasks.append((sent_text, cached_sent_path, "de"))  # German sentence
+        # A caller may share one long-lived synthesis engine across builds;
+        # otherwise we own the Piper pool and shut it down after each pack.
+        self._owns_audio_gen = audio_gen is None
+        self.audio_gen = audio_gen or AudioGenerator()
 
-            # --- English Translation Audio ---
-            if item.translation_en:
-                en_filename = f"{item.id}_en.ogg"
-                cached_en_path = self.cache_en_dir / en_filename
-                
-                if not cached_en_path.exists():
-                    tasks.append((item.translation_en, cached_en_path, "en"))  # English translation
+        # Extra encoding profiles, each rendered alongside the default one and
+        # shipped as its own pack variant (e.g. deutschstart_v1_lite.zip)
+        if audio_variants is None:
+            audio_variants = [p.strip() for p in settings.PACK_AUDIO_VARIANTS.split(",") if p.strip()]
+        self.audio_variants = [p for p in audio_variants if p != AudioGenerator.DEFAULT_PROFILE]
+        unknown = set(self.audio_variants) - set(AudioGenerator.ENCODING_PROFILES)
+        if unknown:
+            raise ValueError(f"Unknown audio variant(s) {sorted(unknown)} (expected any of {list(AudioGenerator.ENCODING_PROFILES)})")
 
+    def _report(self, phase: str, done: int, total: int):
+        if self.progress:
+            self.progress(phase, done, total)
 
-        # Pass 2: Parallel Generation
-        if tasks:
-            logger.info(f"Generating audio for {len(tasks)} missing files in parallel...")
-            # Use appropriate number of workers (e.g., CPU count)
-            # Since we are IO/CPU bound (piper is fast, ffmpeg is CPU), use CPU count.
-            max_workers = os.cpu_count() or 4
-            
-            with ProcessPoolExecutor(max_workers=max_workers) as executor:
-                futures = [executor.submit(_generate_audio_task, task) for task in tasks]
-                
-                for future in as_completed(futures):
-                    success, msg = future.result()
-                    if not success:
-                        logger.error(f"Gen Failed: {msg}")
-        else:
-            logger.info("All audio files cached. Skipping generation.")
+    @staticmethod
+    def _sentences(item: VocabularyItem) -> list:
+        sentences = item.example_sentences
+        if isinstance(sentences, str):
+            try: sentences = json.loads(sentences)
+            except: sentences = []
+        return sentences or []
 
-        # Pass 3: Assembly (Copying files)
-        logger.info("Assembling pack...")
-        
-        for item in items:
-            # 1. Vocab Audio
-            vocab_filename = f"{item.id}.ogg"
-            if item.audio_learn_path:
-                existing_name = Path(item.audio_learn_path).name
-                if (self.cache_vocab_dir / existing_name).exists():
-                     vocab_filename = existing_name
-
-            cached_path = self.cache_vocab_dir / vocab_filename
-            staging_path = self.vocab_audio_dir / vocab_filename
-            
-            audio_rel_path = None
-            if cached_path.exists():
-                staging_path.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy(cached_path, staging_path)
-                audio_rel_path = f"audio/vocab/{vocab_filename}"
-                
-                if not item.audio_learn_path:
-                     item.audio_learn_path = audio_rel_path
-
-
-            # 2. Sentence Audio
-            sentences = item.example_sentences
-            if isinstance(sentences, str):
-                try: sentences = json.loads(sentences)
-                except: sentences = []
-            
-            processed_sentences = []
-            if sentences:
-                for idx, sent in enumerate(sentences):
-                    sent_text = sent.get("german", "")
-                    if not sent_text: continue
-                    
-                    sent_filename = f"{item.id}_sent_{idx+1}.ogg"
-                    if sent.get("original_audio") or sent.get("audio_path"):
-                         raw_path = sent.get("original_audio") or sent.get("audio_path")
-                         existing_sent_name = Path(raw_path).name
-                         if (self.cache_sent_dir / existing_sent_name).exists():
-                             sent_filename = existing_sent_name
-
-                    cached_sent_path = self.cache_sent_dir / sent_filename
-                    staging_sent_path = self.sentence_audio_dir / sent_filename
-                    
-                    sent_rel_path = None
-                    if cached_sent_path.exists():
-                        staging_sent_path.parent.mkdir(parents=True, exist_ok=True)
-                        shutil.copy(cached_sent_path, staging_sent_path)
-                        sent_rel_path = f"audio/sentences/{sent_filename}"
-                    
-                    if sent_rel_path:
-                        sent["audio_path"] = sent_rel_path
-                        if "original_audio" in sent:
-                            del sent["original_audio"]
-                    
-                    processed_sentences.append(sent)
-            
-            # 3. English Translation Audio
-            en_audio_rel_path = None
-            if item.translation_en:
-                en_filename = f"{item.id}_en.ogg"
-                cached_en_path = self.cache_en_dir / en_filename
-                staging_en_path = self.english_audio_dir / en_filename
-                
-                if cached_en_path.exists():
-                    staging_en_path.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.copy(cached_en_path, staging_en_path)
-                    en_audio_rel_path = f"audio/english/{en_filename}"
-            
+    def _legacy_vocab_audio(self, item: VocabularyItem) -> Optional[Path]:
+        """Pre-recorded word audio, if the item references a clip in the cache."""
+        if item.audio_learn_path:
+            path = self.cache_vocab_dir / Path(item.audio_learn_path).name
+            if path.exists():
+                return path
+        return None
+
+    def _legacy_sentence_audio(self, sent: dict) -> Optional[Path]:
+        """Pre-recorded sentence audio, if the sentence references a clip in the cache."""
+        raw_path = sent.get("original_audio") or sent.get("audio_path")
+        if raw_path:
+            path = self.cache_sent_dir / Path(raw_path).name
+            if path.exists():
+                return path
+        return None
+
+    def _plan_tts(self, plan: BuildPlan, voices: dict, text: str, language: str, arcname: str) -> AudioSource:
+        """
+        The clip for `text`, queueing synthesis of whichever of its encodings
+        (default profile plus variants) aren't stored yet.
+        """
+        key = self.audio_store.clip_key(text, voices[language, AudioGenerator.DEFAULT_PROFILE])
+        source = self._plan_encoding(plan, key, AudioGenerator.DEFAULT_PROFILE, key, text, language, arcname)
+        for profile in self.audio_variants:
+            variant_key = self.audio_store.clip_key(text, voices[language, profile])
+            source.variants[profile] = self._plan_encoding(plan, key, profile, variant_key, text, language, arcname)
+        return source
+
+    def _plan_encoding(
+        self, plan: BuildPlan, task_key: str, profile: str, key: str, text: str, language: str, arcname: str
+    ) -> AudioSource:
+        path = self.audio_store.path_for(key)
+        task = plan.tasks.get(task_key)
+        if task is not None and profile in task.outputs:
+            return AudioSource(path, arcname, key=key, pending=True)
+        if self.audio_store.fetch(key):
+            return AudioSource(path, arcname, key=key)
+
+        if task is None:
+            task = plan.tasks[task_key] = SynthesisTask(text, language)
+        task.outputs[profile] = (key, path)
+        return AudioSource(path, arcname, key=key, pending=True)
+
+    def _scan(self, items: List[VocabularyItem]) -> BuildPlan:
+        plan = BuildPlan()
+        voices = {
+            (lang, profile): self.audio_gen.voice_settings(lang, profile)
+            for lang in ("de", "en") for profile in (AudioGenerator.DEFAULT_PROFILE, *self.audio_variants)
+        }
+        processed_dir = self.output_dir.parent
+
+        for done, item in enumerate(items, 1):
             entry = {
                 "id": item.id,
                 "word": item.word,
@@ -228,49 +372,295 @@ class ContentPackager:
                 "plural": item.plural_form,
                 "pos": item.part_of_speech,
                 "trans_en": item.translation_en,
-                "sentences": processed_sentences,
+                "sentences": [],
                 "priority": item.priority,
                 "theme": item.theme,
                 "order_index": item.order_index
             }
-            if audio_rel_path:
-                entry["audio"] = audio_rel_path
-            if en_audio_rel_path:  # NEW
-                entry["audio_en"] = en_audio_rel_path
-                
-            pack_data.append(entry)
-
-            # 4. Kaikki Audio (Pre-downloaded)
+            # Computed rather than read, in case the row was edited outside the import API
+            planned = PlannedItem(item=item, entry=entry, content_hash=vocabulary_content_hash(item))
+
+            # --- Vocab Audio ---
+            legacy_path = self._legacy_vocab_audio(item)
+            if legacy_path:
+                planned.audio = AudioSource(legacy_path, f"audio/vocab/{legacy_path.name}")
+            else:
+                text = item.word
+                if item.article:
+                    text = f"{item.article} {item.word}"
+                planned.audio = self._plan_tts(
+                    plan, voices, text, "de", f"audio/vocab/{item.id}.ogg"
+                )  # German vocabulary
+
+            # --- Sentence Audio ---
+            for idx, sent in enumerate(self._sentences(item)):
+                sent_text = sent.get("german", "")
+                if not sent_text: continue
+
+                sent = dict(sent)
+                legacy_path = self._legacy_sentence_audio(sent)
+                if legacy_path:
+                    audio = AudioSource(legacy_path, f"audio/sentences/{legacy_path.name}")
+                else:
+                    audio = self._plan_tts(
+                        plan, voices, sent_text, "de",
+                        f"audio/sentences/{item.id}_sent_{idx+1}.ogg"
+                    )  # German sentence
+                planned.sentences.append(PlannedSentence(sent, audio))
+
+            # --- English Translation Audio ---
+            if item.translation_en:
+                planned.audio_en = self._plan_tts(
+                    plan, voices, item.translation_en, "en",
+                    f"audio/english/{item.id}_en.ogg"
+                )  # English translation
+
+            # --- Kaikki Audio (Pre-downloaded) ---
+            # kaikki_audio_path is relative to the processed data dir: audio/kaikki/filename.ogg
             if item.kaikki_audio_path:
-                # kaikki_audio_path is relative: audio/kaikki/filename.ogg
-                # The file should exist in the data/processed/audio/kaikki dir on the server
-                # We need to map this.
-                # Assuming item.kaikki_audio_path is "audio/kaikki/foo.ogg"
-                # The file is at self.output_dir.parent / "audio" / "kaikki" / "foo.ogg"
-                # Wait, output_dir is "data/processed/packs". parent is "data/processed".
-                
-                # We need a robust way to find source file. 
-                # PROCESSED_DIR/audio/kaikki/...
-                processed_dir = self.output_dir.parent 
                 source_full_path = processed_dir / item.kaikki_audio_path
-                
                 if source_full_path.exists():
-                    # Destination in zip
-                    staging_kaikki_path = self.staging_dir / item.kaikki_audio_path
-                    staging_kaikki_path.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.copy(source_full_path, staging_kaikki_path)
-                    
-                    entry["kaikki_audio"] = item.kaikki_audio_path
-            
+                    planned.kaikki_audio = AudioSource(source_full_path, item.kaikki_audio_path)
+
             if item.kaikki_data:
                 entry["kaikki_data"] = item.kaikki_data
 
-        # 3. Write data.json
-        with open(self.staging_dir / "vocabulary.json", "w", encoding="utf-8") as f:
-            json.dump(pack_data, f, ensure_ascii=False, indent=2)
+            plan.items.append(planned)
+            self._report("scan", done, len(items))
+
+        return plan
+
+    def _generate_audio_batch(self, language: str, tasks: List[SynthesisTask]) -> List[Optional[str]]:
+        clips = [(task.text, {profile: key for profile, (key, _) in task.outputs.items()}) for task in tasks]
+        try:
+            return synthesize_batch(self.audio_gen, self.audio_store, language, clips)
+        except Exception as e:
+            return [str(e)] * len(tasks)
+
+    def _synthesize(self, plan: BuildPlan):
+        # Keys that already failed elsewhere (e.g. on a fan-out worker) aren't retried
+        tasks = {key: task for key, task in plan.tasks.items() if not plan.failed.intersection(task.keys)}
+        if not tasks:
+            logger.info("All audio files cached. Skipping generation.")
+            self._report("synthesize", 0, 0)
+            return
+
+        # Tasks are grouped by language and cut into batches; each thread
+        # holds one resident Piper worker for a whole batch, so CPU count
+        # threads keep one Piper process per core busy.
+        max_workers = os.cpu_count() or 4
+        batches = batch_by_language(list(tasks.values()), lambda t: t.language, max_workers)
+        logger.info(f"Generating audio for {len(tasks)} missing files in {len(batches)} batches...")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._generate_audio_batch, language, batch): batch
+                for language, batch in batches
+            }
+
+            done = 0
+            for future in as_completed(futures):
+                batch = futures[future]
+                for task, error in zip(batch, future.result()):
+                    if error is not None:
+                        plan.failed.update(task.keys)
+                        logger.error(f"Gen Failed: Error generating '{task.text}': {error}")
+                done += len(batch)
+                self._report("synthesize", done, len(tasks))
+
+    def _preflight(self, sources: List[AudioSource]):
+        """
+        Check every clip about to be packed with the audio audit (sharing its
+        index with scripts/fix_audio_compatibility.py, so unchanged clips are
+        not re-read) and, in "fix" mode, resample incompatible ones in place.
+        """
+        audit = AudioAudit(self.output_dir.parent / "audio_audit.json")
+        paths = list(dict.fromkeys(source.path for source in sources))
+        report = audit.audit(paths, fix=self.preflight == "fix")
+        logger.info(
+            f"Audio pre-flight: {report.checked} clips ({report.cached} unchanged), "
+            f"{len(report.incompatible)} incompatible, {len(report.fixed)} fixed, {len(report.unreadable)} unreadable."
+        )
+        unresolved = [path for path, _ in report.incompatible if path not in report.fixed]
+        if unresolved:
+            logger.warning(
+                f"{len(unresolved)} clips have an unsupported sample rate (e.g. {unresolved[0].name}); "
+                f"run scripts/fix_audio_compatibility.py or build with PACK_AUDIO_PREFLIGHT=fix."
+            )
 
-        # 4. Write grammar.json
+    @staticmethod
+    def _snapshot_path(output_dir: Path, version_tag: str) -> Path:
+        return output_dir / f"deutschstart_{version_tag}.index.json"
+
+    @staticmethod
+    def asset_manifest_path(output_dir: Path, version_tag: str) -> Path:
+        return output_dir / f"deutschstart_{version_tag}.assets.json"
+
+    def _write_asset_manifest(self, version_tag: str, generated_at: int, assets: List[AudioSource]) -> Path:
+        """
+        Publish every clip of the pack to the asset store and write the list
+        of (path, hash, size) a client needs to fetch only the clips it lacks.
+        """
+        entries = {}
+        for source in assets:
+            if source.arcname not in entries:
+                digest, size = self.asset_store.add_file(source.path)
+                entries[source.arcname] = {"path": source.arcname, "hash": digest, "size": size}
+
+        manifest = {
+            "version": version_tag,
+            "generated_at": generated_at,
+            "assets": sorted(entries.values(), key=lambda e: e["path"]),
+            "total_size": sum(e["size"] for e in entries.values()),
+        }
+        path = self.asset_manifest_path(self.output_dir, version_tag)
+        with NamedTemporaryFile("w", dir=self.output_dir, prefix=f".{path.name}.", suffix=".part",
+                                delete=False, encoding="utf-8") as tmp:
+            json.dump(manifest, tmp, ensure_ascii=False)
+        os.replace(tmp.name, path)
+        return path
+
+    def _load_snapshot(self, version_tag: str) -> Optional[dict]:
+        path = self._snapshot_path(self.output_dir, version_tag)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _previous_version(self, version_tag: str) -> Optional[str]:
+        """The most recently built version other than `version_tag`."""
+        snapshots = [s for s in load_pack_snapshots(self.output_dir) if s["version"] != version_tag]
+        if not snapshots:
+            return None
+        return max(snapshots, key=lambda s: s["generated_at"])["version"]
+
+    def _write_archive(
+        self, zip_filename: str, manifest: dict, assets: List[AudioSource],
+        write_documents: Callable[[zipfile.ZipFile], Dict[str, str]]
+    ) -> Tuple[Path, bool]:
+        """
+        Write a pack archive: its clips (sorted by archive name), the documents
+        `write_documents` adds and the manifest. It is written to a temp file
+        next to its destination and renamed into place once complete, so
+        readers never see a partial pack. Returns the path and whether the
+        archive changed; a byte-identical rebuild leaves the existing file
+        (and its mtime) alone.
+        """
+        zip_path = self.output_dir / zip_filename
+        tmp = NamedTemporaryFile(dir=self.output_dir, prefix=f".{zip_filename}.", suffix=".part", delete=False)
+        tmp.close()
+        try:
+            with zipfile.ZipFile(tmp.name, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                written = set()
+                ordered = sorted(assets, key=lambda a: a.arcname)
+                for done, source in enumerate(ordered, 1):
+                    # Pre-recorded clips can be shared between items; store each once
+                    if source.arcname not in written:
+                        # OGG is already compressed, so store rather than deflate; copied
+                        # in chunks so large clips are never held in memory whole
+                        info = zip_entry(source.arcname, zipfile.ZIP_STORED)
+                        info.file_size = source.path.stat().st_size
+                        with open(source.path, "rb") as src, zf.open(info, "w") as dst:
+                            shutil.copyfileobj(src, dst)
+                        written.add(source.arcname)
+                    self._report("zip", done, len(ordered))
+
+                files = write_documents(zf)
+                if self.pack_format != "1.0":
+                    manifest = {**manifest, "files": files}
+                zf.writestr(zip_entry("manifest.json"), json.dumps(manifest, indent=2, sort_keys=self.deterministic))
+            if zip_path.exists() and _same_bytes(Path(tmp.name), zip_path):
+                Path(tmp.name).unlink()
+                return zip_path, False
+            os.replace(tmp.name, zip_path)
+        except BaseException:
+            Path(tmp.name).unlink(missing_ok=True)
+            raise
+        return zip_path, True
+
+    def plan_pack(self) -> BuildPlan:
+        """Scan the current content and work out which clips are still missing."""
+        items = self.db.query(VocabularyItem).order_by(VocabularyItem.order_index).all()
+        logger.info(f"Scanning {len(items)} items for audio generation...")
+        return self._scan(items)
+
+    def generate_pack(
+        self,
+        version_tag: str = "v1",
+        delta_bases: Optional[List[str]] = None,
+        failed_keys: Optional[Set[str]] = None
+    ):
+        """
+        Build the full pack for `version_tag`, plus a delta pack against each
+        version in `delta_bases` (default: the most recently built version).
+        `failed_keys` are clips whose synthesis already failed on another
+        worker; they are left out of the pack instead of being retried.
+        """
+        try:
+            return self._generate_pack(version_tag, delta_bases, failed_keys or set())
+        finally:
+            if self._owns_audio_gen:
+                self.audio_gen.close()
+
+    def _generate_pack(self, version_tag: str, delta_bases: Optional[List[str]], failed_keys: Set[str]):
         from app.models.grammar import GrammarTopic
+
+        if delta_bases is None:
+            previous = self._previous_version(version_tag)
+            delta_bases = [previous] if previous else []
+
+        # Pass 1: Scan -> build plan
+        plan = self.plan_pack()
+        plan.failed |= failed_keys & plan.pending_keys()
+
+        # Pass 2: Parallel Generation
+        self._synthesize(plan)
+
+        # Pass 3: Assembly (consumes the plan, no re-scan)
+        logger.info("Assembling pack...")
+
+        # 1. Vocabulary entries + the clips that go with them
+        snapshot = {"version": version_tag, "vocabulary": {}, "grammar": {}, "deltas": []}
+        for done, planned in enumerate(plan.items, 1):
+            item, entry = planned.item, planned.entry
+
+            if plan.available(planned.audio):
+                entry["audio"] = planned.audio.arcname
+                planned.assets.append(planned.audio)
+
+            for planned_sent in planned.sentences:
+                sent = planned_sent.sentence
+                if plan.available(planned_sent.audio):
+                    sent["audio_path"] = planned_sent.audio.arcname
+                    sent.pop("original_audio", None)
+                    planned.assets.append(planned_sent.audio)
+                entry["sentences"].append(sent)
+
+            if plan.available(planned.audio_en):
+                entry["audio_en"] = planned.audio_en.arcname
+                planned.assets.append(planned.audio_en)
+
+            if self.split_dictionary:
+                planned.dictionary = {"id": item.id}
+                if "kaikki_data" in entry:
+                    planned.dictionary["kaikki_data"] = entry.pop("kaikki_data")
+                if plan.available(planned.kaikki_audio):
+                    planned.dictionary["kaikki_audio"] = planned.kaikki_audio.arcname
+                    planned.dictionary_assets.append(planned.kaikki_audio)
+            elif plan.available(planned.kaikki_audio):
+                entry["kaikki_audio"] = planned.kaikki_audio.arcname
+                planned.assets.append(planned.kaikki_audio)
+
+            snapshot["vocabulary"][item.id] = {
+                "hash": planned.content_hash,
+                "assets": {a.arcname: a.asset_id for a in planned.assets},
+            }
+            self._report("assemble", done, len(plan.items))
+
+        pack_data = [planned.entry for planned in plan.items]
+        all_assets = [a for planned in plan.items for a in planned.assets]
+
+        # 2. Grammar topics
         grammar_topics = self.db.query(GrammarTopic).order_by(GrammarTopic.sequence_order).all()
         grammar_data = []
         for topic in grammar_topics:
@@ -282,27 +672,199 @@ class ContentPackager:
                 "content": topic.content_json, # Already list of dicts
                 "exercises": topic.exercises_json
             })
-            
-        with open(self.staging_dir / "grammar.json", "w", encoding="utf-8") as f:
-            json.dump(grammar_data, f, ensure_ascii=False, indent=2)
-            
-        # 4. Write manifest
+            snapshot["grammar"][topic.id] = grammar_topic_hash(topic)
+
+        if self.deterministic:
+            # Newest content change, so the same content always stamps the same time
+            stamps = [p.item.last_updated for p in plan.items] + [t.last_updated for t in grammar_topics]
+            current_time = max((t for t in stamps if t is not None), default=0)
+        else:
+            current_time = int(datetime.now().timestamp())
+        snapshot["generated_at"] = current_time
+
+        if self.preflight != "off":
+            self._preflight(
+                all_assets
+                + [a for p in plan.items for a in p.dictionary_assets]
+                + [plan.variant(a, profile) for profile in self.audio_variants for a in all_assets]
+            )
+
+        # 3. Dictionary pack (split builds), written first so the full pack
+        #    manifest can carry its checksum
+        dictionary_entry, dictionary_changed = None, False
+        if self.split_dictionary:
+            dictionary_entry, dictionary_changed = self._write_dictionary(version_tag, current_time, plan)
+
+        # 4. Full pack, and the same pack with each variant encoding of its clips
         manifest = {
             "version": version_tag,
             "generated_at": current_time,
             "item_count": len(pack_data),
-            "format": "1.0"
+            "grammar_count": len(grammar_data),
+            "format": self.pack_format
         }
-        with open(self.staging_dir / "manifest.json", "w", encoding="utf-8") as f:
-            json.dump(manifest, f, indent=2)
-            
-        # 5. Zip it
-        zip_filename = f"deutschstart_{version_tag}.zip"
-        zip_path = self.output_dir / zip_filename
-        
-        shutil.make_archive(str(zip_path.with_suffix('')), 'zip', self.staging_dir)
-        
-        # Cleanup staging (Keep cache!)
-        shutil.rmtree(self.staging_dir, ignore_errors=True)
-        
+        if dictionary_entry:
+            manifest["dictionary"] = {k: dictionary_entry[k] for k in ("filename", "size", "sha256")}
+
+        def write_documents(zf):
+            return write_pack_documents(zf, self.pack_format, pack_data, grammar_data, self.deterministic)
+
+        variant_entries, variants_changed = [], False
+        for profile in self.audio_variants:
+            variant_manifest = {**manifest, "type": "variant", "profile": profile}
+            variant_path, variant_changed = self._write_archive(
+                variant_pack_filename(version_tag, profile), variant_manifest,
+                [plan.variant(a, profile) for a in all_assets], write_documents
+            )
+            logger.info(f"Pack variant {variant_path.name} written ({variant_path.stat().st_size} bytes).")
+            variant_entries.append(catalog_entry(variant_path, variant_manifest))
+            variants_changed |= variant_changed
+        if variant_entries:
+            manifest["variants"] = {
+                e["profile"]: {k: e[k] for k in ("filename", "size", "sha256")} for e in variant_entries
+            }
+
+        zip_filename = full_pack_filename(version_tag)
+        zip_path, changed = self._write_archive(zip_filename, manifest, all_assets, write_documents)
+        catalog = PackCatalog(self.output_dir)
+        unchanged = not (changed or dictionary_changed or variants_changed)
+        if unchanged and self._already_published(catalog, version_tag, delta_bases):
+            logger.info(f"Pack {zip_filename} is unchanged since the last build, nothing to publish.")
+            return zip_path
+        logger.info(f"Pack {zip_filename} written with {len(pack_data)} items.")
+        parent = catalog.latest_version()
+        if parent == version_tag:
+            # Rebuilding the current version keeps its lineage
+            parent = (catalog.latest() or {}).get("parent_version")
+        published = [catalog_entry(zip_path, manifest, parent_version=parent)]
+        asset_manifest = self._write_asset_manifest(version_tag, current_time, all_assets)
+        published[0]["asset_manifest"] = asset_manifest.name
+        if dictionary_entry:
+            published.append(dictionary_entry)
+        published.extend(variant_entries)
+
+        # 5. Delta packs against earlier versions
+        for base_version in delta_bases:
+            base = self._load_snapshot(base_version)
+            if base is None:
+                logger.warning(f"No index for base version '{base_version}', skipping delta.")
+                continue
+            delta, delta_entry = self._write_delta(base, snapshot, plan, grammar_data)
+            snapshot["deltas"].append(delta)
+            published.append(delta_entry)
+
+        with open(self._snapshot_path(self.output_dir, version_tag), "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+
+        # Publish last, so the catalog never points at a pack without its index
+        catalog.publish(published, latest=version_tag)
         return zip_path
+
+    def _already_published(self, catalog: PackCatalog, version_tag: str, delta_bases: List[str]) -> bool:
+        """Whether `version_tag` is the published latest, with its index and every requested delta."""
+        if catalog.latest_version() != version_tag:
+            return False
+        snapshot = self._load_snapshot(version_tag)
+        if snapshot is None:
+            return False
+        return set(delta_bases) <= {d["base_version"] for d in snapshot["deltas"]}
+
+    def _write_dictionary(self, version_tag: str, generated_at: int, plan: BuildPlan) -> Tuple[dict, bool]:
+        """
+        Write the dictionary pack (Kaikki senses and pronunciations); returns
+        its catalog entry and whether it changed.
+        """
+        records = [p.dictionary for p in plan.items if len(p.dictionary) > 1]
+        assets = [a for p in plan.items for a in p.dictionary_assets]
+        manifest = {
+            "version": version_tag,
+            "type": "dictionary",
+            "generated_at": generated_at,
+            "item_count": len(records),
+            "format": self.pack_format,
+        }
+        zip_filename = dictionary_pack_filename(version_tag)
+        zip_path, changed = self._write_archive(
+            zip_filename, manifest, assets,
+            lambda zf: write_dictionary_documents(zf, self.pack_format, records, self.deterministic)
+        )
+        logger.info(f"Dictionary {zip_filename} written with {len(records)} entries, {len(assets)} clips.")
+        return catalog_entry(zip_path, manifest), changed
+
+    def _write_delta(self, base: dict, snapshot: dict, plan: BuildPlan, grammar_data: list):
+        """
+        Write a delta pack holding only what changed since `base`: added or
+        changed entries, the clips the base doesn't already have, and the ids
+        of removed entries. Returns its snapshot record and catalog entry.
+        """
+        base_vocab, base_grammar = base["vocabulary"], base["grammar"]
+        base_assets = {arc: asset for v in base_vocab.values() for arc, asset in v["assets"].items()}
+
+        changed = [p for p in plan.items if base_vocab.get(p.item.id) != snapshot["vocabulary"][p.item.id]]
+        assets = [a for p in changed for a in p.assets if base_assets.get(a.arcname) != a.asset_id]
+        changed_grammar = [g for g in grammar_data if base_grammar.get(g["id"]) != snapshot["grammar"][g["id"]]]
+
+        manifest = {
+            "version": snapshot["version"],
+            "base_version": base["version"],
+            "type": "delta",
+            "generated_at": snapshot["generated_at"],
+            "item_count": len(changed),
+            "grammar_count": len(changed_grammar),
+            "format": self.pack_format,
+            "removed": {
+                "vocabulary": sorted(set(base_vocab) - set(snapshot["vocabulary"])),
+                "grammar": sorted(set(base_grammar) - set(snapshot["grammar"])),
+            },
+        }
+        zip_filename = f"deutschstart_{base['version']}_to_{snapshot['version']}.zip"
+        zip_path, _ = self._write_archive(
+            zip_filename, manifest, assets,
+            lambda zf: write_pack_documents(zf, self.pack_format, [p.entry for p in changed], changed_grammar, self.deterministic)
+        )
+        logger.info(f"Delta {zip_filename}: {len(changed)} items, {len(changed_grammar)} topics, {len(assets)} clips.")
+
+        delta = {"base_version": base["version"], "filename": zip_filename, "size": zip_path.stat().st_size}
+        return delta, catalog_entry(zip_path, manifest)
+
+
+def load_pack_snapshots(packs_dir: Path) -> List[dict]:
+    """Load the per-version indexes written alongside each full pack."""
+    snapshots = []
+    for path in packs_dir.glob("deutschstart_*.index.json"):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Skipping unreadable pack index {path.name}: {e}")
+    return snapshots
+
+
+def find_delta_chain(snapshots: List[dict], from_version: str, to_version: str) -> Optional[List[dict]]:
+    """
+    Cheapest chain of delta packs (by total download size) that takes a
+    client from `from_version` to `to_version`. Returns [] when the versions
+    are equal and None when no chain exists.
+    """
+    # version -> [(delta, target version)]
+    edges = {}
+    for snap in snapshots:
+        for delta in snap.get("deltas", []):
+            edges.setdefault(delta["base_version"], []).append((delta, snap["version"]))
+
+    best = {from_version: 0}
+    heap = [(0, 0, from_version, [])]
+    counter = 1
+    while heap:
+        size, _, version, chain = heapq.heappop(heap)
+        if version == to_version:
+            return chain
+        if size > best.get(version, size):
+            continue
+        for delta, target in edges.get(version, []):
+            new_size = size + delta["size"]
+            if new_size < best.get(target, float("inf")):
+                best[target] = new_size
+                heapq.heappush(heap, (new_size, counter, target, chain + [{**delta, "version": target}]))
+                counter += 1
+    return None
@@ -0,0 +1,215 @@
+import csv
+import logging
+import sqlite3
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from app.services.kaikki_store import DICTIONARIES_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = DICTIONARIES_DIR / "daflex.sqlite3"
+
+CEFR_LEVELS = ("a1", "a2", "b1", "b2", "c1", "c2")
+
+DAFLEX_URL = "https://cental.uclouvain.be/cefrlex/cefrlex/daflex/autocomplete/TreeTagger%20-%20German/{word}/"
+DAFLEX_HEADERS = {
+    'accept': '*/*',
+    'accept-language': 'en-US,en;q=0.9',
+    'priority': 'u=1, i',
+    'referer': 'https://cental.uclouvain.be/cefrlex/daflex/search/',
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frequencies (
+    word TEXT PRIMARY KEY,
+    a1 REAL NOT NULL, a2 REAL NOT NULL, b1 REAL NOT NULL,
+    b2 REAL NOT NULL, c1 REAL NOT NULL, c2 REAL NOT NULL,
+    total REAL NOT NULL,
+    source TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+)
+"""
+
+
+@dataclass
+class WordFrequency:
+    """DAFlex counts of one word per CEFR level. All zero means DAFlex doesn't know it."""
+
+    word: str
+    a1: float = 0
+    a2: float = 0
+    b1: float = 0
+    b2: float = 0
+    c1: float = 0
+    c2: float = 0
+    total: float = 0
+    # "api" or "tsv", and when the counts were obtained (epoch seconds)
+    source: str = "api"
+    fetched_at: float = 0.0
+
+
+def normalize(word: str) -> str:
+    return word.strip().lower()
+
+
+def parse_daflex_response(word: str, data) -> WordFrequency:
+    """
+    An autocomplete response: [{'key': [A1, A2, B1, B2, C1, C2, Total], 'value': 'Word [POS]'}, ...].
+    Like the search page, the first result is taken.
+    """
+    record = WordFrequency(normalize(word), fetched_at=time.time())
+    if data and isinstance(data, list):
+        freqs = data[0].get("key", [])
+        if freqs and len(freqs) >= 7:
+            record.a1, record.a2, record.b1, record.b2, record.c1, record.c2, record.total = freqs[:7]
+    return record
+
+
+class FrequencyCache:
+    """
+    Persistent word -> DAFlex frequency cache (SQLite), filled from the
+    DAFlex API or a bulk CEFRLex TSV. Lookups are consulted before any
+    network call, and words DAFlex doesn't know are cached too.
+    """
+
+    def __init__(self, db_path: Path = DEFAULT_CACHE_PATH):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM frequencies").fetchone()[0]
+
+    def get_many(self, words: Iterable[str]) -> Dict[str, WordFrequency]:
+        keys = list(dict.fromkeys(normalize(w) for w in words))
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT word, a1, a2, b1, b2, c1, c2, total, source, fetched_at FROM frequencies "
+                    f"WHERE word IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for row in rows:
+                    found[row[0]] = WordFrequency(*row)
+        return found
+
+    def get(self, word: str) -> Optional[WordFrequency]:
+        return self.get_many([word]).get(normalize(word))
+
+    def put_many(self, records: Iterable[WordFrequency]):
+        rows = [
+            (r.word, r.a1, r.a2, r.b1, r.b2, r.c1, r.c2, r.total, r.source, r.fetched_at)
+            for r in records
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO frequencies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def load_tsv(self, tsv_path: Path) -> int:
+        """
+        Bulk-load a DAFlex/CEFRLex TSV export (word, tag, one frequency
+        column per level and a total; headers like "freq@A1"). A word listed
+        under several tags keeps its most frequent reading, as the API's
+        first result would. Returns the number of words loaded.
+        """
+        now = time.time()
+        best: Dict[str, WordFrequency] = {}
+        with open(tsv_path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f, delimiter="\t")
+            header = [h.strip().lower() for h in next(reader)]
+            columns = {}
+            for level in CEFR_LEVELS + ("total",):
+                matches = [i for i, h in enumerate(header) if h == level or h.endswith(f"@{level}") or h.endswith(f"_{level}")]
+                if not matches:
+                    raise ValueError(f"No {level.upper()} column in {tsv_path.name} (header: {header})")
+                columns[level] = matches[0]
+            for row in reader:
+                if not row or not row[0].strip():
+                    continue
+                try:
+                    counts = {level: float(row[i] or 0) for level, i in columns.items()}
+                except (IndexError, ValueError):
+                    continue
+                record = WordFrequency(normalize(row[0]), **counts, source="tsv", fetched_at=now)
+                if record.word not in best or record.total > best[record.word].total:
+                    best[record.word] = record
+        self.put_many(best.values())
+        return len(best)
+
+
+class DaflexClient:
+    """
+    Frequencies for many words: cached ones from the FrequencyCache, the
+    rest fetched from the DAFlex API with bounded concurrency over one
+    keep-alive connection pool, then cached. Offline, misses are not
+    fetched and come back as zero counts (uncached).
+    """
+
+    def __init__(self, cache: FrequencyCache, concurrency: int = 8, offline: bool = False,
+                 timeout: float = 15.0, client: Optional[httpx.Client] = None):
+        self.cache = cache
+        self.concurrency = max(1, concurrency)
+        self.offline = offline
+        self._timeout = timeout
+        self._client = client
+
+    def _fetch(self, client: httpx.Client, word: str) -> Optional[WordFrequency]:
+        try:
+            response = client.get(DAFLEX_URL.format(word=urllib.parse.quote(word)))
+            response.raise_for_status()
+            return parse_daflex_response(word, response.json())
+        except (httpx.HTTPError, ValueError) as e:
+            # Not cached: a transient error shouldn't pin the word at zero
+            logger.info(f"DAFlex error for {word}: {e}")
+            return None
+
+    def frequencies(self, words: Iterable[str]) -> Dict[str, WordFrequency]:
+        """Frequency of every word, keyed by its normalized form."""
+        keys = list(dict.fromkeys(normalize(w) for w in words if w and w.strip()))
+        found = self.cache.get_many(keys)
+        misses = [k for k in keys if k not in found]
+        if misses and not self.offline:
+            found.update(self._fetch_all(misses))
+        for key in keys:
+            found.setdefault(key, WordFrequency(key, fetched_at=0.0))
+        return found
+
+    def _fetch_all(self, words: List[str]) -> Dict[str, WordFrequency]:
+        logger.info(f"Fetching DAFlex frequency for {len(words)} uncached words")
+        client = self._client or httpx.Client(
+            headers=DAFLEX_HEADERS,
+            timeout=self._timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                records = [r for r in pool.map(lambda w: self._fetch(client, w), words) if r is not None]
+        finally:
+            if self._client is None:
+                client.close()
+        self.cache.put_many(records)
+        return {r.word: r for r in records}
@@ -0,0 +1,125 @@
+import codecs
+import json
+from typing import Any, Dict, List
+
+
+class JsonObjectStream:
+    """
+    Incremental parser for a JSON object with one large array member, e.g.
+    {"source_name": "...", "items": [{...}, {...}, ...]}.
+
+    Bytes are fed as they arrive; `feed` returns the array elements that are
+    complete so far, so only one chunk of the body is held in memory at a
+    time. Every other top-level member is collected into `fields`, whatever
+    its position relative to the array.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.fields: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._state = "start"
+        self._key = None
+        self._seen_array = False
+
+    def feed(self, data: bytes) -> List[Any]:
+        self._buf += self._text.decode(data)
+        return self._parse(final=False)
+
+    def close(self) -> List[Any]:
+        """Parse whatever is left; raises ValueError if the body is incomplete."""
+        self._buf += self._text.decode(b"", final=True)
+        elements = self._parse(final=True)
+        if self._state != "done":
+            raise ValueError("Unexpected end of JSON body")
+        if not self._seen_array:
+            raise ValueError(f"Missing '{self.array_key}' array")
+        return elements
+
+    def _decode(self, pos: int, final: bool):
+        """Decode one value at `pos`; None if it may continue in the next chunk."""
+        try:
+            value, end = self._decoder.raw_decode(self._buf, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise ValueError(f"Invalid JSON at offset {pos}")
+            return None
+        # A number at the very end of the buffer may still have digits to come
+        if end == len(self._buf) and not final:
+            return None
+        return value, end
+
+    def _expect(self, ch: str, allowed: str):
+        if ch not in allowed:
+            raise ValueError(f"Unexpected {ch!r} in JSON body (expected one of {allowed!r})")
+
+    def _parse(self, final: bool) -> List[Any]:
+        elements = []
+        buf = self._buf
+        pos = 0
+
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos >= len(buf):
+                break
+            ch = buf[pos]
+            state = self._state
+
+            if state == "done":
+                raise ValueError("Trailing data after JSON body")
+            elif state == "start":
+                self._expect(ch, "{")
+                pos += 1
+                self._state = "key_or_end"
+            elif state in ("key", "key_or_end"):
+                if ch == "}" and state == "key_or_end":
+                    pos += 1
+                    self._state = "done"
+                    continue
+                self._expect(ch, '"')
+                decoded = self._decode(pos, final)
+                if decoded is None:
+                    break
+                self._key, pos = decoded
+                self._state = "colon"
+            elif state == "colon":
+                self._expect(ch, ":")
+                pos += 1
+                self._state = "value"
+            elif state == "value":
+                if self._key == self.array_key:
+                    self._expect(ch, "[")
+                    pos += 1
+                    self._seen_array = True
+                    self._state = "element_or_end"
+                    continue
+                decoded = self._decode(pos, final)
+                if decoded is None:
+                    break
+                self.fields[self._key], pos = decoded
+                self._state = "member_end"
+            elif state == "member_end":
+                self._expect(ch, ",}")
+                pos += 1
+                self._state = "key" if ch == "," else "done"
+            elif state in ("element", "element_or_end"):
+                if ch == "]" and state == "element_or_end":
+                    pos += 1
+                    self._state = "member_end"
+                    continue
+                decoded = self._decode(pos, final)
+                if decoded is None:
+                    break
+                element, pos = decoded
+                elements.append(element)
+                self._state = "element_end"
+            elif state == "element_end":
+                self._expect(ch, ",]")
+                pos += 1
+                self._state = "element" if ch == "," else "member_end"
+
+        self._buf = buf[pos:]
+        return elements
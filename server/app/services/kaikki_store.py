@@ -0,0 +1,429 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SERVER_ROOT = Path(__file__).resolve().parent.parent.parent
+DICTIONARIES_DIR = _SERVER_ROOT / "data" / "dictionaries"
+DEFAULT_JSONL_PATH = DICTIONARIES_DIR / "kaikki.org-dictionary-German.jsonl"
+DEFAULT_DB_PATH = DICTIONARIES_DIR / "kaikki.sqlite3"
+
+KAIKKI_URL = "https://kaikki.org/dictionary/German/kaikki.org-dictionary-German.jsonl"
+
+# Bump when the extracted columns change, so an old index is rebuilt
+SCHEMA_VERSION = 1
+
+ARTICLES = ("der ", "die ", "das ", "ein ", "eine ")
+
+# Our part-of-speech tags where Kaikki names them differently
+POS_ALIASES = {
+    "art": ("article", "det"),
+}
+
+_GENDER_TAGS = {"masculine": "m", "feminine": "f", "neuter": "n"}
+# Form tags that rule a form out as "the" nominative plural
+_NOT_PLURAL_TAGS = {"genitive", "dative", "accusative", "diminutive", "table-tags", "inflection-template", "class"}
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE entries (
+    id INTEGER PRIMARY KEY,
+    word TEXT NOT NULL,
+    pos TEXT NOT NULL,
+    ipa TEXT,
+    gender TEXT,
+    plural TEXT,
+    glosses TEXT NOT NULL,
+    forms TEXT NOT NULL,
+    audio_urls TEXT NOT NULL
+);
+"""
+_INSERT = "INSERT INTO entries (word, pos, ipa, gender, plural, glosses, forms, audio_urls) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+@dataclass
+class KaikkiEntry:
+    """The parts of one Kaikki entry (one word, one part of speech) we use."""
+
+    word: str
+    pos: str
+    ipa: Optional[str] = None
+    gender: Optional[str] = None  # m/f/n
+    plural: Optional[str] = None
+    glosses: List[str] = field(default_factory=list)
+    forms: List[Dict[str, object]] = field(default_factory=list)
+    audio_urls: List[str] = field(default_factory=list)
+
+    @property
+    def audio_url(self) -> Optional[str]:
+        return self.audio_urls[0] if self.audio_urls else None
+
+
+def strip_article(word: str) -> str:
+    """'der Tisch' -> 'Tisch' (Kaikki headwords carry no article)."""
+    word = word.strip()
+    for article in ARTICLES:
+        if word.lower().startswith(article):
+            return word[len(article):].strip()
+    return word
+
+
+def _gender(data: dict) -> Optional[str]:
+    # de-noun head templates start their first argument with the gender ("m,(e)s,e")
+    for template in data.get("head_templates", []):
+        args = template.get("args", {})
+        for name in ("1", "g"):
+            value = str(args.get(name, "")).split(",")[0].strip()
+            if value[:1] in ("m", "f", "n") and len(value) <= 2:
+                return value[0]
+    for tags in [data.get("tags", [])] + [s.get("tags", []) for s in data.get("senses", [])]:
+        for tag in tags:
+            if tag in _GENDER_TAGS:
+                return _GENDER_TAGS[tag]
+    return None
+
+
+def _plural(forms: List[dict]) -> Optional[str]:
+    for form in forms:
+        tags = set(form.get("tags", []))
+        value = form.get("form", "").strip()
+        if "plural" in tags and not tags & _NOT_PLURAL_TAGS and value and value != "-":
+            return strip_article(value)
+    return None
+
+
+def extract_entry(data: dict) -> Optional[KaikkiEntry]:
+    """Pre-extract what we look up from one decoded Kaikki JSONL record."""
+    word = data.get("word")
+    if not word:
+        return None
+
+    ipa = None
+    ogg_urls, mp3_urls = [], []
+    for sound in data.get("sounds", []):
+        if "ipa" in sound and not ipa:
+            ipa = sound["ipa"]
+        if "ogg_url" in sound:
+            ogg_urls.append(sound["ogg_url"])
+        elif "mp3_url" in sound:
+            mp3_urls.append(sound["mp3_url"])
+
+    glosses = []
+    for sense in data.get("senses", []):
+        if "glosses" in sense:
+            glosses.extend(sense["glosses"])
+        elif "raw_glosses" in sense:
+            glosses.extend(sense["raw_glosses"])
+
+    forms = [
+        {"form": f["form"], "tags": f.get("tags", [])}
+        for f in data.get("forms", []) if f.get("form")
+    ]
+
+    return KaikkiEntry(
+        word=word,
+        pos=data.get("pos", ""),
+        ipa=ipa,
+        gender=_gender(data),
+        plural=_plural(forms),
+        glosses=glosses,
+        forms=forms,
+        audio_urls=ogg_urls + mp3_urls,
+    )
+
+
+def parse_line(line: bytes) -> Optional[KaikkiEntry]:
+    # Cheap substring test before paying for a full decode
+    if b'"word":' not in line:
+        return None
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    return extract_entry(data) if isinstance(data, dict) else None
+
+
+def _source_meta(jsonl_path: Path) -> Dict[str, str]:
+    st = jsonl_path.stat()
+    return {
+        "schema_version": str(SCHEMA_VERSION),
+        "source_size": str(st.st_size),
+        "source_mtime_ns": str(st.st_mtime_ns),
+    }
+
+
+def _row(entry: KaikkiEntry) -> list:
+    return [
+        entry.word, entry.pos, entry.ipa, entry.gender, entry.plural,
+        json.dumps(entry.glosses, ensure_ascii=False),
+        json.dumps(entry.forms, ensure_ascii=False),
+        json.dumps(entry.audio_urls, ensure_ascii=False),
+    ]
+
+
+def shard_ranges(jsonl_path: Path, shards: int) -> List[Tuple[int, int]]:
+    """
+    Split the file into about `shards` byte ranges, each starting at the
+    beginning of a line and ending just after a newline (or at EOF).
+    """
+    size = jsonl_path.stat().st_size
+    bounds = [0]
+    with open(jsonl_path, "rb") as f:
+        for i in range(1, shards):
+            target = size * i // shards
+            if target <= bounds[-1]:
+                continue
+            # Step back one byte so a boundary already at a line start is kept
+            f.seek(target - 1)
+            f.readline()
+            if f.tell() < size and f.tell() > bounds[-1]:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def parse_shard(jsonl_path: str, start: int, end: int, out_path: str) -> Tuple[int, int]:
+    """
+    Extract the entries of one byte range into `out_path` (one JSON row per
+    line). The output only appears once complete, so a finished shard
+    survives a crash of the ingest. Returns (lines read, entries found).
+    Module-level so it can run in a process pool.
+    """
+    out = Path(out_path)
+    lines = entries = 0
+    with open(jsonl_path, "rb") as f, \
+            NamedTemporaryFile("w", dir=out.parent, suffix=".part", delete=False, encoding="utf-8") as tmp:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            lines += 1
+            entry = parse_line(line)
+            if entry is not None:
+                tmp.write(json.dumps(_row(entry), ensure_ascii=False))
+                tmp.write("\n")
+                entries += 1
+    os.replace(tmp.name, out)
+    return lines, entries
+
+
+@dataclass
+class IngestStats:
+    lines: int = 0
+    entries: int = 0
+    shards: int = 0
+    # Shards parsed by this run, and those finished by an earlier, interrupted one
+    done: int = 0
+    resumed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def lines_per_sec(self) -> float:
+        return self.lines / self.seconds if self.seconds else 0.0
+
+
+def write_store(rows: Iterable[list], db_path: Path, meta: Dict[str, str], batch_size: int = 5000) -> int:
+    """
+    Write entry rows into a fresh index at `db_path`. The file is built next
+    to its destination and swapped in at the end, so readers never see a
+    half-written index. Returns the number of entries written.
+    """
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = db_path.with_name(f"{db_path.name}.part")
+    tmp_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        # Nothing to recover on a crash: the .part file is simply rebuilt
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(_SCHEMA)
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany(_INSERT, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(_INSERT, batch)
+            count += len(batch)
+        # Index once after the bulk load rather than on every insert
+        conn.execute("CREATE INDEX ix_entries_word_pos ON entries (word, pos)")
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", {**meta, "entries": str(count)}.items())
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return count
+
+
+def _shard_rows(paths: List[Path]) -> Iterator[list]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def build_store(jsonl_path: Path = DEFAULT_JSONL_PATH, db_path: Path = DEFAULT_DB_PATH,
+                workers: Optional[int] = None, shards: Optional[int] = None,
+                progress: Optional[Callable[[IngestStats], None]] = None) -> IngestStats:
+    """
+    Index the Kaikki JSONL dump: newline-aligned byte ranges are parsed in a
+    process pool into per-shard files under `<db>.shards/`, which are then
+    loaded into SQLite in dump order. Finished shards are kept until the
+    index is written, so an interrupted ingest resumes with the shards it
+    had not finished. `progress` is called after every shard.
+    """
+    workers = workers or os.cpu_count() or 4
+    meta = _source_meta(jsonl_path)
+    work_dir = db_path.with_name(f"{db_path.name}.shards")
+    plan_path = work_dir / "plan.json"
+
+    plan = None
+    if plan_path.exists():
+        try:
+            with open(plan_path, "r", encoding="utf-8") as f:
+                plan = json.load(f)
+        except (OSError, ValueError):
+            plan = None
+    if plan is None or plan.get("meta") != meta:
+        # Different dump (or none started): shards of the old one are useless
+        shutil.rmtree(work_dir, ignore_errors=True)
+        work_dir.mkdir(parents=True)
+        plan = {"meta": meta, "ranges": shard_ranges(jsonl_path, shards or workers * 4)}
+        with open(plan_path, "w", encoding="utf-8") as f:
+            json.dump(plan, f)
+
+    ranges = [tuple(r) for r in plan["ranges"]]
+    outputs = [work_dir / f"shard_{i:05d}.jsonl" for i in range(len(ranges))]
+    stats = IngestStats(shards=len(ranges))
+
+    pending = []
+    for i, out in enumerate(outputs):
+        done = out.with_suffix(".done")
+        if out.exists() and done.exists():
+            counts = json.loads(done.read_text())
+            stats.entries += counts["entries"]
+            stats.resumed += 1
+        else:
+            pending.append(i)
+
+    def finish(i: int, lines: int, entries: int):
+        # Marker written last: a shard without one is parsed again
+        outputs[i].with_suffix(".done").write_text(json.dumps({"lines": lines, "entries": entries}))
+        stats.lines += lines
+        stats.entries += entries
+        stats.done += 1
+        stats.seconds = time.monotonic() - start
+        if progress:
+            progress(stats)
+
+    start = time.monotonic()
+    if workers == 1 or len(pending) <= 1:
+        for i in pending:
+            finish(i, *parse_shard(str(jsonl_path), *ranges[i], str(outputs[i])))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            futures = {
+                pool.submit(parse_shard, str(jsonl_path), *ranges[i], str(outputs[i])): i
+                for i in pending
+            }
+            for future in as_completed(futures):
+                finish(futures[future], *future.result())
+
+    count = write_store(_shard_rows(outputs), db_path, meta)
+    if count != stats.entries:
+        raise RuntimeError(f"Shards held {count} entries, expected {stats.entries}")
+    shutil.rmtree(work_dir, ignore_errors=True)
+    stats.seconds = time.monotonic() - start
+    return stats
+
+
+def is_current(db_path: Path = DEFAULT_DB_PATH, jsonl_path: Path = DEFAULT_JSONL_PATH) -> bool:
+    """Whether the index exists and was built from the JSONL as it is now."""
+    if not db_path.exists():
+        return False
+    if not jsonl_path.exists():
+        # Nothing to rebuild from; whatever index there is will do
+        return True
+    try:
+        with KaikkiStore(db_path) as store:
+            return all(store.meta.get(k) == v for k, v in _source_meta(jsonl_path).items())
+    except sqlite3.Error:
+        return False
+
+
+class KaikkiStore:
+    """
+    Read-only point lookups into the Kaikki index built by `build_store`
+    (python -m app.tasks.ingest_kaikki), keyed by (word, pos). The file is
+    memory-mapped, so repeated lookups are served from the page cache.
+    """
+
+    # Upper bound on the mapping; SQLite maps no more than the file size
+    MMAP_SIZE = 1 << 32
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH):
+        if not db_path.exists():
+            raise FileNotFoundError(f"Kaikki index not found at {db_path}; run python -m app.tasks.ingest_kaikki")
+        self.db_path = db_path
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+        self.meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self) -> int:
+        return int(self.meta.get("entries", 0))
+
+    @staticmethod
+    def _entry(row) -> KaikkiEntry:
+        word, pos, ipa, gender, plural, glosses, forms, audio_urls = row
+        return KaikkiEntry(
+            word=word, pos=pos, ipa=ipa, gender=gender, plural=plural,
+            glosses=json.loads(glosses), forms=json.loads(forms), audio_urls=json.loads(audio_urls),
+        )
+
+    def entries(self, word: str, pos: Optional[str] = None) -> List[KaikkiEntry]:
+        """Entries for exactly `word` (and `pos`, if given), in dump order."""
+        query = "SELECT word, pos, ipa, gender, plural, glosses, forms, audio_urls FROM entries WHERE word = ?"
+        params = [word]
+        if pos is not None:
+            kaikki_pos = POS_ALIASES.get(pos, (pos,))
+            query += f" AND pos IN ({', '.join('?' * len(kaikki_pos))})"
+            params.extend(kaikki_pos)
+        return [self._entry(row) for row in self._conn.execute(query + " ORDER BY id", params)]
+
+    def lookup(self, word: str, pos: Optional[str] = None) -> List[KaikkiEntry]:
+        """
+        Every entry for `word` (article stripped), those matching `pos` first,
+        so callers can take the first entry that has what they need.
+        """
+        lemma = strip_article(word)
+        everything = self.entries(lemma)
+        if pos is None:
+            return everything
+        wanted = set(POS_ALIASES.get(pos, (pos,)))
+        return [e for e in everything if e.pos in wanted] + [e for e in everything if e.pos not in wanted]
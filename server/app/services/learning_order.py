@@ -0,0 +1,167 @@
+import logging
+import random
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = (1, 2, 3, 4)
+
+
+def priority_of(item: dict) -> int:
+    """Priority bucket of an item; anything unknown counts as the lowest."""
+    p = item.get("priority", 4)
+    return p if p in PRIORITIES else 4
+
+
+def interleave_and_order(items):
+    """
+    Sorts items into the final interleaved learning order.
+    Returns: List of items with 'order_index' set.
+    """
+    logger.info("Calculating interleaved order...")
+    
+    # 1. Bucket by Priority
+    buckets = {1: [], 2: [], 3: [], 4: []}
+    for item in items:
+        p = item.get("priority", 4)
+        if p not in buckets: p = 4
+        buckets[p].append(item)
+        
+    final_order = []
+    
+    # Process each priority bucket
+    for p in sorted(buckets.keys()):
+        block_items = buckets[p]
+        if not block_items: continue
+        
+        logger.info(f"Processing Priority {p} block ({len(block_items)} items)...")
+        
+        # Group by Theme/Category within this block
+        theme_groups = {}
+        for item in block_items:
+            t = item.get("theme", "General")
+            if t not in theme_groups: theme_groups[t] = []
+            theme_groups[t].append(item)
+            
+        # Separate by POS for mixing
+        verbs = []
+        nouns_by_theme = {}
+        adjs = []
+        others = []
+        
+        for item in block_items:
+            # Simple broad pos classification
+            pos = item.get("pos", "").lower()
+            t = item.get("theme", "General")
+            
+            if "verb" in pos:
+                verbs.append(item)
+            elif "noun" in pos:
+                if t not in nouns_by_theme: nouns_by_theme[t] = []
+                nouns_by_theme[t].append(item)
+            elif "adj" in pos or "adv" in pos:
+                adjs.append(item)
+            else:
+                others.append(item)
+                
+        # Shuffle everything within groups for randomness
+        random.shuffle(verbs)
+        random.shuffle(adjs)
+        random.shuffle(others)
+        for t in nouns_by_theme:
+            random.shuffle(nouns_by_theme[t])
+            
+        # Create Daily Batches
+        # Target per batch: 2-3 others (func), 3-5 verbs, 3-5 nouns (diff themes), 2-3 adj
+        
+        while any([others, verbs, adjs, any(nouns_by_theme.values())]):
+            batch = []
+            
+            # 1. Function Words / Others (2-3)
+            if others:
+                count = random.randint(2, 3)
+                for _ in range(count):
+                    if others: batch.append(others.pop())
+                
+            # 2. Verbs (3-5)
+            if verbs:
+                count = random.randint(3, 5)
+                for _ in range(count):
+                    if verbs: batch.append(verbs.pop())
+                
+            # 3. Nouns (3-5, mixed themes)
+            if any(nouns_by_theme.values()):
+                count = random.randint(3, 5)
+                added_nouns = 0
+                themes = list(nouns_by_theme.keys())
+                random.shuffle(themes) # Randomize theme order for this batch
+                
+                # Simple round robin taking 1 from each theme
+                # Iterate through themes until we have enough nouns or run out
+                while added_nouns < count and any(nouns_by_theme.values()):
+                    # Use a copy of themes list to iterate safely
+                    current_pass_themes = [t for t in themes if nouns_by_theme[t]]
+                    if not current_pass_themes: break
+                    
+                    for t in current_pass_themes:
+                        if nouns_by_theme[t]:
+                            batch.append(nouns_by_theme[t].pop())
+                            added_nouns += 1
+                        if added_nouns >= count: break
+                
+            # 4. Adjectives (2-3)
+            if adjs:
+                count = random.randint(2, 3)
+                for _ in range(count):
+                    if adjs: batch.append(adjs.pop())
+            
+            # Add batch to final order
+            final_order.extend(batch)
+            
+            # Panic Button: if we are stuck (only 1 type left forever), dump the rest
+            # The while loop condition handles it, but let's be sure we don't loop empty
+            # If batch is empty but items remain (this shouldn't happen with correct logic, but safe guard)
+            if not batch and (others or verbs or adjs or any(nouns_by_theme.values())):
+                 # Dump leftovers
+                 final_order.extend(others); others = []
+                 final_order.extend(verbs); verbs = []
+                 final_order.extend(adjs); adjs = []
+                 for t in nouns_by_theme:
+                     final_order.extend(nouns_by_theme[t])
+                     nouns_by_theme[t] = []
+    
+    # Assign index
+    for idx, item in enumerate(final_order):
+        item["order_index"] = idx
+        
+    return final_order
+
+
+def extend_order(items: List[dict], previous: Dict[str, dict], key) -> List[dict]:
+    """
+    Learning order for an incremental run. Items an earlier run ordered
+    (`previous`, by `key(word)`) with the same priority keep their relative
+    order; new and re-prioritised items are interleaved among themselves and
+    placed at the end of their priority block, so a new priority-1 word is
+    still taught before every priority-4 word. Indices are renumbered, so
+    items behind an insertion move; compare with `previous` to see which.
+    """
+    kept = {p: [] for p in PRIORITIES}
+    placed = {p: [] for p in PRIORITIES}
+    for item in items:
+        before = previous.get(key(item["word"]), {})
+        p = priority_of(item)
+        if "order_index" in before and priority_of(before) == p:
+            kept[p].append((before["order_index"], item))
+        else:
+            placed[p].append(item)
+
+    final_order = []
+    for p in PRIORITIES:
+        final_order.extend(item for _, item in sorted(kept[p], key=lambda pair: pair[0]))
+        if placed[p]:
+            final_order.extend(interleave_and_order(placed[p]))
+
+    for idx, item in enumerate(final_order):
+        item["order_index"] = idx
+    return final_order
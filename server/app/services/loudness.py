@@ -0,0 +1,114 @@
+import json
+import os
+import re
+import subprocess
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Optional
+
+# EBU R128 target every clip is normalized to
+LOUDNORM_TARGET = "I=-14:TP=-1.5:LRA=11"
+# Single-pass (dynamic) normalization, used when nothing has been measured
+LOUDNORM_FILTER = f"loudnorm={LOUDNORM_TARGET}"
+# How synthesized clips are normalized; part of the audio cache key, so bump it
+# whenever the procedure changes and the affected clips are re-encoded
+LOUDNORM_MODE = "two-pass-linear-v1"
+
+# Stats loudnorm prints with print_format=json that a second pass needs
+_MEASURED_FIELDS = ("input_i", "input_tp", "input_lra", "input_thresh", "target_offset")
+
+_JSON_BLOCK_RE = re.compile(r"\{[^{}]*\}")
+
+
+def parse_stats(stderr: bytes) -> dict:
+    """The JSON block loudnorm prints at the end of a run (values as floats)."""
+    blocks = _JSON_BLOCK_RE.findall(stderr.decode("utf-8", errors="replace"))
+    if not blocks:
+        raise ValueError("ffmpeg printed no loudnorm statistics")
+    stats = {}
+    for name, value in json.loads(blocks[-1]).items():
+        try:
+            stats[name] = float(value)
+        except (TypeError, ValueError):
+            stats[name] = value
+    return stats
+
+
+def measure(input_args: list, data: Optional[bytes] = None) -> dict:
+    """
+    First loudnorm pass: analyze the input (ffmpeg input arguments, fed
+    `data` on stdin if given) without encoding anything.
+    """
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats",
+        *input_args,
+        "-af", f"{LOUDNORM_FILTER}:print_format=json",
+        "-f", "null", "-",
+    ]
+    result = subprocess.run(cmd, input=data, check=True, capture_output=True)
+    stats = parse_stats(result.stderr)
+    return {name: stats[name] for name in _MEASURED_FIELDS}
+
+
+def two_pass_filter(measured: dict) -> str:
+    """
+    Second loudnorm pass from stored measurements: a linear gain instead of
+    dynamic compression, with stats printed so the output can be recorded too.
+    """
+    return (
+        f"{LOUDNORM_FILTER}"
+        f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+        f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+        f":offset={measured['target_offset']}:linear=true:print_format=json"
+    )
+
+
+def output_measurement(stderr: bytes) -> Optional[dict]:
+    """
+    Loudness of what a two-pass encode produced, from the stats it printed,
+    in the same shape as `measure` (so it can seed the next encode).
+    """
+    try:
+        stats = parse_stats(stderr)
+        return {
+            "input_i": stats["output_i"],
+            "input_tp": stats["output_tp"],
+            "input_lra": stats["output_lra"],
+            "input_thresh": stats["output_thresh"],
+            "target_offset": stats["target_offset"],
+        }
+    except (ValueError, KeyError):
+        return None
+
+
+def sidecar_path(clip: Path) -> Path:
+    return clip.with_name(f"{clip.name}.loudness.json")
+
+
+def load(clip: Path) -> Optional[dict]:
+    """Stored measurement of `clip`, unless the clip was rewritten since."""
+    try:
+        with open(sidecar_path(clip), "r", encoding="utf-8") as f:
+            record = json.load(f)
+        if record.get("size") != clip.stat().st_size:
+            return None
+        return {name: record[name] for name in _MEASURED_FIELDS}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save(clip: Path, measured: dict):
+    """Store a measurement next to `clip`, tagged with the clip's size to detect rewrites."""
+    path = sidecar_path(clip)
+    with NamedTemporaryFile("w", dir=path.parent, suffix=".part", delete=False, encoding="utf-8") as tmp:
+        json.dump({**measured, "size": clip.stat().st_size}, tmp, sort_keys=True)
+    os.replace(tmp.name, path)
+
+
+def measurement_for(clip: Path) -> dict:
+    """The clip's stored measurement, analyzing (and storing) it only the first time."""
+    measured = load(clip)
+    if measured is None:
+        measured = measure(["-i", str(clip)])
+        save(clip, measured)
+    return measured
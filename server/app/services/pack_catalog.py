@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Dict, List, Optional
+
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: publishes are not serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILENAME = "catalog.json"
+
+
+def full_pack_filename(version_tag: str) -> str:
+    return f"deutschstart_{version_tag}.zip"
+
+
+def dictionary_pack_filename(version_tag: str) -> str:
+    return f"deutschstart_{version_tag}_dictionary.zip"
+
+
+def variant_pack_filename(version_tag: str, profile: str) -> str:
+    return f"deutschstart_{version_tag}_{profile}.zip"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def catalog_entry(zip_path: Path, manifest: dict, parent_version: Optional[str] = None) -> dict:
+    """Catalog record for a pack archive, built from the manifest it embeds."""
+    entry = {
+        "filename": zip_path.name,
+        "version": manifest["version"],
+        "type": manifest.get("type", "full"),
+        "format": manifest.get("format", "1.0"),
+        "item_count": manifest.get("item_count", 0),
+        "grammar_count": manifest.get("grammar_count"),
+        "size": zip_path.stat().st_size,
+        "sha256": file_sha256(zip_path),
+        "built_at": manifest.get("generated_at"),
+        # Base version for deltas, previously published version for full packs
+        "parent_version": manifest.get("base_version", parent_version),
+    }
+    if "dictionary" in manifest:
+        # Full pack built with its Kaikki data split out
+        entry["dictionary"] = manifest["dictionary"]["filename"]
+    if "variants" in manifest:
+        # Full pack with the same content in other audio encodings
+        entry["variants"] = {profile: v["filename"] for profile, v in manifest["variants"].items()}
+    if "profile" in manifest:
+        entry["profile"] = manifest["profile"]
+    return entry
+
+
+class PackCatalog:
+    """
+    Index of published packs, kept as catalog.json next to the archives.
+
+    The packager publishes each build with an atomic rename, so readers see
+    either the old or the new catalog. `load` keeps the parsed catalog in
+    memory and only re-reads it when the file on disk has been replaced,
+    which makes /latest a stat plus a dict lookup however many packs exist.
+    A packs directory with archives but no catalog (packs built before the
+    catalog existed) is indexed on first load.
+    """
+
+    def __init__(self, packs_dir: Path):
+        self.packs_dir = packs_dir
+        self.path = packs_dir / CATALOG_FILENAME
+        self._lock = threading.Lock()
+        self._signature = None
+        self._cached = {"latest": None, "packs": {}}
+        # (filename, inode, mtime, size) -> sha256 for files the catalog doesn't describe
+        self._hashed = {}
+
+    @staticmethod
+    def _empty() -> dict:
+        return {"latest": None, "packs": {}}
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self._empty()
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Unreadable pack catalog {self.path}: {e}")
+            return self._empty()
+
+    def _signature_on_disk(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_ino, st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> dict:
+        signature = self._signature_on_disk()
+        if signature is None and any(self.packs_dir.glob("*.zip")):
+            with self._exclusive():
+                # Another process may have written it while we waited
+                if not self.path.exists():
+                    logger.info(f"No pack catalog in {self.packs_dir}; rebuilding it from the archives")
+                    self._rebuild()
+            signature = self._signature_on_disk()
+
+        with self._lock:
+            if signature != self._signature:
+                self._cached = self._read() if signature else self._empty()
+                self._signature = signature
+            return self._cached
+
+    def latest(self) -> Optional[dict]:
+        """Catalog entry of the most recently published full pack."""
+        catalog = self.load()
+        version = catalog["latest"]
+        if version is None:
+            return None
+        return catalog["packs"].get(full_pack_filename(version))
+
+    def dictionary(self, version_tag: str) -> Optional[dict]:
+        """Catalog entry of the dictionary pack that goes with a full pack, if it was split."""
+        full = self.load()["packs"].get(full_pack_filename(version_tag))
+        if not full or not full.get("dictionary"):
+            return None
+        return self.load()["packs"].get(full["dictionary"])
+
+    def variants(self, version_tag: str) -> Dict[str, dict]:
+        """Catalog entries of the audio-profile variants of a full pack, by profile."""
+        packs = self.load()["packs"]
+        full = packs.get(full_pack_filename(version_tag)) or {}
+        return {
+            profile: packs[filename]
+            for profile, filename in full.get("variants", {}).items() if filename in packs
+        }
+
+    def packs(self) -> List[dict]:
+        """All published packs, newest first."""
+        return sorted(self.load()["packs"].values(), key=lambda p: p["built_at"] or 0, reverse=True)
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize read-modify-write cycles across processes."""
+        self.packs_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.packs_dir / f".{CATALOG_FILENAME}.lock", "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, catalog: dict):
+        with NamedTemporaryFile("w", dir=self.packs_dir, prefix=f".{CATALOG_FILENAME}.", suffix=".part",
+                                delete=False, encoding="utf-8") as tmp:
+            json.dump(catalog, tmp, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp.name, self.path)
+
+    def publish(self, entries: List[dict], latest: Optional[str] = None):
+        """Add (or replace) entries and optionally move the latest pointer, atomically."""
+        with self._exclusive():
+            catalog = self._read()
+            for entry in entries:
+                catalog["packs"][entry["filename"]] = entry
+            if latest is not None:
+                catalog["latest"] = latest
+            self._write(catalog)
+
+    def latest_version(self) -> Optional[str]:
+        return self.load()["latest"]
+
+    def sha256_of(self, path: Path) -> str:
+        """
+        SHA-256 of a pack file: taken from the catalog when its entry matches
+        the file on disk, otherwise hashed once and memoized by file identity.
+        """
+        st = path.stat()
+        entry = self.load()["packs"].get(path.name)
+        if entry and entry.get("sha256") and entry.get("size") == st.st_size:
+            return entry["sha256"]
+
+        key = (path.name, st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            digest = self._hashed.get(key)
+        if digest is None:
+            digest = file_sha256(path)
+            with self._lock:
+                self._hashed[key] = digest
+        return digest
+
+    def rebuild(self) -> dict:
+        """
+        Recreate the catalog from the archives on disk (for packs built before
+        the catalog existed). The latest pointer goes to the full pack whose
+        manifest has the newest generated_at (file mtime breaks ties).
+        """
+        with self._exclusive():
+            return self._rebuild()
+
+    def _rebuild(self) -> dict:
+        catalog = self._empty()
+        for zip_path in sorted(self.packs_dir.glob("*.zip")):
+            try:
+                with zipfile.ZipFile(zip_path) as zf:
+                    manifest = json.loads(zf.read("manifest.json"))
+            except (zipfile.BadZipFile, KeyError, json.JSONDecodeError) as e:
+                logger.warning(f"Skipping {zip_path.name}: {e}")
+                continue
+            catalog["packs"][zip_path.name] = catalog_entry(zip_path, manifest)
+
+        full = [p for p in catalog["packs"].values() if p["type"] == "full"]
+        if full:
+            newest = max(full, key=lambda p: (p["built_at"] or 0, (self.packs_dir / p["filename"]).stat().st_mtime))
+            catalog["latest"] = newest["version"]
+        self._write(catalog)
+        return catalog
+
+
+# One instance per packs directory, shared by request handlers in this process
+_catalogs = {}
+
+
+def get_catalog(packs_dir: Path) -> PackCatalog:
+    key = str(packs_dir)
+    if key not in _catalogs:
+        _catalogs[key] = PackCatalog(packs_dir)
+    return _catalogs[key]
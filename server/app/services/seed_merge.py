@@ -0,0 +1,249 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+
+def generate_key(word):
+    """
+    Generate a normalized key for deduplication.
+    Strips common articles and lowercases the word.
+    """
+    key = word.strip().lower()
+    prefixes = ["der ", "die ", "das ", "ein ", "eine "]
+    for p in prefixes:
+        if key.startswith(p):
+            # Only strip if it's a prefix followed by a valid character
+            # (already checked by endswith space in prefix list)
+            return key[len(p):].strip()
+    return key
+
+
+def smart_merge(existing_item, new_item):
+    """
+    Merges new_item into existing_item with specific rules:
+    - Prefer word with article (longer length usually)
+    - Fill missing POS, translation, category, gender, plural_form
+    - Merge and deduplicate example sentences
+    - PRESESERVE manual priority/theme if exists
+    """
+    merged = existing_item.copy()
+
+    # Word: Prefer the one that starts with an article (heuristic: longer is better usually for "der Mann" vs "Mann")
+    # or just check for article prefixes
+    existing_word = merged.get("word", "")
+    new_word = new_item.get("word", "")
+
+    # If existing is just "Mann" and new is "der Mann", take new.
+    # Simple heuristic: newer one is better if it's longer (has article)
+    if len(new_word) > len(existing_word):
+        merged["word"] = new_word
+
+    # Fields to fill if missing
+    for field in ["pos", "translation", "category", "gender", "plural_form", "priority", "theme"]:
+        if not merged.get(field) and new_item.get(field):
+            merged[field] = new_item.get(field)
+
+    # Example sentences: Append and deduplicate
+    existing_sentences = merged.get("example_sentences", [])
+    new_sentences = new_item.get("example_sentences", [])
+
+    # Use a set of (german, english) tuples to deduplicate
+    unique_sentences = {}
+
+    all_sentences = existing_sentences + new_sentences
+    for s in all_sentences:
+        # Create a unique key for the sentence (e.g. the german text)
+        s_key = s.get("german", "").strip()
+        if s_key and s_key not in unique_sentences:
+            unique_sentences[s_key] = s
+
+    merged["example_sentences"] = list(unique_sentences.values())
+
+    return merged
+
+
+@dataclass
+class SeedSource:
+    """One input of the merge; `transform` adapts its records (e.g. Anki audio fields)."""
+
+    name: str
+    path: Path
+    transform: Optional[Callable[[dict], dict]] = None
+
+
+@dataclass
+class ChangeSet:
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.removed)
+
+    @property
+    def changed(self) -> set:
+        """Keys whose merged item is new or different."""
+        return set(self.added) | set(self.modified)
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IncrementalMerge:
+    """
+    Seed merge that only redoes the work for inputs that changed.
+
+    Each source's records are kept in a state file together with the
+    source's content hash, and so is every key's merged item. On a run,
+    unchanged sources (same size and mtime, or same hash) are not even
+    parsed; only the keys that changed sources contribute (now or before)
+    are merged again, folding every source's records for the key through
+    `merge` in source order, exactly as a full merge would. The result
+    comes with the set of added, modified and removed keys.
+
+    `run` doesn't persist anything: call `save` once whatever consumes the
+    changes has succeeded, so a failed downstream stage sees them again.
+    """
+
+    def __init__(self, state_path: Path, merge: Callable[[dict, dict], dict] = smart_merge,
+                 key: Callable[[str], str] = generate_key):
+        self.state_path = state_path
+        self.merge = merge
+        self.key = key
+        self._state = self._load_state()
+
+    def _load_state(self) -> dict:
+        empty = {"version": STATE_VERSION, "sources": {}, "merged": {}}
+        if not self.state_path.exists():
+            return empty
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            logger.warning(f"Unreadable merge state at {self.state_path}; merging everything")
+            return empty
+        return state if state.get("version") == STATE_VERSION else empty
+
+    def save(self):
+        """Record the last `run` as done (its sources and merged items)."""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile("w", dir=self.state_path.parent, suffix=".part", delete=False, encoding="utf-8") as tmp:
+            json.dump(self._state, tmp, ensure_ascii=False)
+        os.replace(tmp.name, self.state_path)
+
+    def _read_records(self, source: SeedSource) -> Optional[List[list]]:
+        """[key, record] pairs of one source in file order; None if unreadable."""
+        try:
+            with open(source.path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading {source.name}: {e}")
+            return None
+        if not isinstance(items, list):
+            logger.warning(f"{source.name} does not contain a list. Skipping.")
+            return []
+
+        records = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            if source.transform:
+                item = source.transform(item)
+            word = item.get("word")
+            if not word:
+                continue
+            records.append([self.key(word), item])
+        return records
+
+    def _refresh(self, source: SeedSource, old: Optional[dict]) -> Optional[dict]:
+        """The source's state entry, re-read only if its content changed."""
+        st = source.path.stat()
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            return old
+        digest = file_hash(source.path)
+        if old and old["hash"] == digest:
+            return {**old, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        records = self._read_records(source)
+        if records is None:
+            return None
+        logger.info(f"Processing {source.name} ({len(records)} records)")
+        return {"hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "records": records}
+
+    def run(self, sources: List[SeedSource]) -> Tuple[List[dict], ChangeSet]:
+        """
+        Merge `sources` (in merge order). Returns every merged item, in
+        order of first appearance, and what changed since the last run.
+        """
+        old_sources: Dict[str, dict] = self._state["sources"]
+        old_merged: Dict[str, dict] = self._state["merged"]
+
+        new_sources: Dict[str, dict] = {}
+        affected = set()
+        for source in sources:
+            old = old_sources.get(source.name)
+            entry = self._refresh(source, old)
+            if entry is None:
+                # Unreadable now: contributes nothing and is retried next run
+                entry = {"hash": None, "size": None, "mtime_ns": None, "records": []}
+            if old is None or entry["hash"] != old["hash"]:
+                affected.update(k for k, _ in entry["records"])
+                if old:
+                    affected.update(k for k, _ in old["records"])
+            new_sources[source.name] = entry
+        for name, old in old_sources.items():
+            if name not in new_sources:
+                affected.update(k for k, _ in old["records"])
+
+        kept = [s.name for s in sources if s.name in old_sources]
+        if kept != [name for name in old_sources if name in new_sources]:
+            # Sources kept from the last run were reordered, which changes the
+            # fold order of the keys they share: merge everything again
+            affected = set(old_merged)
+            for entry in new_sources.values():
+                affected.update(k for k, _ in entry["records"])
+
+        order: List[str] = []
+        contributions: Dict[str, List[dict]] = {}
+        for source in sources:
+            for key, record in new_sources[source.name]["records"]:
+                if key not in contributions:
+                    contributions[key] = []
+                    order.append(key)
+                if key in affected:
+                    contributions[key].append(record)
+
+        merged: Dict[str, dict] = {}
+        changes = ChangeSet()
+        for key in order:
+            if key in affected:
+                records = contributions[key]
+                item = records[0]
+                for record in records[1:]:
+                    item = self.merge(item, record)
+                merged[key] = item
+                if key not in old_merged:
+                    changes.added.append(key)
+                elif old_merged[key] != item:
+                    changes.modified.append(key)
+            else:
+                merged[key] = old_merged[key]
+        changes.removed = [key for key in old_merged if key not in merged]
+
+        self._state = {"version": STATE_VERSION, "sources": new_sources, "merged": merged}
+        # Callers enrich the items in place; keep the state to be saved out of reach
+        return copy.deepcopy(list(merged.values())), changes
@@ -0,0 +1,15 @@
+import argparse
+from pathlib import Path
+
+from app.services.frequency_cache import DEFAULT_CACHE_PATH, FrequencyCache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a DAFlex/CEFRLex TSV export into the frequency cache (offline mode).")
+    parser.add_argument("tsv", type=Path, help="TSV with word, tag, per-level frequencies and a total")
+    parser.add_argument("--cache", type=Path, default=DEFAULT_CACHE_PATH, help="Frequency cache to fill")
+    args = parser.parse_args()
+
+    with FrequencyCache(args.cache) as cache:
+        count = cache.load_tsv(args.tsv)
+        print(f"Loaded {count} words; the cache now holds {len(cache)}.")
@@ -0,0 +1,62 @@
+import argparse
+import urllib.request
+from pathlib import Path
+from typing import Optional
+
+from app.services.kaikki_store import (
+    DEFAULT_DB_PATH, DEFAULT_JSONL_PATH, KAIKKI_URL, IngestStats, build_store, is_current,
+)
+
+
+def download_dump(jsonl_path: Path):
+    jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+    part = jsonl_path.with_name(f"{jsonl_path.name}.part")
+    print(f"Downloading from {KAIKKI_URL}...")
+    urllib.request.urlretrieve(KAIKKI_URL, part)
+    part.replace(jsonl_path)
+    print("Download complete.")
+
+
+def report_progress(stats: IngestStats):
+    print(f"  shard {stats.resumed + stats.done}/{stats.shards}: {stats.lines} lines ({stats.lines_per_sec:,.0f} lines/s)", end="\r")
+
+
+def ingest_kaikki(jsonl_path: Path = DEFAULT_JSONL_PATH, db_path: Path = DEFAULT_DB_PATH, force: bool = False,
+                  workers: Optional[int] = None) -> bool:
+    """
+    Build the Kaikki index from the JSONL dump (downloading it if missing).
+    Skipped when the index was already built from the same dump. Returns
+    whether an index is available afterwards.
+    """
+    if not jsonl_path.exists():
+        if db_path.exists():
+            print(f"No Kaikki dump at {jsonl_path}; keeping the existing index.")
+            return True
+        try:
+            download_dump(jsonl_path)
+        except Exception as e:
+            print(f"Failed to download Kaikki: {e}")
+            return False
+
+    if not force and is_current(db_path, jsonl_path):
+        print(f"Kaikki index is up to date: {db_path}")
+        return True
+
+    print(f"Indexing {jsonl_path} -> {db_path}")
+    stats = build_store(jsonl_path, db_path, workers=workers, progress=report_progress)
+    print()
+    if stats.resumed:
+        print(f"Resumed {stats.resumed}/{stats.shards} shards from an interrupted ingest.")
+    print(f"Indexed {stats.entries} entries from {stats.lines} lines in {stats.seconds:.1f}s "
+          f"({stats.lines_per_sec:,.0f} lines/s)")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Kaikki dictionary index (run once per dump).")
+    parser.add_argument("--jsonl", type=Path, default=DEFAULT_JSONL_PATH, help="Kaikki JSONL dump")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="Index to write")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the index is current")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    args = parser.parse_args()
+    ingest_kaikki(args.jsonl, args.db, force=args.force, workers=args.workers)
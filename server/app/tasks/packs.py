@@ -0,0 +1,271 @@
+import json
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import redis
+from celery import chord
+from celery.result import AsyncResult
+from celery.states import READY_STATES
+
+from app.celery_app import celery_app
+from app.config import settings
+from app.database import SessionLocal
+from app.services.audio_generator import AudioGenerator
+from app.services.audio_store import AudioStore, open_audio_store
+from app.services.content_packager import BuildPlan, ContentPackager, batch_by_language, synthesize_batch
+
+logger = logging.getLogger(__name__)
+
+# Anchored output directory (relative to this file → server/app/tasks → server/)
+_SERVER_ROOT = Path(__file__).resolve().parent.parent.parent
+PACKS_DIR = _SERVER_ROOT / "data" / "processed" / "packs"
+# Same layout ContentPackager uses by default (packs/../audio_cache/store)
+AUDIO_STORE_DIR = PACKS_DIR.parent / "audio_cache" / "store"
+
+# Redis key holding the job id and parameters of the in-flight build for a version tag
+_BUILD_LOCK_KEY = "pack_build:{version_tag}"
+_BUILD_LOCK_TTL = 6 * 60 * 60  # Safety net if a worker dies without releasing it
+
+# Redis counter of clips finished by fan-out chunks, per build job
+_FANOUT_PROGRESS_KEY = "pack_build_progress:{job_id}"
+
+# Minimum seconds between progress writes to the result backend
+_PROGRESS_INTERVAL = 1.0
+
+# One Piper pool and one store handle per worker process, reused across builds
+_audio_gen: Optional[AudioGenerator] = None
+_audio_store: Optional[AudioStore] = None
+
+
+def _get_audio_gen() -> AudioGenerator:
+    global _audio_gen
+    if _audio_gen is None:
+        _audio_gen = AudioGenerator()
+    return _audio_gen
+
+
+def _get_audio_store() -> AudioStore:
+    global _audio_store
+    if _audio_store is None:
+        _audio_store = open_audio_store(AUDIO_STORE_DIR)
+    return _audio_store
+
+
+class BuildConflict(Exception):
+    """A build of the same version tag with different parameters is in flight."""
+
+    def __init__(self, version_tag: str, job_id: str):
+        super().__init__(f"A build of '{version_tag}' with different parameters is in progress (job {job_id})")
+        self.job_id = job_id
+
+
+def _redis() -> redis.Redis:
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+def _build_params(delta_from: Optional[List[str]], pack_format: Optional[str]) -> dict:
+    """Build parameters in the form stored with the lock, defaults resolved."""
+    return {
+        "delta_from": sorted(set(delta_from)) if delta_from is not None else None,
+        "format": pack_format or settings.PACK_FORMAT,
+    }
+
+
+def _lock_holder(client: redis.Redis, key: str) -> Optional[dict]:
+    value = client.get(key)
+    return json.loads(value) if value is not None else None
+
+
+def enqueue_pack_build(
+    version_tag: str, delta_from: Optional[List[str]] = None, pack_format: Optional[str] = None
+) -> Tuple[str, bool]:
+    """
+    Queue a pack build, coalescing with an in-flight build of the same tag
+    and parameters. Returns (job_id, coalesced); raises BuildConflict if the
+    in-flight build of the tag was asked for with other parameters, since
+    both would write the same pack files.
+    """
+    client = _redis()
+    key = _BUILD_LOCK_KEY.format(version_tag=version_tag)
+    params = _build_params(delta_from, pack_format)
+
+    for _ in range(2):
+        job_id = str(uuid.uuid4())
+        if client.set(key, json.dumps({"job_id": job_id, **params}), nx=True, ex=_BUILD_LOCK_TTL):
+            build_pack_task.apply_async(args=[version_tag, delta_from, pack_format], task_id=job_id)
+            return job_id, False
+
+        holder = _lock_holder(client, key)
+        if holder is None:
+            continue  # Released between SET and GET
+        existing = holder.pop("job_id")
+        if AsyncResult(existing, app=celery_app).state not in READY_STATES:
+            if holder != params:
+                raise BuildConflict(version_tag, existing)
+            return existing, True
+        # Stale lock from a finished job; clear it and try again
+        client.delete(key)
+
+    raise RuntimeError(f"Could not acquire build lock for '{version_tag}'")
+
+
+def get_pack_build_status(job_id: str) -> dict:
+    result = AsyncResult(job_id, app=celery_app)
+    status = {"job_id": job_id, "state": result.state}
+
+    if result.state == "PROGRESS":
+        status.update(result.info or {})
+        if status.get("fanout"):
+            # Chunks report to a shared counter rather than to this job's state
+            done = int(_redis().get(_FANOUT_PROGRESS_KEY.format(job_id=job_id)) or 0)
+            status["done"] = done
+            status["remaining"] = status["total"] - done
+    elif result.state == "SUCCESS":
+        status["phase"] = "done"
+        status["artifact"] = result.result
+    elif result.state == "FAILURE":
+        status["error"] = str(result.result)
+
+    return status
+
+
+def _release_build_lock(version_tag: str, job_id: str):
+    """Release the coalescing lock only if it is still held by `job_id`."""
+    client = _redis()
+    key = _BUILD_LOCK_KEY.format(version_tag=version_tag)
+    holder = _lock_holder(client, key)
+    if holder is not None and holder["job_id"] == job_id:
+        client.delete(key)
+
+
+def _artifact(version_tag: str, zip_path: Path) -> dict:
+    return {
+        "version_tag": version_tag,
+        "filename": zip_path.name,
+        "url": f"/api/v1/packs/{zip_path.name}",
+        "size": zip_path.stat().st_size,
+    }
+
+
+def _fanout(job_id: str, version_tag: str, delta_from: Optional[List[str]], pack_format: Optional[str], plan: BuildPlan):
+    """Chord of synthesis chunks whose callback assembles the pack under `job_id`."""
+    # Sorted by language so most chunks hold a single voice
+    jobs = sorted(
+        ([task.text, task.language, {profile: key for profile, (key, _) in task.outputs.items()}]
+         for task in plan.tasks.values()),
+        key=lambda job: job[1]
+    )
+    size = max(1, settings.TTS_FANOUT_CHUNK_SIZE)
+    header = [
+        synthesize_chunk_task.s(job_id, jobs[start:start + size])
+        for start in range(0, len(jobs), size)
+    ]
+    body = assemble_pack_task.s(version_tag, delta_from, pack_format).set(task_id=job_id)
+    return chord(header, body)
+
+
+def _progress_reporter(task, version_tag: str):
+    """ContentPackager progress callback publishing throttled PROGRESS states for `task`."""
+    last_update = 0.0
+
+    def progress(phase: str, done: int, total: int):
+        nonlocal last_update
+        now = time.monotonic()
+        # Throttle, but always publish phase boundaries
+        if done not in (0, total) and now - last_update < _PROGRESS_INTERVAL:
+            return
+        last_update = now
+        task.update_state(state="PROGRESS", meta={
+            "version_tag": version_tag,
+            "phase": phase,
+            "done": done,
+            "remaining": total - done,
+            "total": total,
+        })
+
+    return progress
+
+
+@celery_app.task(bind=True)
+def build_pack_task(self, version_tag: str, delta_from: Optional[List[str]] = None, pack_format: Optional[str] = None):
+    progress = _progress_reporter(self, version_tag)
+    db = SessionLocal()
+    handed_off = False
+    try:
+        packager = ContentPackager(
+            db, PACKS_DIR, audio_gen=_get_audio_gen(), progress=progress,
+            audio_store=_get_audio_store(), pack_format=pack_format
+        )
+        if settings.TTS_FANOUT:
+            plan = packager.plan_pack()
+            if plan.tasks:
+                # Synthesis is spread over the workers; the chord callback
+                # takes over this job id (and the build lock) for assembly.
+                self.update_state(state="PROGRESS", meta={
+                    "version_tag": version_tag,
+                    "phase": "synthesize",
+                    "fanout": True,
+                    "done": 0,
+                    "remaining": len(plan.tasks),
+                    "total": len(plan.tasks),
+                })
+                handed_off = True
+                return self.replace(_fanout(self.request.id, version_tag, delta_from, pack_format, plan))
+
+        zip_path = packager.generate_pack(version_tag, delta_bases=delta_from)
+        return _artifact(version_tag, zip_path)
+    finally:
+        db.close()
+        if not handed_off:
+            _release_build_lock(version_tag, self.request.id)
+
+
+@celery_app.task
+def synthesize_chunk_task(job_id: str, jobs: List[list]) -> dict:
+    """
+    Synthesize one chunk of [text, language, {profile: key}] jobs into the
+    shared audio store. Failures are reported per clip (as the keys of every
+    encoding of it) so the pack can still be assembled.
+    """
+    store = _get_audio_store()
+    audio_gen = _get_audio_gen()
+    failed = []
+
+    # One Piper session per language batch
+    for language, batch in batch_by_language(jobs, lambda job: job[1], workers=1):
+        try:
+            errors = synthesize_batch(audio_gen, store, language, [(text, outputs) for text, _, outputs in batch])
+        except Exception as e:
+            errors = [str(e)] * len(batch)
+        for (text, _, outputs), error in zip(batch, errors):
+            if error is not None:
+                logger.error(f"Gen Failed: Error generating '{text}': {error}")
+                failed.extend(outputs.values())
+
+    _redis().incrby(_FANOUT_PROGRESS_KEY.format(job_id=job_id), len(jobs))
+    return {"done": len(jobs) - len(failed), "failed": failed}
+
+
+@celery_app.task(bind=True)
+def assemble_pack_task(
+    self, chunk_results: List[dict], version_tag: str,
+    delta_from: Optional[List[str]] = None, pack_format: Optional[str] = None
+):
+    """Chord callback: build the pack once every synthesis chunk has finished."""
+    failed = {key for result in chunk_results for key in result["failed"]}
+    db = SessionLocal()
+    try:
+        packager = ContentPackager(
+            db, PACKS_DIR, audio_gen=_get_audio_gen(),
+            progress=_progress_reporter(self, version_tag),
+            audio_store=_get_audio_store(), pack_format=pack_format
+        )
+        zip_path = packager.generate_pack(version_tag, delta_bases=delta_from, failed_keys=failed)
+        return _artifact(version_tag, zip_path)
+    finally:
+        db.close()
+        _redis().delete(_FANOUT_PROGRESS_KEY.format(job_id=self.request.id))
+        _release_build_lock(version_tag, self.request.id)
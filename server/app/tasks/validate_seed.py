@@ -27,7 +27,7 @@ def validate_seed():
         for item in vocab_list:
             word = item["word"]
             
-            result = validator.validate(word)
+            result = validator.validate(word, pos=item.get("pos"))
             
             if result.valid:
                 passed += 1
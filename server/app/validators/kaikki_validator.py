@@ -1,7 +1,79 @@
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.services.kaikki_store import DEFAULT_DB_PATH, KaikkiStore, strip_article
+
+logger = logging.getLogger(__name__)
+
+_GENDER_NAMES = {"m": "masculine", "f": "feminine", "n": "neuter"}
+
+
+@dataclass
+class ValidationResult:
+    valid: bool = True
+    errors: List[str] = field(default_factory=list)
+    # Dictionary values for the fields that failed (gender, plural)
+    corrections: Dict[str, str] = field(default_factory=dict)
+
+    def fail(self, message: str, fieldname: Optional[str] = None, correction: Optional[str] = None):
+        self.valid = False
+        self.errors.append(message)
+        if fieldname and correction:
+            self.corrections[fieldname] = correction
+
+
 class KaikkiValidator:
+    """
+    Checks vocabulary (existence, noun gender and plural) against the Kaikki
+    index. Use as a context manager; every check is a point lookup.
+
+    Without an index (ingest not run yet) nothing can be checked, so every
+    item passes and a warning is logged once.
+    """
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.store: Optional[KaikkiStore] = None
+
     def __enter__(self):
+        try:
+            self.store = KaikkiStore(self.db_path)
+        except FileNotFoundError as e:
+            logger.warning(f"{e}; Kaikki checks are skipped")
         return self
+
     def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def validate(self, word: str, gender: Optional[str] = None, plural: Optional[str] = None,
+                 pos: Optional[str] = None) -> ValidationResult:
+        result = ValidationResult()
+        if self.store is None or not word:
+            return result
+
+        entries = self.store.lookup(word, pos)
+        if not entries:
+            result.fail(f"'{strip_article(word)}' not found in Kaikki")
+            return result
+
+        if pos in (None, "noun"):
+            nouns = [e for e in entries if e.pos == "noun"]
+            expected_gender = next((e.gender for e in nouns if e.gender), None)
+            if gender and expected_gender and gender != expected_gender:
+                result.fail(
+                    f"Gender '{gender}' but Kaikki has {_GENDER_NAMES.get(expected_gender, expected_gender)}",
+                    "gender", expected_gender,
+                )
+            expected_plural = next((e.plural for e in nouns if e.plural), None)
+            if plural and expected_plural and strip_article(plural) != expected_plural:
+                result.fail(f"Plural '{plural}' but Kaikki has '{expected_plural}'", "plural", expected_plural)
+
+        return result
+
     def validate_item(self, word, gender, pos, plural, ipa):
-        return []
+        """Error messages for one item (IPA transcriptions vary too much to compare)."""
+        return self.validate(word, gender=gender, plural=plural, pos=pos).errors
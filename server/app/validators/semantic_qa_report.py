@@ -33,7 +33,7 @@ class SemanticQAReport:
 
                 for item in items:
                     # 1. Validate against Kaikki
-                    kaikki_res = kv.validate(item.word, item.gender, item.plural_form)
+                    kaikki_res = kv.validate(item.word, item.gender, item.plural_form, pos=item.part_of_speech)
                     kaikki_status = "OK" if kaikki_res.valid else f"FAIL: {kaikki_res.errors}"
 
                     # Show actual DB values when valid, corrections when invalid
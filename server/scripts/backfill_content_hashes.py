@@ -0,0 +1,22 @@
+import sys
+import os
+
+# Add parent directory to path so we can import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.bulk_import import backfill_content_hashes
+
+def backfill():
+    """One-off: fill in missing or stale content hashes (imports keep them current afterwards)."""
+    print("Backfilling content hashes...")
+    db = SessionLocal()
+    try:
+        fixed = backfill_content_hashes(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Backfill complete. {fixed} rows updated.")
+
+if __name__ == "__main__":
+    backfill()
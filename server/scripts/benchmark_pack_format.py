@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Compare pack document formats (see PACK_FORMATS in content_packager) on real
+content: compressed and uncompressed size inside the ZIP, the time a client
+needs to parse them, and the peak memory of parsing (a streaming client holds
+one NDJSON record at a time, a 1.0 client the whole array).
+
+Usage:
+    python scripts/benchmark_pack_format.py [--vocabulary FILE] [--grammar FILE] [--repeat N]
+"""
+import argparse
+import io
+import json
+import sys
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+# Add server root to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.content_packager import PACK_FORMATS, write_pack_documents
+
+SERVER_ROOT = Path(__file__).resolve().parent.parent
+# vocabulary.json extracted from a real pack, and the consolidated grammar import
+DEFAULT_VOCABULARY = SERVER_ROOT / "vocabulary.json"
+DEFAULT_GRAMMAR = SERVER_ROOT.parent / "data" / "raw" / "grammar" / "grammar_a1_consolidated.json"
+
+
+def load_grammar(path: Path) -> list:
+    """Grammar import file -> the entries the packager writes for each topic."""
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        topics = json.load(f).get("topics", [])
+    return [
+        {
+            "id": t["id"],
+            "title": t["title"],
+            "description": t.get("description"),
+            "sequence_order": t.get("sequence_order"),
+            "content": t.get("sections", []),
+            "exercises": t.get("exercises", []),
+        }
+        for t in topics
+    ]
+
+
+def parse(zf: zipfile.ZipFile, files: dict) -> int:
+    """Parse every document the way a client would; returns the record count."""
+    count = 0
+    for name in files.values():
+        if name.endswith(".ndjson"):
+            with zf.open(name) as f:
+                for line in io.TextIOWrapper(f, encoding="utf-8"):
+                    if line.strip():
+                        json.loads(line)
+                        count += 1
+        else:
+            count += len(json.loads(zf.read(name)))
+    return count
+
+
+def bench(pack_format: str, vocabulary: list, grammar: list, rounds: int) -> dict:
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        files = write_pack_documents(zf, pack_format, vocabulary, grammar)
+    write_time = time.perf_counter() - start
+
+    with zipfile.ZipFile(buffer) as zf:
+        infos = [zf.getinfo(name) for name in files.values()]
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            records = parse(zf, files)
+            timings.append(time.perf_counter() - start)
+
+        # Separate pass: tracemalloc slows parsing down too much to time it
+        tracemalloc.start()
+        parse(zf, files)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "format": pack_format,
+        "files": ", ".join(files.values()),
+        "raw": sum(i.file_size for i in infos),
+        "zipped": sum(i.compress_size for i in infos),
+        "write_ms": write_time * 1000,
+        "parse_ms": min(timings) * 1000,
+        "peak": peak,
+        "records": records,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pack document formats.")
+    parser.add_argument("--vocabulary", type=Path, default=DEFAULT_VOCABULARY, help="Pack vocabulary.json to use")
+    parser.add_argument("--grammar", type=Path, default=DEFAULT_GRAMMAR, help="Grammar import file to use")
+    parser.add_argument("--repeat", type=int, default=1, help="Replicate the vocabulary N times (scale test)")
+    parser.add_argument("--rounds", type=int, default=5, help="Parse rounds per format (best is reported)")
+    args = parser.parse_args()
+
+    if not args.vocabulary.exists():
+        print(f"Error: vocabulary file not found: {args.vocabulary}")
+        sys.exit(1)
+    with open(args.vocabulary, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    vocabulary = [
+        {**entry, "id": f"{entry['id']}#{n}" if n else entry["id"]}
+        for n in range(args.repeat) for entry in base
+    ]
+    grammar = load_grammar(args.grammar)
+    print(f"{len(vocabulary)} vocabulary entries, {len(grammar)} grammar topics\n")
+
+    results = [bench(fmt, vocabulary, grammar, args.rounds) for fmt in PACK_FORMATS]
+    baseline = results[0]
+    print(f"{'format':<8}{'raw KB':>10}{'zipped KB':>11}{'write ms':>10}{'parse ms':>10}{'peak KB':>10}   files")
+    for r in results:
+        print(
+            f"{r['format']:<8}{r['raw'] / 1024:>10.1f}{r['zipped'] / 1024:>11.1f}"
+            f"{r['write_ms']:>10.1f}{r['parse_ms']:>10.1f}{r['peak'] / 1024:>10.1f}   {r['files']}"
+        )
+    for r in results[1:]:
+        print(
+            f"\n{r['format']} vs {baseline['format']}: "
+            f"raw {100 * (r['raw'] / baseline['raw'] - 1):+.1f}%, "
+            f"zipped {100 * (r['zipped'] / baseline['zipped'] - 1):+.1f}%, "
+            f"parse {100 * (r['parse_ms'] / baseline['parse_ms'] - 1):+.1f}%, "
+            f"peak memory {100 * (r['peak'] / baseline['peak'] - 1):+.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
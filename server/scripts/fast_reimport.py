@@ -3,6 +3,8 @@ from pathlib import Path
 import urllib.request
 import urllib.error
 
+from pack_jobs import wait_for_pack_job
+
 # Configuration
 API_BASE = "http://localhost:8000/api/v1"
 SEED_DIR = Path(__file__).parent.parent / "data" / "seed"
@@ -48,7 +50,14 @@ def generate_pack():
     try:
         with urllib.request.urlopen(req) as response:
             result = json.load(response)
-            print(f"Pack Generation Success: {result}")
+            print(f"Pack build queued: {result['job_id']}")
+
+        job = wait_for_pack_job(API_BASE, result["status_url"])
+        if job["state"] == "SUCCESS":
+            print(f"\nPack Generation Success: {job['artifact']}")
+            print(f"Download URL: {API_BASE}/packs/{job['artifact']['filename']}")
+        else:
+            print(f"\nPack Generation Failed: {job.get('error')}")
     except urllib.error.HTTPError as e:
         print(f"Pack Generation Failed: {e.code} - {e.read().decode()}")
     except Exception as e:
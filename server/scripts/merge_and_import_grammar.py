@@ -5,6 +5,8 @@ import requests
 import sys
 from pathlib import Path
 
+from pack_jobs import wait_for_pack_job
+
 # Configuration
 API_BASE = "http://localhost:8000/api/v1"
 GRAMMAR_DIR = Path("/app/data/raw/grammar")
@@ -56,7 +58,7 @@ def merge_json_files(directory):
 def import_grammar(topics):
     if not topics:
         print("No topics to import.")
-        return
+        return None
 
     payload = {
         "source_name": "merged_script_import",
@@ -69,18 +71,25 @@ def import_grammar(topics):
         
         if response.status_code == 201:
             print("Import Success:", response.json())
+            return response.json()
         else:
             print(f"Import Failed: {response.status_code} - {response.text}")
             
     except requests.exceptions.RequestException as e:
         print(f"Network Error: {e}")
+    return None
 
 def generate_pack():
     print("Triggering pack generation...")
     try:
         response = requests.post(f"{API_BASE}/packs/latest?version_tag=v1_grammar_update")
-        if response.status_code == 201:
-            print("Pack Generation Success:", response.json())
+        if response.status_code == 202:
+            print("Pack build queued:", response.json()["job_id"])
+            job = wait_for_pack_job(API_BASE, response.json()["status_url"])
+            if job["state"] == "SUCCESS":
+                print("Pack Generation Success:", job["artifact"])
+            else:
+                print("Pack Generation Failed:", job.get("error"))
         else:
             print(f"Pack Generation Failed: {response.status_code} - {response.text}")
     except requests.exceptions.RequestException as e:
@@ -92,10 +101,13 @@ if __name__ == "__main__":
         sys.exit(1)
         
     topics = merge_json_files(GRAMMAR_DIR)
-    import_grammar(topics)
+    result = import_grammar(topics)
     
     print("-" * 30)
     print("-" * 30)
+    if result and result.get("inserted", 0) + result.get("updated", 0) == 0:
+        print("Grammar unchanged, skipping pack generation.")
+        sys.exit(0)
     # user_input = input("Generate new content pack now? (y/n): ")
     print("Auto-triggering pack generation...")
     generate_pack()
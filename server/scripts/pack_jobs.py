@@ -0,0 +1,43 @@
+"""Shared helper for scripts that queue a pack build and wait for it."""
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# Give up on a build that hasn't finished after this many seconds
+JOB_TIMEOUT = 3 * 60 * 60
+# PENDING is also what Celery reports for unknown ids (no worker picked the
+# job up, or its result expired), so it isn't waited out for long
+PENDING_TIMEOUT = 5 * 60
+POLL_INTERVAL = 2
+
+
+def wait_for_pack_job(api_base, status_url, timeout=JOB_TIMEOUT, pending_timeout=PENDING_TIMEOUT):
+    """
+    Poll a queued pack build until it finishes and return the final status.
+    Exits the script (status 1) if the job stays PENDING for `pending_timeout`
+    seconds or doesn't finish within `timeout`.
+    """
+    url = f"{api_base.rsplit('/api/v1', 1)[0]}{status_url}"
+    start = time.monotonic()
+    last_phase = None
+    while True:
+        with urllib.request.urlopen(url) as response:
+            job = json.load(response)
+        if job["state"] in ("SUCCESS", "FAILURE", "REVOKED"):
+            return job
+
+        elapsed = time.monotonic() - start
+        if job["state"] == "PENDING" and elapsed > pending_timeout:
+            sys.exit(f"\nPack job {job['job_id']} still PENDING after {pending_timeout}s: "
+                     f"is a Celery worker running on the content_pipeline queue?")
+        if elapsed > timeout:
+            sys.exit(f"\nPack job {job['job_id']} did not finish within {timeout}s (last state: {job['state']}).")
+
+        if job.get("phase") and job.get("phase") != last_phase:
+            last_phase = job["phase"]
+            print(f"  phase: {last_phase}")
+        if job.get("total"):
+            print(f"  {job['phase']}: {job['done']}/{job['total']}", end="\r")
+        time.sleep(POLL_INTERVAL)
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+import logging
+
+# Add server root to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.pack_catalog import PackCatalog
+
+logging.basicConfig(level=logging.INFO)
+
+PACKS_DIR = Path(__file__).resolve().parent.parent / "data" / "processed" / "packs"
+
+
+def main():
+    """Recreate catalog.json from the pack archives on disk (packs built before the catalog existed)."""
+    packs_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else PACKS_DIR
+    if not packs_dir.exists():
+        print(f"Error: packs directory not found: {packs_dir}")
+        sys.exit(1)
+
+    catalog = PackCatalog(packs_dir).rebuild()
+    print(f"Catalogued {len(catalog['packs'])} packs, latest: {catalog['latest']}")
+
+
+if __name__ == "__main__":
+    main()
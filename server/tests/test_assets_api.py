@@ -0,0 +1,108 @@
+import unittest
+import io
+import json
+import hashlib
+import zipfile
+import tempfile
+import logging
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.v1 import assets
+from app.models.vocabulary import VocabularyItem
+from app.models.grammar import GrammarTopic
+from app.services.content_packager import ContentPackager
+
+logging.basicConfig(level=logging.CRITICAL)
+
+
+class TestAssetsApi(unittest.TestCase):
+    def setUp(self):
+        self.tmp_obj = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmp_obj.name)
+        self.packs_dir = self.tmp / "packs"
+        self.cache_dir = self.tmp / "audio_cache"
+
+        # A pre-recorded clip with its own bytes, next to dummy TTS output
+        (self.cache_dir / "vocab").mkdir(parents=True)
+        (self.cache_dir / "vocab" / "katze.ogg").write_bytes(b"OggS recorded katze")
+
+        rows = {
+            VocabularyItem: [
+                VocabularyItem(id="hund", word="Hund", article="der", translation_en="dog", example_sentences=[]),
+                VocabularyItem(id="katze", word="Katze", article="die", translation_en="cat",
+                               audio_learn_path="katze.ogg", example_sentences=[]),
+            ],
+            GrammarTopic: [],
+        }
+        self.db = MagicMock()
+        def query(model):
+            q = MagicMock()
+            q.order_by.return_value.all.return_value = rows[model]
+            return q
+        self.db.query.side_effect = query
+
+        self.patches = [
+            patch.object(assets, "PACKS_DIR", self.packs_dir),
+            patch.object(assets, "ASSETS_DIR", self.cache_dir / "assets"),
+        ]
+        for p in self.patches:
+            p.start()
+        app = FastAPI()
+        app.include_router(assets.router, prefix="/api/v1/assets")
+        self.client = TestClient(app)
+
+        ContentPackager(self.db, self.packs_dir, self.cache_dir).generate_pack("v1")
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmp_obj.cleanup()
+
+    def test_manifest_lists_every_clip_by_content_hash(self):
+        manifest = self.client.get("/api/v1/assets/manifest").json()
+        self.assertEqual(manifest["version"], "v1")
+
+        by_path = {a["path"]: a for a in manifest["assets"]}
+        recorded = b"OggS recorded katze"
+        self.assertEqual(by_path["audio/vocab/katze.ogg"]["hash"], hashlib.sha256(recorded).hexdigest())
+        self.assertEqual(by_path["audio/vocab/katze.ogg"]["size"], len(recorded))
+
+        with zipfile.ZipFile(self.packs_dir / "deutschstart_v1.zip") as z:
+            for path, asset in by_path.items():
+                self.assertEqual(hashlib.sha256(z.read(path)).hexdigest(), asset["hash"])
+
+        self.assertEqual(self.client.get("/api/v1/assets/manifest?version=v9").status_code, 404)
+
+    def test_single_asset_is_immutable(self):
+        digest = hashlib.sha256(b"OggS recorded katze").hexdigest()
+        response = self.client.get(f"/api/v1/assets/{digest}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"OggS recorded katze")
+        self.assertEqual(response.headers["content-type"], "audio/ogg")
+        self.assertIn("immutable", response.headers["cache-control"])
+        self.assertEqual(response.headers["etag"], f'"{digest}"')
+
+        self.assertEqual(self.client.get(f"/api/v1/assets/{'0' * 64}").status_code, 404)
+        self.assertEqual(self.client.get("/api/v1/assets/not-a-hash").status_code, 400)
+
+    def test_batch_returns_found_and_missing(self):
+        manifest = self.client.get("/api/v1/assets/manifest").json()
+        wanted = sorted({a["hash"] for a in manifest["assets"]})
+        unknown = "f" * 64
+
+        response = self.client.post("/api/v1/assets/batch", json={"hashes": wanted + [unknown]})
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(response.content)) as z:
+            self.assertEqual(json.loads(z.read("missing.json")), [unknown])
+            for digest in wanted:
+                self.assertEqual(hashlib.sha256(z.read(digest)).hexdigest(), digest)
+
+        too_many = self.client.post("/api/v1/assets/batch", json={"hashes": [f"{i:064x}" for i in range(501)]})
+        self.assertEqual(too_many.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import io
+import os
+import struct
+import subprocess
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+from app.services import audio_audit, loudness
+from app.services.audio_audit import AudioAudit, AudioInfo, is_compatible, read_audio_info
+
+
+def wav_bytes(rate, channels=1):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\x00\x00" * channels * 10)
+    return buf.getvalue()
+
+
+def ogg_bytes(packet):
+    # One page holding one packet: 27-byte header, 1-entry segment table, packet
+    return b"OggS" + bytes(22) + bytes([1, len(packet)]) + packet
+
+
+def vorbis_ogg(rate, channels=1):
+    return ogg_bytes(b"\x01vorbis" + struct.pack("<IBI", 0, channels, rate) + bytes(14))
+
+
+def opus_ogg(channels=1):
+    return ogg_bytes(b"OpusHead" + struct.pack("<BBHI", 1, channels, 312, 24000) + bytes(3))
+
+
+class TestAudioAudit(unittest.TestCase):
+    def setUp(self):
+        self.tmp_obj = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmp_obj.name)
+        self.audio = self.tmp / "audio"
+        self.audio.mkdir()
+
+    def tearDown(self):
+        self.tmp_obj.cleanup()
+
+    def write(self, name, data):
+        path = self.audio / name
+        path.write_bytes(data)
+        return path
+
+    def test_headers_are_parsed_natively(self):
+        id3 = b"ID3\x04\x00\x00\x00\x00\x00\x05" + bytes(5)
+        mp3_frame = bytes([0xFF, 0xFB, 0x90, 0xC4]) + bytes(20)  # MPEG-1 layer III, 44.1kHz, mono
+        flac = b"fLaC" + bytes([0x80, 0, 0, 34]) + bytes(10) + bytes([0x05, 0x62, 0x20, 0xF0]) + bytes(20)
+
+        with patch("subprocess.run", side_effect=AssertionError("spawned a process")):
+            self.assertEqual(read_audio_info(self.write("a.wav", wav_bytes(44100, 2))), AudioInfo("pcm", 44100, 2))
+            self.assertEqual(read_audio_info(self.write("b.ogg", vorbis_ogg(22050))), AudioInfo("vorbis", 22050, 1))
+            self.assertEqual(read_audio_info(self.write("c.ogg", opus_ogg())), AudioInfo("opus", 48000, 1))
+            self.assertEqual(read_audio_info(self.write("d.mp3", id3 + mp3_frame)), AudioInfo("mp3", 44100, 1))
+            self.assertEqual(read_audio_info(self.write("e.flac", flac)), AudioInfo("flac", 22050, 1))
+            self.assertIsNone(read_audio_info(self.write("f.ogg", b"DUMMY_AUDIO_CONTENT")))
+
+    def test_standard_rates_are_compatible(self):
+        self.assertTrue(is_compatible(AudioInfo("mp3", 44100, 2)))
+        self.assertTrue(is_compatible(AudioInfo("vorbis", 44100, 1)))
+        self.assertTrue(is_compatible(AudioInfo("pcm", 16000, 1)))
+        self.assertFalse(is_compatible(AudioInfo("pcm", 192000, 1)))
+        self.assertFalse(is_compatible(AudioInfo("vorbis", 96000, 1)))
+
+    def test_unchanged_files_are_answered_from_the_index(self):
+        ok = self.write("ok.ogg", vorbis_ogg(22050))
+        bad = self.write("bad.wav", wav_bytes(192000))  # Piper's native rate
+        lite = self.write("lite.ogg", opus_ogg())
+        index = self.tmp / "audit.json"
+
+        report = AudioAudit(index).audit(audio_audit.iter_audio_files([self.audio]))
+        self.assertEqual((report.checked, report.cached), (3, 0))
+        self.assertEqual([p for p, _ in report.incompatible], [bad])
+
+        with patch.object(audio_audit, "read_audio_info", side_effect=AssertionError("re-read")):
+            report = AudioAudit(index).audit([ok, bad, lite])
+        self.assertEqual(report.cached, 3)
+        self.assertEqual(len(report.incompatible), 1)
+
+        # A rewritten file is read again
+        ok.write_bytes(vorbis_ogg(96000))
+        os.utime(ok, ns=(1, 1))
+        report = AudioAudit(index).audit([ok, lite])
+        self.assertEqual(report.cached, 1)
+        self.assertEqual([p for p, _ in report.incompatible], [ok])
+
+    def test_fix_converts_and_reindexes(self):
+        bad = self.write("bad.wav", wav_bytes(192000))
+        commands = []
+
+        def fake_ffmpeg(cmd, **kwargs):
+            commands.append(cmd)
+            if cmd[-1] != "-":
+                Path(cmd[-1]).write_bytes(wav_bytes(int(cmd[cmd.index("-ar") + 1])))
+            return subprocess.CompletedProcess(cmd, 0, stdout=b"", stderr=(
+                b'{"input_i": "-20.0", "input_tp": "-3.0", "input_lra": "2.0", "input_thresh": "-30.0", '
+                b'"output_i": "-14.0", "output_tp": "-1.5", "output_lra": "2.0", "output_thresh": "-24.0", '
+                b'"target_offset": "0.1"}'
+            ))
+
+        # Threads stand in for the process pool so the ffmpeg stub applies
+        with patch.object(audio_audit, "ProcessPoolExecutor", ThreadPoolExecutor), \
+                patch("subprocess.run", side_effect=fake_ffmpeg):
+            report = AudioAudit(self.tmp / "audit.json").audit([bad], fix=True)
+            # Resampling alone leaves loudness as recorded
+            self.assertFalse(any("-af" in cmd for cmd in commands))
+            self.assertIsNone(loudness.load(bad))
+
+            bad.write_bytes(wav_bytes(192000))
+            report = AudioAudit(self.tmp / "audit.json", normalize=True).audit([bad], fix=True)
+
+        self.assertEqual(report.fixed, [bad])
+        self.assertEqual(read_audio_info(bad).sample_rate, 22050)
+        self.assertEqual(loudness.load(bad)["input_i"], -14.0)
+        self.assertFalse(AudioAudit(self.tmp / "audit.json").check([bad]).incompatible)
+
+
+if __name__ == '__main__':
+    unittest.main()
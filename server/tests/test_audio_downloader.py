@@ -0,0 +1,125 @@
+import unittest
+import json
+import logging
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from app.services.audio_downloader import AudioDownloader, TokenBucket, retry_after_seconds
+
+logging.getLogger("app").setLevel(logging.CRITICAL)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the test can see connections being reused
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] += 1
+            hits = server.hits[self.path]
+            server.connections.add(self.client_address)
+
+        if self.path == "/missing.ogg":
+            self.reply(404, b"not here")
+        elif self.path == "/broken.ogg":
+            self.reply(500, b"oops")
+        elif self.path == "/limited.ogg" and hits == 1:
+            self.reply(429, b"slow down", {"Retry-After": "1"})
+        else:
+            self.reply(200, f"OGG{self.path}".encode())
+
+    def reply(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestAudioDownloader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_obj = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmp_obj.name)
+        self.dest = self.tmp / "kaikki"
+        self.ledger = self.tmp / "ledger.json"
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.hits = Counter()
+        self.server.connections = set()
+        self.server.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_obj.cleanup()
+
+    def downloader(self, **kwargs):
+        return AudioDownloader(self.dest, self.ledger, rate=1000, burst=10, backoff_base=0.01, max_attempts=3, **kwargs)
+
+    def test_outcomes_are_recorded_and_skipped_on_rerun(self):
+        urls = [f"{self.base}/{name}.ogg" for name in ("a", "b", "c", "missing", "broken", "limited")]
+
+        start = time.monotonic()
+        report = self.downloader(concurrency=3).download_all(urls)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(sorted(Path(u).name for u in report.downloaded), ["a.ogg", "b.ogg", "c.ogg", "limited.ogg"])
+        self.assertEqual(report.missing, [f"{self.base}/missing.ogg"])
+        self.assertEqual(list(report.failed), [f"{self.base}/broken.ogg"])
+        self.assertEqual((self.dest / "a.ogg").read_bytes(), b"OGG/a.ogg")
+        self.assertEqual(sorted(p.name for p in self.dest.iterdir()), ["a.ogg", "b.ogg", "c.ogg", "limited.ogg"])
+
+        # 404 is not retried, 500 is retried up to max_attempts, 429 waits out Retry-After
+        self.assertEqual((self.server.hits["/missing.ogg"], self.server.hits["/broken.ogg"]), (1, 3))
+        self.assertEqual(self.server.hits["/limited.ogg"], 2)
+        self.assertGreaterEqual(elapsed, 1.0)
+        # Keep-alive: fewer connections than requests
+        self.assertLess(len(self.server.connections), sum(self.server.hits.values()))
+
+        with open(self.ledger, encoding="utf-8") as f:
+            states = {Path(url).name: entry["state"] for url, entry in json.load(f).items()}
+        self.assertEqual(states["missing.ogg"], "missing")
+        self.assertEqual(states["broken.ogg"], "failed")
+
+        self.server.hits.clear()
+        report = self.downloader().download_all(urls)
+        self.assertEqual(len(report.skipped), 6)
+        self.assertEqual(sum(self.server.hits.values()), 0)
+
+        # Failed URLs can be given another chance
+        report = self.downloader().download_all(urls, retry_failed=True)
+        self.assertEqual(self.server.hits["/broken.ogg"], 3)
+        self.assertEqual(len(report.skipped), 5)
+
+        # ...and get one by themselves once their cooldown has passed
+        self.server.hits.clear()
+        report = self.downloader(failed_cooldown=0).download_all(urls)
+        self.assertEqual(self.server.hits["/broken.ogg"], 3)
+        self.assertEqual(list(report.failed), [f"{self.base}/broken.ogg"])
+
+    def test_token_bucket_paces_requests(self):
+        bucket = TokenBucket(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_retry_after_forms(self):
+        self.assertEqual(retry_after_seconds("7"), 7.0)
+        self.assertEqual(retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(retry_after_seconds("soon"))
+
+
+if __name__ == '__main__':
+    unittest.main()
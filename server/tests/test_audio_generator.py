@@ -0,0 +1,199 @@
+import unittest
+import io
+import sys
+import wave
+import stat
+import tempfile
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+from app.services import loudness
+from app.services.audio_generator import AudioGenerator, SynthesisJob
+from app.services.audio_store import AudioStore
+
+# Stand-in for the piper binary: JSON-lines in, one WAV file per line written to the
+# requested output_file. Like the real binary, audio never goes to stdout; only the
+# path line printed after each file is flushed (std::endl).
+# Every clip carries the PID as its audio payload so tests can tell whether the process was reused.
+FAKE_PIPER = f"""#!{sys.executable}
+import json, os, sys, wave
+for line in sys.stdin:
+    req = json.loads(line)
+    with wave.open(req["output_file"], "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(22050)
+        w.writeframes(f"{{os.getpid()}}:{{req['text']}}".encode("utf-8").ljust(64, b" "))
+    print(req["output_file"], flush=True)
+"""
+
+
+class TestAudioGenerator(unittest.TestCase):
+    def setUp(self):
+        self.tmp_obj = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmp_obj.name)
+
+        self.piper = self.tmp / "piper"
+        self.piper.write_text(FAKE_PIPER)
+        self.piper.chmod(self.piper.stat().st_mode | stat.S_IEXEC)
+
+        self.model = self.tmp / "voice.onnx"
+        self.model.write_bytes(b"")
+
+        self.gen = AudioGenerator(
+            german_model_path=str(self.model),
+            english_model_path=str(self.model),
+            piper_binary=str(self.piper),
+            workers_per_voice=1,
+        )
+
+    def tearDown(self):
+        self.gen.close()
+        self.tmp_obj.cleanup()
+
+    def _synthesize(self, text, language="de"):
+        worker = self.gen._acquire_worker(language)
+        try:
+            wav = worker.synthesize(text)
+        finally:
+            self.gen._release_worker(language, worker)
+        with wave.open(io.BytesIO(wav)) as w:
+            payload = w.readframes(w.getnframes())
+        return payload.decode("utf-8").strip().split(":", 1)
+
+    def test_worker_is_reused_across_utterances(self):
+        pids = {self._synthesize(text)[0] for text in ["Hund", "Katze", "Maus"]}
+        self.assertEqual(len(pids), 1, "Expected a single resident Piper process")
+        # Scratch WAVs are read back and removed
+        self.assertEqual(list(self.gen._workers[0].work_dir.iterdir()), [])
+
+    def test_one_pool_per_voice(self):
+        de_pid, _ = self._synthesize("Hund", "de")
+        en_pid, _ = self._synthesize("dog", "en")
+        self.assertNotEqual(de_pid, en_pid)
+
+    def test_dead_worker_is_replaced(self):
+        first_pid, _ = self._synthesize("Hund")
+        worker = self.gen._acquire_worker("de")
+        worker.process.kill()
+        worker.process.wait()
+        self.gen._release_worker("de", worker)
+
+        second_pid, text = self._synthesize("Katze")
+        self.assertNotEqual(first_pid, second_pid)
+        self.assertEqual(text, "Katze")
+
+    def test_close_terminates_workers(self):
+        self._synthesize("Hund")
+        workers = list(self.gen._workers)
+        self.gen.close()
+        self.assertTrue(all(not w.alive for w in workers))
+
+    def test_batch_runs_through_one_piper_session(self):
+        jobs = [
+            SynthesisJob("Hund", self.tmp / "hund.ogg"),
+            SynthesisJob("", self.tmp / "empty.ogg"),
+            SynthesisJob("Katze", self.tmp / "katze.ogg", variants={"lite": self.tmp / "katze_lite.ogg"}),
+        ]
+
+        def fake_ffmpeg(cmd, input=None, **kwargs):
+            stdout = b"" if cmd[-1] == "-" else b"OggS encoded"
+            return subprocess.CompletedProcess(cmd, 0, stdout=stdout, stderr=LOUDNORM_STATS)
+
+        with AudioGenerator(str(self.model), str(self.model), str(self.piper), workers_per_voice=4) as gen, \
+                patch("subprocess.run", side_effect=fake_ffmpeg):
+            errors = gen.generate_batch(jobs, "de")
+            self.assertEqual(len(gen._workers), 1)
+
+        # Per-job results: the bad job fails alone
+        self.assertIsNone(errors[0])
+        self.assertIn("empty", errors[1])
+        self.assertIsNone(errors[2])
+        self.assertEqual((self.tmp / "katze_lite.ogg").read_bytes(), b"OggS encoded")
+        self.assertFalse((self.tmp / "empty.ogg").exists())
+
+
+# What loudnorm prints with print_format=json (abridged)
+LOUDNORM_STATS = b"""[Parsed_loudnorm_0 @ 0x5581]
+{
+	"input_i" : "-23.10",
+	"input_tp" : "-4.20",
+	"input_lra" : "3.10",
+	"input_thresh" : "-33.50",
+	"output_i" : "-14.02",
+	"output_tp" : "-1.60",
+	"output_lra" : "3.00",
+	"output_thresh" : "-24.40",
+	"normalization_type" : "linear",
+	"target_offset" : "0.02"
+}
+"""
+
+
+class TestLoudness(unittest.TestCase):
+    def setUp(self):
+        self.tmp_obj = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmp_obj.name)
+        self.ffmpeg_calls = []
+
+    def tearDown(self):
+        self.tmp_obj.cleanup()
+
+    def fake_ffmpeg(self, cmd, input=None, **kwargs):
+        self.ffmpeg_calls.append(cmd)
+        stdout = b"" if cmd[-1] == "-" else b"OggS encoded"
+        return subprocess.CompletedProcess(cmd, 0, stdout=stdout, stderr=LOUDNORM_STATS)
+
+    def test_measured_once_and_stored_next_to_each_clip(self):
+        piper = self.tmp / "piper"
+        piper.write_text(FAKE_PIPER)
+        piper.chmod(piper.stat().st_mode | stat.S_IEXEC)
+        model = self.tmp / "voice.onnx"
+        model.write_bytes(b"")
+        std, lite = self.tmp / "std.ogg", self.tmp / "lite.ogg"
+
+        with AudioGenerator(str(model), str(model), str(piper), workers_per_voice=1) as gen, \
+                patch("subprocess.run", side_effect=self.fake_ffmpeg):
+            gen.generate_audio("Hund", std, variants={"lite": lite})
+
+        analysis = [c for c in self.ffmpeg_calls if c[-1] == "-"]
+        encodes = [c for c in self.ffmpeg_calls if c[-1] != "-"]
+        self.assertEqual((len(analysis), len(encodes)), (1, 2))
+        for cmd in encodes:
+            af = cmd[cmd.index("-af") + 1]
+            self.assertIn("measured_I=-23.1", af)
+            self.assertIn("linear=true", af)
+
+        # The sidecar describes the encoded clip, ready to seed its next encode
+        self.assertEqual(loudness.load(std)["input_i"], -14.02)
+        self.assertEqual(loudness.load(lite)["input_tp"], -1.6)
+
+    def test_sidecar_is_reused_until_the_clip_changes(self):
+        clip = self.tmp / "anki.ogg"
+        clip.write_bytes(b"OggS recorded")
+
+        with patch("subprocess.run", side_effect=self.fake_ffmpeg):
+            first = loudness.measurement_for(clip)
+            self.assertEqual(loudness.measurement_for(clip), first)
+            self.assertEqual(len(self.ffmpeg_calls), 1)
+
+            clip.write_bytes(b"OggS re-recorded, longer")
+            loudness.measurement_for(clip)
+            self.assertEqual(len(self.ffmpeg_calls), 2)
+
+        self.assertEqual(first, {
+            "input_i": -23.1, "input_tp": -4.2, "input_lra": 3.1, "input_thresh": -33.5, "target_offset": 0.02,
+        })
+
+    def test_cache_keys_ignore_measurements(self):
+        gen = AudioGenerator(piper_binary=str(self.tmp / "missing"))
+        self.assertEqual(gen.voice_settings("de")["encoder"], AudioGenerator.ENCODER_ARGS)
+        self.assertIn(loudness.LOUDNORM_FILTER, gen.encoder_args("lite"))
+        # ...but do change with the normalization procedure
+        key = AudioStore.key_for(gen.voice_settings("de"))
+        with patch.object(loudness, "LOUDNORM_MODE", "two-pass-linear-v2"):
+            self.assertNotEqual(AudioStore.key_for(gen.voice_settings("de")), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+import unittest
+import json
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.api.v1 import import_content
+from app.database import get_db
+from app.models.grammar import GrammarTopic
+from app.models.vocabulary import VocabularyItem
+from app.schemas.content import GrammarTopicInput, VocabularyItemInput
+from app.services.bulk_import import VocabularyBulkImporter, backfill_content_hashes, upsert_grammar_topics
+from app.services.content_hashing import grammar_topic_hash, vocabulary_content_hash
+from app.services.json_stream import JsonObjectStream
+
+
+class TestJsonObjectStream(unittest.TestCase):
+    def _parse(self, body: bytes, chunk_size: int):
+        parser = JsonObjectStream("items")
+        elements = []
+        for start in range(0, len(body), chunk_size):
+            elements.extend(parser.feed(body[start:start + chunk_size]))
+        elements.extend(parser.close())
+        return parser.fields, elements
+
+    def test_elements_and_fields_in_any_order(self):
+        doc = {"items": [{"word": "Größe", "n": 12345}, {"word": "Hund"}], "source_name": "seed", "n": 678}
+        body = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+        # Chunk sizes that split multi-byte characters, strings and numbers
+        for chunk_size in (1, 2, 3, 7, len(body)):
+            fields, elements = self._parse(body, chunk_size)
+            self.assertEqual(elements, doc["items"])
+            self.assertEqual(fields, {"source_name": "seed", "n": 678})
+
+    def test_truncated_body_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self._parse(b'{"source_name": "x", "items": [{"word": "Hund"}', 5)
+        with self.assertRaises(ValueError):
+            self._parse(b'{"source_name": "x"}', 5)
+
+
+class SqliteImportTestCase(unittest.TestCase):
+    """Import router on an in-memory SQLite database (ON CONFLICT works there too)."""
+
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        VocabularyItem.__table__.create(self.engine)
+        GrammarTopic.__table__.create(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: self.statements.append(statement))
+
+        self.raw_dir_obj = tempfile.TemporaryDirectory()
+        self.raw_dir = Path(self.raw_dir_obj.name)
+        self.raw_patch = patch.object(import_content, "RAW_VOCAB_DIR", self.raw_dir)
+        self.raw_patch.start()
+
+        app = FastAPI()
+        app.include_router(import_content.router, prefix="/api/v1/import")
+
+        def override_db():
+            db = self.Session()
+            try:
+                yield db
+            finally:
+                db.close()
+        app.dependency_overrides[get_db] = override_db
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.raw_patch.stop()
+        self.raw_dir_obj.cleanup()
+        self.engine.dispose()
+
+
+class TestVocabularyBulkImport(SqliteImportTestCase):
+    def _item(self, word, **fields):
+        return {"word": word, "translation": word.lower(), "pos": "noun", "category": "A1", **fields}
+
+    def test_upsert_keeps_fields_that_are_not_provided(self):
+        with self.Session() as db:
+            importer = VocabularyBulkImporter(db, "first")
+            importer.add(VocabularyItemInput.model_validate(
+                self._item("Hund", gender="m", theme="Animals", order_index=3)
+            ))
+            self.assertEqual(importer.finish(), {"inserted": 1, "updated": 0})
+            db.commit()
+
+        with self.Session() as db:
+            importer = VocabularyBulkImporter(db, "second")
+            importer.add(VocabularyItemInput.model_validate(self._item("Hund", translation="hound")))
+            self.assertEqual(importer.finish(), {"inserted": 0, "updated": 1})
+            db.commit()
+
+        with self.Session() as db:
+            item = db.get(VocabularyItem, "hund")
+            self.assertEqual(item.translation_en, "hound")
+            self.assertEqual((item.gender, item.theme, item.order_index), ("m", "Animals", 3))
+            self.assertEqual(item.generation_source, "second")
+            self.assertEqual(item.content_hash, vocabulary_content_hash(item))
+
+    def test_statements_per_chunk_not_per_item(self):
+        with self.Session() as db:
+            importer = VocabularyBulkImporter(db, "seed", chunk_size=50)
+            for i in range(120):
+                importer.add(VocabularyItemInput.model_validate(self._item(f"Wort{i}")))
+            importer.finish()
+            db.commit()
+            self.assertEqual(db.query(VocabularyItem).count(), 120)
+
+        selects = [s for s in self.statements if s.lstrip().upper().startswith("SELECT")]
+        inserts = [s for s in self.statements if s.lstrip().upper().startswith("INSERT")]
+        self.assertEqual((len(selects), len(inserts)), (3 + 1, 3))  # + the count() above
+        self.assertIn("ON CONFLICT", inserts[0].upper())
+
+    def test_repeated_words_in_one_batch_merge_in_order(self):
+        with self.Session() as db:
+            importer = VocabularyBulkImporter(db, "seed")
+            importer.add(VocabularyItemInput.model_validate(self._item("Hund", gender="m")))
+            importer.add(VocabularyItemInput.model_validate(self._item("hund ", theme="Animals")))
+            importer.finish()
+            db.commit()
+            item = db.get(VocabularyItem, "hund")
+            self.assertEqual((item.gender, item.theme), ("m", "Animals"))
+
+    def test_endpoint_streams_body_with_late_source_name(self):
+        body = {"items": [self._item("Hund"), self._item("Katze")], "source_name": "late_source"}
+        response = self.client.post("/api/v1/import/vocabulary", content=json.dumps(body))
+
+        self.assertEqual(response.status_code, 201, response.text)
+        self.assertEqual(response.json()["inserted"], 2)
+        saved = Path(response.json()["file_saved"])
+        self.assertTrue(saved.name.endswith("_late_source.json"))
+        self.assertEqual(json.loads(saved.read_text(encoding="utf-8")), body)
+
+        with self.Session() as db:
+            sources = {i.generation_source for i in db.query(VocabularyItem).all()}
+            self.assertEqual(sources, {"late_source"})
+
+    def test_import_leaves_other_rows_alone_and_backfill_fixes_them(self):
+        self.client.post("/api/v1/import/vocabulary", content=json.dumps(
+            {"source_name": "seed", "items": [self._item("Hund"), self._item("Katze")]}
+        ))
+        with self.Session() as db:
+            db.execute(VocabularyItem.__table__.update().where(VocabularyItem.__table__.c.id == "katze")
+                       .values(theme="Pets"))
+            db.commit()
+
+        # An import only reads and hashes the rows it upserts
+        self.statements.clear()
+        response = self.client.post("/api/v1/import/vocabulary", content=json.dumps(
+            {"source_name": "again", "items": [self._item("Hund")]}
+        ))
+        self.assertEqual(response.status_code, 201, response.text)
+        self.assertEqual(sum(1 for s in self.statements if s.lstrip().upper().startswith("SELECT")), 1)
+
+        with self.Session() as db:
+            self.assertNotEqual(db.get(VocabularyItem, "katze").content_hash,
+                                vocabulary_content_hash(db.get(VocabularyItem, "katze")))
+            self.assertEqual(backfill_content_hashes(db), 1)
+            db.commit()
+            katze = db.get(VocabularyItem, "katze")
+            self.assertEqual(katze.content_hash, vocabulary_content_hash(katze))
+            self.assertEqual(backfill_content_hashes(db), 0)
+
+    def test_streamed_body_is_documented(self):
+        operation = self.client.get("/openapi.json").json()["paths"]["/api/v1/import/vocabulary"]["post"]
+        schema = operation["requestBody"]["content"]["application/json"]["schema"]
+        self.assertEqual(schema["required"], ["source_name", "items"])
+        self.assertEqual(schema["properties"]["items"]["type"], "array")
+        self.assertIn("translation", schema["properties"]["items"]["items"]["required"])
+
+    def test_endpoint_rejects_invalid_item_without_writing(self):
+        body = {"source_name": "bad", "items": [self._item("Hund"), {"word": "Katze"}]}
+        response = self.client.post("/api/v1/import/vocabulary", content=json.dumps(body))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()["detail"][0]["loc"][:3], ["body", "items", 1])
+        with self.Session() as db:
+            self.assertEqual(db.query(VocabularyItem).count(), 0)
+        self.assertEqual(list(self.raw_dir.iterdir()), [])
+
+
+class TestGrammarBulkImport(SqliteImportTestCase):
+    def _topic(self, topic_id, title="Title", order=1):
+        return {
+            "id": topic_id, "title": title, "description": "desc", "sequence_order": order,
+            "sections": [{"title": "Intro", "content": "Text"}], "exercises": [],
+        }
+
+    def _upsert(self, *topics):
+        with self.Session() as db:
+            counts = upsert_grammar_topics(db, [GrammarTopicInput.model_validate(t) for t in topics])
+            db.commit()
+        return counts
+
+    def test_unchanged_topics_are_skipped(self):
+        self.assertEqual(
+            self._upsert(self._topic("articles"), self._topic("plural", order=2)),
+            {"inserted": 2, "updated": 0, "unchanged": 0},
+        )
+        with self.Session() as db:
+            before = db.get(GrammarTopic, "articles").last_updated
+            db.execute(GrammarTopic.__table__.update().values(last_updated=before - 100))
+            db.commit()
+
+        self.statements.clear()
+        counts = self._upsert(self._topic("articles"), self._topic("plural", title="Plural", order=2))
+        self.assertEqual(counts, {"inserted": 0, "updated": 1, "unchanged": 1})
+        # One prefetch and one set-based write
+        self.assertEqual(sum(1 for s in self.statements if s.lstrip().upper().startswith("INSERT")), 1)
+
+        with self.Session() as db:
+            self.assertEqual(db.get(GrammarTopic, "articles").last_updated, before - 100)
+            plural = db.get(GrammarTopic, "plural")
+            self.assertEqual(plural.title, "Plural")
+            self.assertEqual(plural.content_hash, grammar_topic_hash(plural))
+
+    def test_endpoint_reports_counts(self):
+        body = {"source_name": "grammar", "topics": [self._topic("articles")]}
+        with patch.object(import_content, "RAW_GRAMMAR_DIR", self.raw_dir):
+            first = self.client.post("/api/v1/import/grammar", json=body).json()
+            second = self.client.post("/api/v1/import/grammar", json=body).json()
+        self.assertEqual((first["inserted"], first["unchanged"]), (1, 0))
+        self.assertEqual((second["inserted"], second["updated"], second["unchanged"]), (0, 0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
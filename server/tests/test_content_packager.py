@@ -6,8 +6,9 @@ import tempfile
 import logging
 import traceback
 from pathlib import Path
-from app.services.content_packager import ContentPackager
+from app.services.content_packager import ContentPackager, SYNTHESIS_BATCH_SIZE, batch_by_language, find_delta_chain
 from app.models.vocabulary import VocabularyItem
+from app.models.grammar import GrammarTopic
 from unittest.mock import MagicMock, patch
 
 # Configure logging to swallow errors during tests
@@ -38,12 +39,21 @@ class TestContentPackager(unittest.TestCase):
             example_sentences=[]
         )
         
-        self.mock_db.query.return_value.all.return_value = [self.item1, self.item2]
+        self.rows = {VocabularyItem: [self.item1, self.item2], GrammarTopic: []}
+        def query(model):
+            q = MagicMock()
+            q.order_by.return_value.all.return_value = self.rows[model]
+            q.all.return_value = self.rows[model]
+            return q
+        self.mock_db.query.side_effect = query
 
     def tearDown(self):
         self.test_dir_obj.cleanup()
         self.cache_dir_obj.cleanup()
 
+    def _clip_key(self, packager, text, language="de"):
+        return packager.audio_store.clip_key(text, packager.audio_gen.voice_settings(language))
+
     def test_pack_generation_and_caching(self):
         """Test pack generation, caching, and structure."""
         packager = ContentPackager(self.mock_db, self.test_dir, self.cache_dir)
@@ -55,8 +65,9 @@ class TestContentPackager(unittest.TestCase):
         self.assertTrue(zip_path_1.exists(), "ZIP not created in Run 1")
         
         # Verify cache was populated
-        self.assertTrue((self.cache_dir / "vocab/hund.ogg").exists(), "Cache missing vocab audio")
-        self.assertTrue((self.cache_dir / "sentences/hund_sent_1.ogg").exists(), "Cache missing sentence audio")
+        store = packager.audio_store
+        self.assertTrue(store.path_for(self._clip_key(packager, "der Hund")).exists(), "Cache missing vocab audio")
+        self.assertTrue(store.path_for(self._clip_key(packager, "Der Hund bellt.")).exists(), "Cache missing sentence audio")
         
         # 2. Second Run: Should reuse cache
         # We mock generate_audio to raise Exception. If cache works, it WON'T call this.
@@ -66,10 +77,210 @@ class TestContentPackager(unittest.TestCase):
             
             # Verify manifest version
             with zipfile.ZipFile(zip_path_2, 'r') as z:
+                # Audio is stored as-is (already compressed), JSON is deflated
+                self.assertEqual(z.getinfo("audio/vocab/hund.ogg").compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(z.getinfo("vocabulary.json").compress_type, zipfile.ZIP_DEFLATED)
+
                 with z.open("manifest.json") as f:
                     m = json.load(f)
                     self.assertEqual(m["version"], "v2")
+
+        # No staging tree or partial archives are left behind
+        leftovers = [p.name for p in self.test_dir.iterdir() if p.is_dir() or p.suffix == ".part"]
+        self.assertEqual(leftovers, [])
                     
+    def test_audio_cache_is_content_addressed(self):
+        """Shared sentences are synthesized once; edited sentences get new audio."""
+        self.item2.example_sentences = [{"german": "Der Hund bellt.", "english": "The dog barks."}]
+        packager = ContentPackager(self.mock_db, self.test_dir, self.cache_dir)
+        store = packager.audio_store
+
+        with patch.object(packager.audio_gen, 'generate_audio', wraps=packager.audio_gen.generate_audio) as gen:
+            packager.generate_pack("v1")
+            texts = [c.args[0] for c in gen.call_args_list]
+        self.assertEqual(texts.count("Der Hund bellt."), 1)
+        self.assertTrue(store.has(self._clip_key(packager, "Der Hund bellt.")))
+
+        self.item1.example_sentences = [{"german": "Der Hund schläft.", "english": "The dog sleeps."}]
+        with patch.object(packager.audio_gen, 'generate_audio', wraps=packager.audio_gen.generate_audio) as gen:
+            packager.generate_pack("v2")
+            texts = [c.args[0] for c in gen.call_args_list]
+        self.assertEqual(texts, ["Der Hund schläft."])
+        self.assertTrue(store.has(self._clip_key(packager, "Der Hund schläft.")))
+
+    def test_delta_pack(self):
+        """A delta holds only changed entries, their new clips and removed ids."""
+        packager = ContentPackager(self.mock_db, self.test_dir, self.cache_dir)
+        packager.generate_pack("v1")
+
+        self.item1.translation_en = "hound"
+        item3 = VocabularyItem(
+            id="maus", word="Maus", article="die", translation_en="mouse",
+            part_of_speech="noun", example_sentences=[]
+        )
+        self.rows[VocabularyItem] = [self.item1, item3]
+        packager.generate_pack("v2")
+
+        delta_path = self.test_dir / "deutschstart_v1_to_v2.zip"
+        self.assertTrue(delta_path.exists())
+        with zipfile.ZipFile(delta_path) as z:
+            manifest = json.loads(z.read("manifest.json"))
+            vocab = json.loads(z.read("vocabulary.json"))
+            names = z.namelist()
+
+        self.assertEqual(manifest["base_version"], "v1")
+        self.assertEqual(manifest["removed"]["vocabulary"], ["katze"])
+        self.assertEqual(sorted(e["id"] for e in vocab), ["hund", "maus"])
+        # New English clip for the changed translation, nothing that v1 already shipped
+        self.assertIn("audio/english/hund_en.ogg", names)
+        self.assertIn("audio/vocab/maus.ogg", names)
+        self.assertNotIn("audio/vocab/hund.ogg", names)
+        self.assertNotIn("audio/sentences/hund_sent_1.ogg", names)
+
+    def test_progress_reports_each_phase(self):
+        events = []
+        packager = ContentPackager(
+            self.mock_db, self.test_dir, self.cache_dir,
+            progress=lambda phase, done, total: events.append((phase, done, total))
+        )
+        packager.generate_pack("v1")
+
+        phases = [e[0] for e in events]
+        self.assertEqual(sorted(set(phases), key=phases.index), list(ContentPackager.PHASES))
+        self.assertIn(("scan", 2, 2), events)
+        self.assertIn(("assemble", 2, 2), events)
+
+    def test_compact_ndjson_format(self):
+        self.item1.kaikki_data = {"senses": [{"glosses": ["dog"]}]}
+        packager = ContentPackager(self.mock_db, self.test_dir, self.cache_dir, pack_format="2.0")
+        zip_path = packager.generate_pack("v1")
+
+        with zipfile.ZipFile(zip_path) as z:
+            manifest = json.loads(z.read("manifest.json"))
+            self.assertEqual(manifest["format"], "2.0")
+            self.assertEqual(manifest["files"]["vocabulary"], "vocabulary.ndjson")
+            self.assertNotIn("vocabulary.json", z.namelist())
+
+            lines = z.read("vocabulary.ndjson").decode("utf-8").splitlines()
+            entries = [json.loads(line) for line in lines]
+            self.assertEqual([e["id"] for e in entries], ["hund", "katze"])
+            # No whitespace between tokens
+            self.assertEqual(lines[0], json.dumps(entries[0], ensure_ascii=False, separators=(",", ":")))
+            # Sense data is streamed separately from the flashcard fields
+            self.assertNotIn("kaikki_data", entries[0])
+            kaikki = [json.loads(line) for line in z.read("kaikki.ndjson").decode("utf-8").splitlines()]
+            self.assertEqual(kaikki, [{"id": "hund", "kaikki_data": self.item1.kaikki_data}])
+
+        with self.assertRaises(ValueError):
+            ContentPackager(self.mock_db, self.test_dir, self.cache_dir, pack_format="9.9")
+
+    def test_split_dictionary_pack(self):
+        self.item1.kaikki_data = {"senses": [{"glosses": ["dog"]}]}
+        packager = ContentPackager(self.mock_db, self.test_dir, self.cache_dir, split_dictionary=True)
+        zip_path = packager.generate_pack("v1")
+        dict_path = self.test_dir / "deutschstart_v1_dictionary.zip"
+
+        with zipfile.ZipFile(dict_path) as z:
+            manifest = json.loads(z.read("manifest.json"))
+            self.assertEqual((manifest["type"], manifest["item_count"]), ("dictionary", 1))
+            self.assertEqual(json.loads(z.read("dictionary.json")),
+                             [{"id": "hund", "kaikki_data": self.item1.kaikki_data}])
+
+        with zipfile.ZipFile(zip_path) as z:
+            manifest = json.loads(z.read("manifest.json"))
+            self.assertEqual(manifest["dictionary"]["filename"], dict_path.name)
+            self.assertEqual(manifest["dictionary"]["size"], dict_path.stat().st_size)
+            entries = json.loads(z.read("vocabulary.json"))
+            self.assertNotIn("kaikki_data", entries[0])
+
+    def test_deterministic_rebuild_is_byte_identical(self):
+        self.item1.last_updated, self.item2.last_updated = 1700000000, 1700000500
+        packager = ContentPackager(self.mock_db, self.test_dir, self.cache_dir, deterministic=True)
+        zip_path = packager.generate_pack("v1")
+        first = zip_path.read_bytes()
+        catalog_path = self.test_dir / "catalog.json"
+        catalog_mtime = catalog_path.stat().st_mtime_ns
+
+        with zipfile.ZipFile(zip_path) as z:
+            self.assertEqual(json.loads(z.read("manifest.json"))["generated_at"], 1700000500)
+            self.assertEqual({info.date_time for info in z.infolist()}, {(1980, 1, 1, 0, 0, 0)})
+            clips = [n for n in z.namelist() if n.startswith("audio/")]
+            self.assertEqual(clips, sorted(clips))
+
+        # Fresh packager and a fresh clock: same content, same bytes, nothing republished
+        with patch.object(ContentPackager, "_write_asset_manifest", side_effect=AssertionError("republished")):
+            ContentPackager(self.mock_db, self.test_dir, self.cache_dir, deterministic=True).generate_pack("v1")
+        self.assertEqual(zip_path.read_bytes(), first)
+        self.assertEqual(catalog_path.stat().st_mtime_ns, catalog_mtime)
+
+        # A content change moves generated_at and is published
+        self.item2.translation_en, self.item2.last_updated = "kitten", 1700000900
+        ContentPackager(self.mock_db, self.test_dir, self.cache_dir, deterministic=True).generate_pack("v1")
+        self.assertNotEqual(zip_path.read_bytes(), first)
+        with zipfile.ZipFile(zip_path) as z:
+            self.assertEqual(json.loads(z.read("manifest.json"))["generated_at"], 1700000900)
+
+    def test_lite_variant_from_one_synthesis(self):
+        ContentPackager(self.mock_db, self.test_dir, self.cache_dir).generate_pack("v1")
+
+        # Enabling the variant later renders only the missing lite encodings
+        packager = ContentPackager(self.mock_db, self.test_dir, self.cache_dir, audio_variants=["lite"])
+        with patch.object(packager.audio_gen, 'generate_audio', wraps=packager.audio_gen.generate_audio) as gen:
+            zip_path = packager.generate_pack("v2")
+        self.assertEqual({c.kwargs["profile"] for c in gen.call_args_list}, {"lite"})
+        self.assertFalse(any(c.kwargs["variants"] for c in gen.call_args_list))
+
+        lite_path = self.test_dir / "deutschstart_v2_lite.zip"
+        with zipfile.ZipFile(zip_path) as full, zipfile.ZipFile(lite_path) as lite:
+            manifest = json.loads(full.read("manifest.json"))
+            self.assertEqual(manifest["variants"]["lite"]["filename"], lite_path.name)
+            lite_manifest = json.loads(lite.read("manifest.json"))
+            self.assertEqual((lite_manifest["type"], lite_manifest["profile"]), ("variant", "lite"))
+            # Same documents and clip names, so clients install either one the same way
+            self.assertEqual(full.namelist()[:-1], lite.namelist()[:-1])
+            self.assertEqual(full.read("vocabulary.json"), lite.read("vocabulary.json"))
+
+        # A new utterance is synthesized once and encoded in both profiles
+        self.item2.example_sentences = [{"german": "Die Katze schläft.", "english": "The cat sleeps."}]
+        with patch.object(packager.audio_gen, 'generate_audio', wraps=packager.audio_gen.generate_audio) as gen:
+            packager.generate_pack("v3")
+        calls = [c for c in gen.call_args_list if c.args[0] == "Die Katze schläft."]
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((calls[0].kwargs["profile"], list(calls[0].kwargs["variants"])), ("standard", ["lite"]))
+
+        with self.assertRaises(ValueError):
+            ContentPackager(self.mock_db, self.test_dir, self.cache_dir, audio_variants=["hifi"])
+
+    def test_synthesis_is_batched_per_language(self):
+        tasks = [("de", n) for n in range(SYNTHESIS_BATCH_SIZE * 3)] + [("en", n) for n in range(5)]
+        batches = batch_by_language(tasks, lambda t: t[0], workers=2)
+
+        self.assertTrue(all({t[0] for t in batch} == {language} for language, batch in batches))
+        self.assertEqual([len(b) for lang, b in batches if lang == "de"], [SYNTHESIS_BATCH_SIZE] * 3)
+        # Small groups are split so every worker gets a batch
+        self.assertEqual([len(b) for lang, b in batches if lang == "en"], [3, 2])
+
+        packager = ContentPackager(self.mock_db, self.test_dir, self.cache_dir)
+        with patch.object(packager.audio_gen, 'generate_batch', wraps=packager.audio_gen.generate_batch) as gen:
+            packager.generate_pack("v1")
+        languages = sorted(c.args[1] for c in gen.call_args_list)
+        self.assertEqual(set(languages), {"de", "en"})
+        self.assertEqual(sum(len(c.args[0]) for c in gen.call_args_list), 5)
+
+    def test_find_delta_chain_prefers_smallest_download(self):
+        snapshots = [
+            {"version": "v1", "deltas": []},
+            {"version": "v2", "deltas": [{"base_version": "v1", "filename": "a.zip", "size": 10}]},
+            {"version": "v3", "deltas": [
+                {"base_version": "v2", "filename": "b.zip", "size": 10},
+                {"base_version": "v1", "filename": "c.zip", "size": 50},
+            ]},
+        ]
+        chain = find_delta_chain(snapshots, "v1", "v3")
+        self.assertEqual([d["filename"] for d in chain], ["a.zip", "b.zip"])
+        self.assertEqual(find_delta_chain(snapshots, "v3", "v3"), [])
+        self.assertIsNone(find_delta_chain(snapshots, "v0", "v3"))
+
     def test_audio_failure_handling(self):
         """Test that if audio generation fails, the JSON entry lacks the audio key."""
         try:
@@ -0,0 +1,77 @@
+import unittest
+import logging
+import tempfile
+import threading
+from pathlib import Path
+import httpx
+from app.services.frequency_cache import DaflexClient, FrequencyCache
+
+logging.getLogger("app").setLevel(logging.CRITICAL)
+
+DAFLEX_DATA = {
+    "mann": [{"key": [600.5, 300, 200, 100, 50, 25, 1275.5], "value": "Mann [NN]"}],
+    "gehen": [{"key": [900, 500, 300, 200, 100, 50, 2050], "value": "gehen [VV]"}],
+    "xyzzy": [],
+}
+
+
+class TestFrequencyCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_obj = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmp_obj.name)
+        self.cache = FrequencyCache(self.tmp / "daflex.sqlite3")
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_obj.cleanup()
+
+    def handler(self, request):
+        word = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        with self.lock:
+            self.requests.append(word)
+        if word == "kaputt":
+            return httpx.Response(503)
+        return httpx.Response(200, json=DAFLEX_DATA[word])
+
+    def client(self, **kwargs):
+        return DaflexClient(self.cache, client=httpx.Client(transport=httpx.MockTransport(self.handler)), **kwargs)
+
+    def test_known_words_need_no_network(self):
+        freqs = self.client().frequencies(["Mann", "gehen", "xyzzy", "Mann"])
+        self.assertEqual(sorted(self.requests), ["gehen", "mann", "xyzzy"])
+        self.assertEqual((freqs["mann"].a1, freqs["mann"].total), (600.5, 1275.5))
+        self.assertEqual(freqs["xyzzy"].total, 0)
+
+        self.requests.clear()
+        freqs = self.client().frequencies(["mann", "gehen", "xyzzy"])
+        self.assertEqual(self.requests, [])
+        self.assertEqual(freqs["gehen"].c2, 50)
+        self.assertGreater(self.cache.get("Gehen").fetched_at, 0)
+
+    def test_errors_are_not_cached(self):
+        freqs = self.client().frequencies(["kaputt"])
+        self.assertEqual(freqs["kaputt"].total, 0)
+        self.assertIsNone(self.cache.get("kaputt"))
+
+    def test_offline_uses_the_tsv_and_never_fetches(self):
+        tsv = self.tmp / "daflex.tsv"
+        tsv.write_text(
+            "word\ttag\tfreq@A1\tfreq@A2\tfreq@B1\tfreq@B2\tfreq@C1\tfreq@C2\tfreq@total\n"
+            "Bank\tNN\t40\t10\t0\t0\t0\t0\t50\n"
+            "bank\tADJ\t1\t0\t0\t0\t0\t0\t1\n"
+            "gehen\tVV\t900\t500\t300\t200\t100\t50\t2050\n",
+            encoding="utf-8",
+        )
+        self.assertEqual(self.cache.load_tsv(tsv), 2)
+
+        freqs = self.client(offline=True).frequencies(["Bank", "gehen", "Katze"])
+        self.assertEqual(self.requests, [])
+        self.assertEqual((freqs["bank"].a1, freqs["bank"].source), (40, "tsv"))
+        self.assertEqual(freqs["katze"].total, 0)
+        self.assertIsNone(self.cache.get("katze"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import json
+import logging
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+from app.services import kaikki_store
+from app.services.kaikki_store import KaikkiStore, build_store, is_current, shard_ranges
+from app.validators.kaikki_validator import KaikkiValidator
+
+logging.getLogger("app").setLevel(logging.CRITICAL)
+
+KAIKKI_LINES = [
+    {
+        "word": "Hund", "pos": "noun",
+        "head_templates": [{"name": "de-noun", "args": {"1": "m,(e)s,e"}}],
+        "forms": [
+            {"form": "Hundes", "tags": ["genitive", "singular"]},
+            {"form": "Hunde", "tags": ["plural"]},
+        ],
+        "sounds": [
+            {"ipa": "/hʊnt/"},
+            {"audio": "De-Hund.ogg", "ogg_url": "https://upload.example/De-Hund.ogg", "mp3_url": "https://upload.example/De-Hund.mp3"},
+        ],
+        "senses": [{"glosses": ["dog"]}, {"raw_glosses": ["(derogatory) cur"]}],
+    },
+    {"word": "Bank", "pos": "noun", "tags": ["feminine"], "senses": [{"glosses": ["bench"]}]},
+    {"word": "Bank", "pos": "verb", "senses": [{"glosses": ["(made-up) to bank"]}]},
+    {"word": "der", "pos": "article", "senses": [{"glosses": ["the"]}]},
+]
+
+
+class TestKaikkiStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_obj = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmp_obj.name)
+        self.jsonl = self.tmp / "kaikki.jsonl"
+        lines = [json.dumps(entry, ensure_ascii=False) for entry in KAIKKI_LINES]
+        self.jsonl.write_text("\n".join(lines[:2] + ["{not json"] + lines[2:]) + "\n", encoding="utf-8")
+        self.db = self.tmp / "kaikki.sqlite3"
+
+    def tearDown(self):
+        self.tmp_obj.cleanup()
+
+    def test_entries_are_extracted_and_looked_up_by_word_and_pos(self):
+        stats = build_store(self.jsonl, self.db, workers=1)
+        self.assertEqual((stats.lines, stats.entries), (5, 4))
+
+        with KaikkiStore(self.db) as store:
+            self.assertEqual(len(store), 4)
+            hund, = store.lookup("der Hund", "noun")
+            self.assertEqual((hund.ipa, hund.gender, hund.plural), ("/hʊnt/", "m", "Hunde"))
+            self.assertEqual(hund.glosses, ["dog", "(derogatory) cur"])
+            self.assertEqual(hund.audio_url, "https://upload.example/De-Hund.ogg")
+
+            # Requested part of speech first, others after it
+            self.assertEqual([e.pos for e in store.lookup("Bank", "verb")], ["verb", "noun"])
+            self.assertEqual([e.pos for e in store.entries("Bank", "verb")], ["verb"])
+            self.assertEqual(store.entries("der", "art")[0].glosses, ["the"])
+            self.assertEqual(store.lookup("Katze"), [])
+
+    def test_index_is_rebuilt_only_when_the_dump_changes(self):
+        self.assertFalse(is_current(self.db, self.jsonl))
+        build_store(self.jsonl, self.db, workers=1)
+        self.assertTrue(is_current(self.db, self.jsonl))
+
+        with open(self.jsonl, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"word": "Katze", "pos": "noun"}) + "\n")
+        self.assertFalse(is_current(self.db, self.jsonl))
+
+    def test_shards_split_on_line_boundaries(self):
+        data = self.jsonl.read_bytes()
+        ranges = shard_ranges(self.jsonl, 3)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(data))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[start - 1:start], b"\n")
+        # More shards than lines collapses to one range per line
+        self.assertEqual(len(shard_ranges(self.jsonl, 100)), 5)
+
+    def test_parallel_ingest_matches_dump_order_and_resumes(self):
+        stats = build_store(self.jsonl, self.db, workers=2, shards=5)
+        self.assertGreater(stats.shards, 1)
+        self.assertEqual(stats.entries, 4)
+        with KaikkiStore(self.db) as store:
+            self.assertEqual([e.pos for e in store.entries("Bank")], ["noun", "verb"])
+        self.assertFalse(self.db.with_name("kaikki.sqlite3.shards").exists())
+
+        # Crash while loading the index: every shard is kept and reused
+        self.db.unlink()
+        with patch.object(kaikki_store, "write_store", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                build_store(self.jsonl, self.db, workers=1, shards=5)
+        with patch.object(kaikki_store, "parse_shard", side_effect=AssertionError("re-parsed")):
+            stats = build_store(self.jsonl, self.db, workers=1, shards=5)
+        self.assertEqual((stats.resumed, stats.lines, stats.entries), (stats.shards, 0, 4))
+        with KaikkiStore(self.db) as store:
+            self.assertEqual(len(store), 4)
+
+    def test_validator_checks_gender_and_plural(self):
+        build_store(self.jsonl, self.db, workers=1)
+
+        with KaikkiValidator(self.db) as kv:
+            self.assertTrue(kv.validate("der Hund", "m", "Hunde", pos="noun").valid)
+
+            result = kv.validate("Hund", "f", "die Hünde", pos="noun")
+            self.assertFalse(result.valid)
+            self.assertEqual(result.corrections, {"gender": "m", "plural": "Hunde"})
+
+            self.assertEqual(len(kv.validate_item("Katze", "f", "noun", None, None)), 1)
+
+        # No index yet: nothing to check against, nothing fails
+        with KaikkiValidator(self.tmp / "missing.sqlite3") as kv:
+            self.assertTrue(kv.validate("Katze", "f").valid)
+
+
+if __name__ == '__main__':
+    unittest.main()
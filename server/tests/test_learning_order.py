@@ -0,0 +1,52 @@
+import unittest
+import logging
+from app.services.learning_order import extend_order, interleave_and_order
+from app.services.seed_merge import generate_key
+
+logging.getLogger("app").setLevel(logging.CRITICAL)
+
+
+def word(name, priority, pos="noun"):
+    return {"word": name, "priority": priority, "pos": pos, "theme": "General"}
+
+
+class TestExtendOrder(unittest.TestCase):
+    def setUp(self):
+        self.items = [word(f"p1_{i}", 1) for i in range(4)] + [word(f"p4_{i}", 4, "verb") for i in range(6)]
+        ordered = interleave_and_order([dict(item) for item in self.items])
+        self.previous = {generate_key(item["word"]): item for item in ordered}
+
+    def current(self):
+        return [dict(self.previous[generate_key(item["word"])]) for item in self.items]
+
+    def test_rerun_keeps_the_order(self):
+        ordered = extend_order(self.current(), self.previous, generate_key)
+        for item in ordered:
+            self.assertEqual(item["order_index"], self.previous[generate_key(item["word"])]["order_index"])
+
+    def test_new_high_priority_word_lands_ahead_of_low_priority_words(self):
+        items = self.current() + [word("ich", 1, "pronoun")]
+        ordered = extend_order(items, self.previous, generate_key)
+        index = {item["word"]: item["order_index"] for item in ordered}
+
+        p4 = [index[f"p4_{i}"] for i in range(6)]
+        self.assertLess(index["ich"], min(p4))
+        self.assertGreater(index["ich"], max(index[f"p1_{i}"] for i in range(4)))
+        # Existing words keep their relative order
+        self.assertEqual(
+            sorted(range(6), key=lambda i: index[f"p4_{i}"]),
+            sorted(range(6), key=lambda i: self.previous[f"p4_{i}"]["order_index"]),
+        )
+        self.assertEqual(sorted(index.values()), list(range(len(items))))
+
+    def test_reprioritised_word_moves_to_its_block(self):
+        items = self.current()
+        promoted = next(item for item in items if item["word"] == "p4_3")
+        promoted["priority"] = 1
+        ordered = extend_order(items, self.previous, generate_key)
+        self.assertEqual([item["priority"] for item in ordered], sorted(item["priority"] for item in ordered))
+        self.assertEqual(ordered[4]["word"], "p4_3")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+import unittest
+import json
+import zipfile
+import tempfile
+import logging
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+from app.celery_app import celery_app
+from app.models.vocabulary import VocabularyItem
+from app.models.grammar import GrammarTopic
+from app.services.audio_generator import AudioGenerator
+from app.services.audio_store import AudioStore
+from app.tasks import packs
+
+logging.basicConfig(level=logging.CRITICAL)
+
+
+class FakeRedis:
+    """In-memory stand-in for the handful of Redis commands the pack tasks use."""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return False
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def incrby(self, key, amount):
+        value = int(self.data.get(key, b"0")) + amount
+        self.data[key] = str(value).encode()
+        return value
+
+
+class TestDistributedPackBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp_obj = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmp_obj.name)
+        self.packs_dir = self.tmp / "packs"
+        self.store = AudioStore(self.tmp / "audio_cache" / "store")
+        self.redis = FakeRedis()
+
+        items = [
+            VocabularyItem(
+                id="hund", word="Hund", article="der", translation_en="dog",
+                example_sentences=[{"german": "Der Hund bellt.", "english": "The dog barks."}]
+            ),
+            VocabularyItem(id="katze", word="Katze", article="die", translation_en="cat", example_sentences=[]),
+        ]
+        rows = {VocabularyItem: items, GrammarTopic: []}
+
+        def session():
+            db = MagicMock()
+            def query(model):
+                q = MagicMock()
+                q.order_by.return_value.all.return_value = rows[model]
+                return q
+            db.query.side_effect = query
+            return db
+
+        # Dummy-mode generator: no Piper binary, so clips are placeholder bytes
+        self.audio_gen = AudioGenerator(piper_binary=str(self.tmp / "missing-piper"))
+
+        self.patches = [
+            patch.object(packs, "PACKS_DIR", self.packs_dir),
+            patch.object(packs, "SessionLocal", side_effect=session),
+            patch.object(packs, "_redis", return_value=self.redis),
+            patch.object(packs, "_audio_store", self.store),
+            patch.object(packs, "_audio_gen", self.audio_gen),
+            patch.object(packs.settings, "TTS_FANOUT", True),
+            patch.object(packs.settings, "TTS_FANOUT_CHUNK_SIZE", 2),
+        ]
+        for p in self.patches:
+            p.start()
+
+        self.conf = {k: celery_app.conf[k] for k in ("task_always_eager", "task_eager_propagates", "result_backend")}
+        celery_app.conf.update(task_always_eager=True, task_eager_propagates=True, result_backend="cache+memory://")
+
+    def tearDown(self):
+        celery_app.conf.update(self.conf)
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmp_obj.cleanup()
+
+    def test_synthesis_fans_out_in_chunks_before_assembly(self):
+        chunks = []
+        real_chunk = packs.synthesize_chunk_task.run
+
+        def spy(job_id, jobs):
+            chunks.append(jobs)
+            return real_chunk(job_id, jobs)
+
+        self.redis.set("pack_build:v1", json.dumps({"job_id": "job-1", "delta_from": None, "format": "1.0"}))
+        with patch.object(packs.synthesize_chunk_task, "run", side_effect=spy):
+            result = packs.build_pack_task.apply(args=["v1"], task_id="job-1").get()
+
+        # 5 clips (2 words, 1 sentence, 2 translations) in chunks of at most 2
+        self.assertEqual(sum(len(c) for c in chunks), 5)
+        self.assertTrue(all(len(c) <= 2 for c in chunks))
+
+        self.assertEqual(result["filename"], "deutschstart_v1.zip")
+        with zipfile.ZipFile(self.packs_dir / result["filename"]) as z:
+            self.assertIn("audio/vocab/hund.ogg", z.namelist())
+            self.assertIn("audio/sentences/hund_sent_1.ogg", z.namelist())
+
+        # Lock and progress counter are cleaned up once the callback finishes
+        self.assertIsNone(self.redis.get("pack_build:v1"))
+        self.assertIsNone(self.redis.get("pack_build_progress:job-1"))
+
+    def test_chunk_failures_are_left_out_of_the_pack(self):
+        def generate(text, output_path, language="de", **kwargs):
+            if text == "cat":
+                raise RuntimeError("voice crashed")
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            output_path.write_bytes(b"OGG")
+
+        with patch.object(self.audio_gen, "generate_audio", side_effect=generate) as gen:
+            result = packs.build_pack_task.apply(args=["v1"], task_id="job-2").get()
+            # The failed clip is not retried during assembly
+            self.assertEqual(sum(1 for c in gen.call_args_list if c.args[0] == "cat"), 1)
+
+        with zipfile.ZipFile(self.packs_dir / result["filename"]) as z:
+            self.assertIn("audio/english/hund_en.ogg", z.namelist())
+            self.assertNotIn("audio/english/katze_en.ogg", z.namelist())
+
+    def test_remote_store_shares_clips_between_workers(self):
+        remote = MagicMock()
+        remote.has.return_value = False
+        self.store.remote = remote
+
+        packs.synthesize_chunk_task.apply(args=["job-3", [["der Hund", "de", {"standard": "ab" * 32}]]]).get()
+        remote.upload.assert_called_once_with("ab" * 32, ".ogg", self.store.path_for("ab" * 32))
+        self.assertEqual(self.redis.get("pack_build_progress:job-3"), b"1")
+
+
+class TestBuildCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.patches = [
+            patch.object(packs, "_redis", return_value=self.redis),
+            patch.object(packs.build_pack_task, "apply_async"),
+            patch.object(packs, "AsyncResult", return_value=MagicMock(state="PROGRESS")),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def test_same_parameters_share_one_job(self):
+        job_id, coalesced = packs.enqueue_pack_build("v2", ["v1"], None)
+        self.assertFalse(coalesced)
+        # Default format spelled out is the same build
+        self.assertEqual(packs.enqueue_pack_build("v2", ["v1"], packs.settings.PACK_FORMAT), (job_id, True))
+        packs.build_pack_task.apply_async.assert_called_once()
+
+    def test_mismatched_parameters_conflict(self):
+        job_id, _ = packs.enqueue_pack_build("v2", ["v1"], "1.0")
+        for delta_from, pack_format in ((["v0"], "1.0"), (["v1"], "2.0"), (None, "1.0")):
+            with self.assertRaises(packs.BuildConflict) as ctx:
+                packs.enqueue_pack_build("v2", delta_from, pack_format)
+            self.assertEqual(ctx.exception.job_id, job_id)
+        packs.build_pack_task.apply_async.assert_called_once()
+
+        # Once the build has finished, other parameters get a fresh job
+        packs.AsyncResult.return_value.state = "SUCCESS"
+        new_id, coalesced = packs.enqueue_pack_build("v2", None, "2.0")
+        self.assertNotEqual(new_id, job_id)
+        self.assertFalse(coalesced)
+
+
+if __name__ == '__main__':
+    unittest.main()
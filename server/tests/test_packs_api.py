@@ -0,0 +1,173 @@
+import unittest
+import os
+import tempfile
+import logging
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.v1 import packs
+from app.models.vocabulary import VocabularyItem
+from app.models.grammar import GrammarTopic
+from app.services.content_packager import ContentPackager
+from app.services.pack_catalog import PackCatalog, file_sha256
+
+logging.basicConfig(level=logging.CRITICAL)
+
+
+class TestPacksApi(unittest.TestCase):
+    def setUp(self):
+        self.tmp_obj = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmp_obj.name)
+        self.packs_dir = self.tmp / "packs"
+
+        self.rows = {
+            VocabularyItem: [VocabularyItem(id="hund", word="Hund", article="der", translation_en="dog", example_sentences=[])],
+            GrammarTopic: [],
+        }
+        self.db = MagicMock()
+        def query(model):
+            q = MagicMock()
+            q.order_by.return_value.all.return_value = self.rows[model]
+            return q
+        self.db.query.side_effect = query
+
+        self.dir_patch = patch.object(packs, "PACKS_DIR", self.packs_dir)
+        self.dir_patch.start()
+        app = FastAPI()
+        app.include_router(packs.router, prefix="/api/v1/packs")
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.dir_patch.stop()
+        self.tmp_obj.cleanup()
+
+    def _build(self, version_tag):
+        packager = ContentPackager(self.db, self.packs_dir, self.tmp / "cache")
+        return packager.generate_pack(version_tag)
+
+    def test_latest_comes_from_catalog_not_mtime(self):
+        self.assertEqual(self.client.get("/api/v1/packs/latest").status_code, 404)
+
+        self._build("v1")
+        v2 = self._build("v2")
+        # Restoring an old pack from backup must not make it "latest"
+        os.utime(self.packs_dir / "deutschstart_v1.zip", (v2.stat().st_mtime + 60,) * 2)
+
+        latest = self.client.get("/api/v1/packs/latest").json()
+        self.assertEqual(latest["filename"], "deutschstart_v2.zip")
+        self.assertEqual(latest["version"], "v2")
+        self.assertEqual(latest["parent_version"], "v1")
+        self.assertEqual(latest["sha256"], file_sha256(v2))
+        self.assertEqual(latest["size"], v2.stat().st_size)
+        self.assertEqual(latest["url"], "/api/v1/packs/deutschstart_v2.zip")
+
+    def test_listing_includes_full_and_delta_packs(self):
+        self._build("v1")
+        self._build("v2")
+
+        listing = self.client.get("/api/v1/packs").json()
+        self.assertEqual(listing["latest"], "v2")
+        by_name = {p["filename"]: p for p in listing["packs"]}
+        self.assertEqual(set(by_name), {"deutschstart_v1.zip", "deutschstart_v2.zip", "deutschstart_v1_to_v2.zip"})
+        delta = by_name["deutschstart_v1_to_v2.zip"]
+        self.assertEqual((delta["type"], delta["parent_version"]), ("delta", "v1"))
+        self.assertEqual(by_name["deutschstart_v1.zip"]["item_count"], 1)
+
+    def test_dictionary_pack_is_listed_separately(self):
+        self.rows[VocabularyItem][0].kaikki_data = {"senses": [{"glosses": ["dog"]}]}
+        self.assertEqual(self.client.get("/api/v1/packs/latest/dictionary").status_code, 404)
+        self._build("v1")
+        self.assertIsNone(self.client.get("/api/v1/packs/latest").json()["dictionary"])
+
+        ContentPackager(self.db, self.packs_dir, self.tmp / "cache", split_dictionary=True).generate_pack("v2")
+        dict_path = self.packs_dir / "deutschstart_v2_dictionary.zip"
+
+        latest = self.client.get("/api/v1/packs/latest").json()
+        self.assertEqual(latest["filename"], "deutschstart_v2.zip")
+        self.assertEqual(latest["dictionary"]["filename"], dict_path.name)
+
+        dictionary = self.client.get("/api/v1/packs/latest/dictionary").json()
+        self.assertEqual(dictionary["type"], "dictionary")
+        self.assertEqual(dictionary["sha256"], file_sha256(dict_path))
+        self.assertEqual(self.client.get(dictionary["url"]).content, dict_path.read_bytes())
+
+    def test_catalog_is_cached_until_republished(self):
+        self._build("v1")
+        catalog = PackCatalog(self.packs_dir)
+        first = catalog.load()
+        with patch.object(catalog, "_read", side_effect=AssertionError("re-read")):
+            self.assertIs(catalog.load(), first)
+
+        self._build("v2")
+        self.assertEqual(catalog.latest_version(), "v2")
+
+    def test_rebuild_from_archives(self):
+        self._build("v1")
+        self._build("v2")
+        (self.packs_dir / "catalog.json").unlink()
+
+        catalog = PackCatalog(self.packs_dir).rebuild()
+        self.assertEqual(catalog["latest"], "v2")
+        self.assertEqual(len(catalog["packs"]), 3)
+
+    def test_latest_rebuilds_a_missing_catalog(self):
+        self._build("v1")
+        v2 = self._build("v2")
+        (self.packs_dir / "catalog.json").unlink()
+
+        latest = self.client.get("/api/v1/packs/latest")
+        self.assertEqual(latest.status_code, 200)
+        self.assertEqual((latest.json()["version"], latest.json()["sha256"]), ("v2", file_sha256(v2)))
+        self.assertTrue((self.packs_dir / "catalog.json").exists())
+
+    def test_download_etag_and_conditional_get(self):
+        zip_path = self._build("v1")
+        url = "/api/v1/packs/deutschstart_v1.zip"
+
+        full = self.client.get(url)
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(full.content, zip_path.read_bytes())
+        self.assertEqual(full.headers["etag"], f'"{file_sha256(zip_path)}"')
+        self.assertEqual(full.headers["accept-ranges"], "bytes")
+
+        cached = self.client.get(url, headers={"If-None-Match": full.headers["etag"]})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b"")
+
+        stale = self.client.get(url, headers={"If-None-Match": '"0000"'})
+        self.assertEqual(stale.status_code, 200)
+
+    def test_download_resumes_with_range(self):
+        zip_path = self._build("v1")
+        data = zip_path.read_bytes()
+        url = "/api/v1/packs/deutschstart_v1.zip"
+        etag = self.client.get(url).headers["etag"]
+
+        # Client dropped after 100 bytes and resumes from there
+        head = self.client.get(url, headers={"Range": "bytes=0-99"})
+        self.assertEqual(head.status_code, 206)
+        self.assertEqual(head.headers["content-range"], f"bytes 0-99/{len(data)}")
+        rest = self.client.get(url, headers={"Range": "bytes=100-", "If-Range": etag})
+        self.assertEqual(rest.status_code, 206)
+        self.assertEqual(head.content + rest.content, data)
+
+        suffix = self.client.get(url, headers={"Range": "bytes=-10"})
+        self.assertEqual(suffix.content, data[-10:])
+
+        # The pack changed since the partial download: start over with the full file
+        changed = self.client.get(url, headers={"Range": "bytes=100-", "If-Range": '"other"'})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.content, data)
+
+        beyond = self.client.get(url, headers={"Range": f"bytes={len(data)}-"})
+        self.assertEqual(beyond.status_code, 416)
+        self.assertEqual(beyond.headers["content-range"], f"bytes */{len(data)}")
+
+        # Multiple ranges are not supported; the whole file is sent instead
+        multi = self.client.get(url, headers={"Range": "bytes=0-1,5-6"})
+        self.assertEqual(multi.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from app.services.seed_merge import IncrementalMerge, SeedSource, smart_merge
+
+logging.getLogger("app").setLevel(logging.CRITICAL)
+
+
+class TestIncrementalMerge(unittest.TestCase):
+    def setUp(self):
+        self.tmp_obj = tempfile.TemporaryDirectory()
+        self.tmp = Path(self.tmp_obj.name)
+        self.state = self.tmp / "state.json"
+        self.merged_keys = []
+
+        self.write("a.json", [
+            {"word": "Mann", "pos": "noun"},
+            {"word": "gehen", "pos": "verb"},
+        ])
+        self.write("b.json", [
+            {"word": "der Mann", "translation": "man", "example_sentences": [{"german": "Der Mann geht."}]},
+            {"word": "Haus", "pos": "noun"},
+        ])
+
+    def tearDown(self):
+        self.tmp_obj.cleanup()
+
+    def write(self, name, items):
+        (self.tmp / name).write_text(json.dumps(items), encoding="utf-8")
+
+    def sources(self, *names):
+        return [SeedSource(name, self.tmp / name) for name in names]
+
+    def counting_merge(self, existing, new):
+        self.merged_keys.append(new["word"])
+        return smart_merge(existing, new)
+
+    def run_merge(self, *names):
+        merger = IncrementalMerge(self.state, merge=self.counting_merge)
+        result = merger.run(self.sources(*names))
+        merger.save()
+        return result
+
+    def test_only_changed_files_are_remerged(self):
+        items, changes = self.run_merge("a.json", "b.json")
+        self.assertEqual([i["word"] for i in items], ["der Mann", "gehen", "Haus"])
+        self.assertEqual(items[0]["translation"], "man")
+        self.assertEqual(sorted(changes.added), ["gehen", "haus", "mann"])
+
+        # Touched but identical: nothing to do
+        os.utime(self.tmp / "a.json", ns=(1, 1))
+        self.merged_keys.clear()
+        items, changes = self.run_merge("a.json", "b.json")
+        self.assertFalse(changes)
+        self.assertEqual(self.merged_keys, [])
+
+        # b.json changes: "mann" is re-folded from both files, "gehen" is untouched
+        self.write("b.json", [
+            {"word": "der Mann", "translation": "the man"},
+            {"word": "Katze", "pos": "noun"},
+        ])
+        self.merged_keys.clear()
+        items, changes = self.run_merge("a.json", "b.json")
+        self.assertEqual(self.merged_keys, ["der Mann"])
+        self.assertEqual((changes.added, changes.modified, changes.removed), (["katze"], ["mann"], ["haus"]))
+        self.assertEqual(items[0]["translation"], "the man")
+
+        # Same result as merging from scratch
+        fresh, _ = IncrementalMerge(self.tmp / "fresh.json").run(self.sources("a.json", "b.json"))
+        self.assertEqual(items, fresh)
+
+    def test_removed_source_drops_its_keys(self):
+        self.run_merge("a.json", "b.json")
+        items, changes = self.run_merge("a.json")
+        self.assertEqual([i["word"] for i in items], ["Mann", "gehen"])
+        self.assertEqual((changes.modified, changes.removed), (["mann"], ["haus"]))
+
+    def test_unsaved_run_is_reported_again(self):
+        IncrementalMerge(self.state).run(self.sources("a.json", "b.json"))
+        self.assertFalse(self.state.exists())
+        _, changes = self.run_merge("a.json", "b.json")
+        self.assertEqual(sorted(changes.added), ["gehen", "haus", "mann"])
+
+    def test_returned_items_do_not_alias_the_state(self):
+        items, _ = self.run_merge("a.json", "b.json")
+        items[0]["ipa"] = "/man/"
+        _, changes = self.run_merge("a.json", "b.json")
+        self.assertFalse(changes)
+
+
+if __name__ == '__main__':
+    unittest.main()